@@ -0,0 +1,327 @@
+"""Analyses des ventes et des consommations (pandas)
+
+Les sorties et entrées sont chargées une seule fois, agrégées par jour, puis
+complétées à chaque actualisation par les seuls mouvements nouveaux. Tous les
+calculs portent sur ces agrégats journaliers, en opérations vectorisées.
+Module importé à la demande: pandas n'est pas nécessaire au reste de l'application.
+"""
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Motifs de sortie comptés comme ventes et comme pertes
+MOTIFS_VENTE = ("Vente",)
+MOTIFS_PERTE = ("Casse", "Perte")
+
+# Fréquences proposées: libellé -> règle pandas
+FREQUENCES = {"Jour": "D", "Semaine": "W-MON", "Mois": "MS"}
+
+# Paramètres des prévisions de consommation
+LISSAGE = 0.1          # coefficient du lissage exponentiel (poids du jour le plus récent)
+HISTORIQUE = 365       # jours de sorties pris en compte
+DELAI_DEFAUT = 7       # délai de réapprovisionnement (jours) sans historique exploitable
+DELAI_MAX = 90
+COUVERTURE = 30        # jours de consommation couverts par une commande
+NIVEAU_SERVICE = 1.65  # quantile de la loi normale: ~95 % de délais sans rupture
+
+
+class Analyses:
+    """Agrégats journaliers des mouvements, tenus à jour de façon incrémentale"""
+
+    # Mouvements lus par table: (requête, colonnes)
+    REQUETES = {
+        'sorties': (
+            # Valeur au prix enregistré sur la sortie; prix de l'article pour les sorties qui n'en ont pas
+            "SELECT s.id, s.article_id, s.date_sortie, s.motif, s.quantite, "
+            "s.quantite * COALESCE(s.prix_unitaire, a.prix_unitaire, 0) "
+            "FROM sorties s LEFT JOIN articles a ON a.id = s.article_id WHERE s.id > ? ORDER BY s.id",
+            ['id', 'article_id', 'date', 'motif', 'quantite', 'valeur'],
+        ),
+        'entrees': (
+            "SELECT id, article_id, date_entree, quantite, prix_total FROM entrees WHERE id > ? ORDER BY id",
+            ['id', 'article_id', 'date', 'quantite', 'prix_total'],
+        ),
+    }
+    # Clés de l'agrégat journalier de chaque table
+    CLES = {'sorties': ['date', 'article_id', 'motif'], 'entrees': ['date', 'article_id']}
+    # Colonnes additionnées et leur type (fixé même sans aucune ligne)
+    VALEURS = {'sorties': {'quantite': 'int64', 'valeur': 'float64'}, 'entrees': {'quantite': 'int64', 'prix_total': 'float64'}}
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self._verrou = threading.RLock()
+        self.journalier = {table: None for table in self.REQUETES}
+        self.dernier_id = dict.fromkeys(self.REQUETES, 0)
+        self.nb_lignes = dict.fromkeys(self.REQUETES, 0)
+        self.articles = None
+        self.version = 0     # incrémentée à chaque changement des données
+        self._cache = {}     # (calcul, paramètres) -> (version, résultat)
+
+    # --- Chargement ---
+
+    def actualiser(self):
+        """Ajoute les mouvements enregistrés depuis le dernier appel
+
+        Un mouvement supprimé (le nombre de lignes ne correspond plus) provoque un rechargement complet.
+        """
+        with self._verrou:
+            change = False
+            for table in self.REQUETES:
+                change |= self._completer(table)
+                total = self.db.execute_query(f"SELECT COUNT(*) FROM {table}")[0][0]
+                if total != self.nb_lignes[table]:
+                    self.journalier[table] = None
+                    self.dernier_id[table] = self.nb_lignes[table] = 0
+                    self._completer(table)
+                    change = True
+
+            articles = pd.DataFrame(
+                self.db.execute_query(
+                    "SELECT id, designation, categorie, prix_unitaire, quantite, seuil_minimum FROM articles"
+                ),
+                columns=['article_id', 'designation', 'categorie', 'prix_unitaire', 'quantite', 'seuil_minimum'],
+            ).set_index('article_id')
+            if self.articles is None or not articles.equals(self.articles):
+                self.articles = articles
+                change = True
+
+            if change:
+                self.version += 1
+                self._cache.clear()
+            return change
+
+    def _completer(self, table):
+        query, colonnes = self.REQUETES[table]
+        rows = self.db.execute_query(query, (self.dernier_id[table],))
+        if not rows:
+            if self.journalier[table] is None:
+                self.journalier[table] = self._agreger(table, pd.DataFrame(rows, columns=colonnes))
+            return False
+
+        nouveaux = pd.DataFrame(rows, columns=colonnes)
+        self.dernier_id[table] = int(nouveaux['id'].iat[-1])
+        self.nb_lignes[table] += len(nouveaux)
+
+        agregat = self._agreger(table, nouveaux)
+        anciens = self.journalier[table]
+        if anciens is not None and len(anciens):
+            # Seuls les jours touchés par les nouveaux mouvements sont regroupés à nouveau
+            touches = anciens['date'] >= agregat['date'].min()
+            agregat = pd.concat([
+                anciens[~touches],
+                self._agreger(table, pd.concat([anciens[touches], agregat], ignore_index=True)),
+            ], ignore_index=True)
+        self.journalier[table] = agregat
+        return True
+
+    def _agreger(self, table, mouvements):
+        mouvements = mouvements.drop(columns='id', errors='ignore')
+        mouvements['date'] = pd.to_datetime(mouvements['date'], errors='coerce').dt.normalize()
+        if table == 'sorties':
+            mouvements['motif'] = mouvements['motif'].fillna("").astype(str)
+        valeurs = self.VALEURS[table]
+        mouvements = mouvements.dropna(subset=['date']).fillna(dict.fromkeys(valeurs, 0)).astype(valeurs)
+        return mouvements.groupby(self.CLES[table], as_index=False, sort=False)[list(valeurs)].sum()
+
+    def _memoriser(self, cle, calcul, *args):
+        """Résultat d'un calcul, gardé jusqu'au prochain changement des données"""
+        with self._verrou:
+            if self.articles is None:
+                self.actualiser()
+            entree = self._cache.get((cle, args))
+            if entree is None or entree[0] != self.version:
+                entree = (self.version, calcul(*args))
+                self._cache[(cle, args)] = entree
+            return entree[1]
+
+    # --- Calculs ---
+
+    def chiffre_affaires(self, frequence="D", debut=None, fin=None):
+        """Chiffre d'affaires des ventes par période (Series indexée par début de période)"""
+        return self._memoriser('chiffre_affaires', self._chiffre_affaires, frequence, debut, fin)
+
+    def moyenne_mobile(self, fenetre=7, frequence="D", debut=None, fin=None):
+        """Chiffre d'affaires et sa moyenne mobile sur `fenetre` périodes (DataFrame)"""
+        serie = self.chiffre_affaires(frequence, debut, fin)
+        return pd.DataFrame({
+            'chiffre_affaires': serie,
+            'moyenne_mobile': serie.rolling(fenetre, min_periods=1).mean(),
+        })
+
+    def consommation(self, par='article', debut=None, fin=None):
+        """Quantités sorties et leur valeur par 'article' ou par 'categorie'"""
+        return self._memoriser('consommation', self._consommation, par, debut, fin)
+
+    def pertes(self, par='motif', debut=None, fin=None):
+        """Répartition des sorties par 'motif', ou taux de casse/perte par 'categorie' ou 'article_id'"""
+        return self._memoriser('pertes', self._pertes, par, debut, fin)
+
+    def consommation_journaliere(self, debut=None, fin=None):
+        """Quantités sorties par jour (lignes) et par article (colonnes), jours sans sortie à zéro"""
+        return self._memoriser('consommation_journaliere', self._consommation_journaliere, debut, fin)
+
+    def _sorties(self, debut, fin):
+        sorties = self.journalier['sorties']
+        if debut is not None:
+            sorties = sorties[sorties['date'] >= pd.Timestamp(debut)]
+        if fin is not None:
+            sorties = sorties[sorties['date'] <= pd.Timestamp(fin)]
+        return sorties
+
+    def _sorties_valorisees(self, debut, fin):
+        """Sorties journalières avec catégorie et valeur (au prix enregistré sur chaque sortie)"""
+        sorties = self._sorties(debut, fin).join(self.articles[['categorie']], on='article_id')
+        sorties['categorie'] = sorties['categorie'].fillna("(supprimé)")
+        return sorties
+
+    def _chiffre_affaires(self, frequence, debut, fin):
+        sorties = self._sorties_valorisees(debut, fin)
+        serie = sorties[sorties['motif'].isin(MOTIFS_VENTE)].groupby('date')['valeur'].sum()
+        if serie.empty:
+            return serie
+        # Périodes sans vente incluses (à zéro) pour des moyennes mobiles justes
+        return serie.resample(frequence).sum()
+
+    def _consommation(self, par, debut, fin):
+        sorties = self._sorties_valorisees(debut, fin)
+        if par == 'article':
+            resultat = sorties.groupby('article_id')[['quantite', 'valeur']].sum()
+            resultat = self.articles[['designation', 'categorie']].join(resultat, how='right')
+            resultat['designation'] = resultat['designation'].fillna("(supprimé)")
+        else:
+            resultat = sorties.groupby('categorie')[['quantite', 'valeur']].sum()
+        return resultat.sort_values('quantite', ascending=False)
+
+    def _pertes(self, par, debut, fin):
+        sorties = self._sorties_valorisees(debut, fin)
+        if par == 'motif':
+            resultat = sorties.groupby('motif')[['quantite', 'valeur']].sum()
+            resultat['part'] = resultat['quantite'] / max(resultat['quantite'].sum(), 1)
+            return resultat.sort_values('quantite', ascending=False)
+
+        sorties['perte'] = np.where(sorties['motif'].isin(MOTIFS_PERTE), sorties['quantite'], 0)
+        resultat = sorties.groupby(par)[['quantite', 'perte']].sum()
+        resultat['taux_perte'] = resultat['perte'] / resultat['quantite'].where(resultat['quantite'] > 0)
+        return resultat.sort_values('taux_perte', ascending=False)
+
+    def _consommation_journaliere(self, debut, fin):
+        matrice = self._sorties(debut, fin).pivot_table(
+            index='date', columns='article_id', values='quantite', aggfunc='sum', fill_value=0
+        )
+        if matrice.empty:
+            return matrice
+        return matrice.asfreq('D', fill_value=0)
+
+    def previsions(self, lissage=LISSAGE, couverture=COUVERTURE, niveau_service=NIVEAU_SERVICE):
+        """Consommation prévue, point de commande et quantité à commander de chaque article
+        
+        DataFrame indexé par article_id: taux_journalier, ecart_type, delai, stock_securite,
+        point_commande, quantite_suggeree.
+        """
+        return self._memoriser('previsions', self._previsions, lissage, couverture, niveau_service)
+
+    def delais_reapprovisionnement(self):
+        """Délai médian (jours) entre le passage sous le seuil et l'entrée suivante, par article
+        
+        Le niveau de stock de chaque jour est reconstitué à rebours depuis la quantité actuelle.
+        """
+        return self._memoriser('delais', self._delais)
+
+    def _previsions(self, lissage, couverture, niveau_service):
+        # Matrice jours x articles des sorties, jours et articles sans sortie à zéro
+        hier = pd.Timestamp(date.today() - timedelta(days=1))
+        jours = pd.date_range(end=hier, periods=HISTORIQUE, freq='D')
+        matrice = self.consommation_journaliere(jours[0], hier).reindex(
+            index=jours, columns=self.articles.index, fill_value=0
+        ).to_numpy(dtype=float)
+
+        # Lissage exponentiel simple, sous forme close: moyenne pondérée par
+        # lissage * (1 - lissage)^âge, en un seul produit matriciel pour tous les articles
+        poids = lissage * (1 - lissage) ** np.arange(HISTORIQUE)[::-1]
+        poids /= poids.sum()
+        taux = poids @ matrice
+        ecart_type = np.sqrt(np.maximum(poids @ matrice ** 2 - taux ** 2, 0))
+
+        delai = self.delais_reapprovisionnement().reindex(self.articles.index)
+        delai = delai.fillna(delai.median() if delai.notna().any() else DELAI_DEFAUT).to_numpy()
+
+        stock_securite = niveau_service * ecart_type * np.sqrt(delai)
+        # Un article sorti sur la période garde au moins un point de commande de 1
+        consommes = matrice.any(axis=0)
+        point_commande = np.where(consommes, np.maximum(np.ceil(taux * delai + stock_securite), 1), 0)
+        quantite = self.articles['quantite'].fillna(0).to_numpy()
+        besoin = np.ceil(point_commande + taux * couverture - quantite)
+        quantite_suggeree = np.where(consommes & (quantite <= point_commande), np.maximum(besoin, 0), 0)
+
+        return pd.DataFrame({
+            'taux_journalier': taux,
+            'ecart_type': ecart_type,
+            'delai': delai,
+            'stock_securite': stock_securite,
+            'point_commande': point_commande.astype('int64'),
+            'quantite_suggeree': quantite_suggeree.astype('int64'),
+        }, index=self.articles.index)
+
+    def _delais(self):
+        entrees = self.journalier['entrees'].groupby(['article_id', 'date'])['quantite'].sum()
+        sorties = self.journalier['sorties'].groupby(['article_id', 'date'])['quantite'].sum()
+        niveaux = pd.DataFrame({'entree': entrees, 'sortie': sorties}).fillna(0).sort_index().reset_index()
+        if niveaux.empty or not len(entrees):
+            return pd.Series(dtype=float)
+
+        # Niveau en fin de journée: quantité actuelle moins les variations des jours suivants
+        niveaux['net'] = niveaux['entree'] - niveaux['sortie']
+        cumul = niveaux.groupby('article_id')['net'].cumsum()
+        total = niveaux.groupby('article_id')['net'].transform('sum')
+        niveaux = niveaux.join(self.articles[['quantite', 'seuil_minimum']], on='article_id')
+        niveaux['niveau'] = niveaux['quantite'] - total + cumul
+        veille = niveaux.groupby('article_id')['niveau'].shift().fillna(np.inf)
+
+        # Jours de passage sous le seuil, rapprochés de l'entrée qui suit
+        passages = niveaux.loc[
+            (niveaux['niveau'] <= niveaux['seuil_minimum']) & (veille > niveaux['seuil_minimum']),
+            ['article_id', 'date']
+        ].rename(columns={'date': 'date_passage'})
+        receptions = niveaux.loc[niveaux['entree'] > 0, ['article_id', 'date']]
+        receptions['precedente'] = receptions.groupby('article_id')['date'].shift()
+        rapprochees = pd.merge_asof(
+            receptions.sort_values('date'), passages.sort_values('date_passage'),
+            left_on='date', right_on='date_passage', by='article_id', direction='backward'
+        )
+        # Un passage déjà suivi d'une entrée précédente ne compte pas
+        valides = rapprochees['date_passage'].notna() & ~(rapprochees['date_passage'] < rapprochees['precedente'])
+        rapprochees = rapprochees[valides]
+        delais = (rapprochees['date'] - rapprochees['date_passage']).dt.days.clip(1, DELAI_MAX)
+        return delais.groupby(rapprochees['article_id']).median()
+
+    def resume(self, frequence="D", fenetre=7, nb_articles=20):
+        """Tableaux prêts à afficher (listes de lignes), après actualisation
+        
+        frequence: règle pandas ou libellé de FREQUENCES ("Jour", "Semaine", "Mois").
+        """
+        frequence = FREQUENCES.get(frequence, frequence)
+        self.actualiser()
+        ca = self.moyenne_mobile(fenetre, frequence)
+        articles = self.consommation('article').head(nb_articles)
+        motifs = self.pertes('motif')
+        categories = self.consommation('categorie').join(self.pertes('categorie')['taux_perte'])
+        return {
+            'chiffre_affaires': [
+                (periode.date(), float(montant), float(moyenne))
+                for periode, montant, moyenne in ca[::-1].itertuples()
+            ],
+            'categories': [
+                (categorie, int(quantite), float(valeur), None if pd.isna(taux) else float(taux))
+                for categorie, quantite, valeur, taux in categories.itertuples()
+            ],
+            'articles': [
+                (designation, categorie, int(quantite), float(valeur))
+                for _, designation, categorie, quantite, valeur in articles.itertuples()
+            ],
+            'motifs': [
+                (motif or "(sans motif)", int(quantite), float(valeur), float(part))
+                for motif, quantite, valeur, part in motifs.itertuples()
+            ],
+        }
@@ -0,0 +1,418 @@
+"""Bancs d'essai reproductibles de l'application
+
+Génère des bases synthétiques (graine fixe) de N articles et M mouvements
+étalés sur plusieurs années, mesure hors écran les opérations de l'interface
+à plusieurs tailles et écrit les résultats en JSON, comparables d'une version
+à l'autre:
+
+    python bench.py --tailles 200x5000,2000x500000 --sortie apres.json
+    python bench.py --comparer avant.json apres.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import date, datetime, timedelta
+
+from stock import DatabaseManager, StockService, INDEXATION_RECHERCHE, cle_ean
+
+TAILLES_DEFAUT = "200x5000,2000x50000,2000x500000"
+REPETITIONS = 3
+DOSSIER_BASES = "bench"
+SEUIL_REGRESSION = 1.2   # rapport des médianes au-delà duquel une opération est signalée
+
+# Catalogue synthétique: catégorie -> types d'articles
+CATALOGUE = {
+    "Assiettes": ["Assiette plate", "Assiette creuse", "Assiette à dessert", "Sous-assiette"],
+    "Verres": ["Verre à eau", "Verre à pied", "Flûte", "Gobelet", "Chope"],
+    "Couverts": ["Fourchette", "Couteau", "Cuillère à soupe", "Petite cuillère", "Louche"],
+    "Plats": ["Plat ovale", "Plat rond", "Saladier", "Plateau", "Soupière"],
+    "Tasses et bols": ["Tasse à café", "Tasse à thé", "Bol", "Mug"],
+    "Cuisson": ["Marmite", "Casserole", "Poêle", "Faitout", "Cocotte"],
+    "Carafes": ["Carafe", "Pichet", "Théière", "Cafetière"],
+}
+MATIERES = ["porcelaine", "faïence", "grès", "verre", "inox", "mélamine", "aluminium", "bois"]
+FINITIONS = ["blanc", "noir", "doré", "bleu", "rouge", "uni", "décor fleuri", "bord argent"]
+FOURNISSEURS = ["Sodicam", "Import Plus", "Ets Diallo", "Bazar Central", "Arts de la Table",
+                "Quincaillerie du Port", "Grossiste Nord"]
+# Motifs des sorties et leur fréquence relative
+MOTIFS = {"Vente": 88, "Utilisation": 5, "Casse": 3, "Perte": 1, "Prêt": 1, "Don": 1, "Autre": 1}
+QUANTITES_SORTIE = {1: 50, 2: 20, 3: 10, 4: 8, 6: 7, 12: 5}
+PART_ENTREES = 0.15
+PART_CODES_FABRICANT = 0.3  # articles ayant aussi l'EAN du fabricant en plus de l'étiquette interne
+SCANS_VENTE = 12
+
+
+def poids_jour(jour, debut, nb_jours):
+    """Activité relative d'un jour: semaine, saison (fêtes, été) et croissance"""
+    semaine = (1.0, 0.9, 0.9, 1.0, 1.3, 1.6, 0.5)[jour.weekday()]
+    saison = {12: 1.6, 1: 0.8, 7: 0.8, 8: 0.7}.get(jour.month, 1.0)
+    return semaine * saison * (0.7 + 0.6 * (jour - debut).days / nb_jours)
+
+
+def generer_base(chemin, nb_articles, nb_mouvements, annees=3, graine=1, fin=None):
+    """Crée une base de nb_articles articles et nb_mouvements entrées/sorties jusqu'à fin
+
+    Le contenu ne dépend que des arguments: même graine et même date de fin, même base.
+    Retourne la durée de génération en secondes.
+    """
+    debut_chrono = time.perf_counter()
+    rng = random.Random(graine)
+    fin = fin or date.today()
+    debut = fin - timedelta(days=365 * annees)
+    nb_jours = (fin - debut).days + 1
+    jours = [debut + timedelta(days=i) for i in range(nb_jours)]
+    cumul_jours = []
+    total = 0.0
+    for jour in jours:
+        total += poids_jour(jour, debut, nb_jours)
+        cumul_jours.append(total)
+
+    # Articles: désignations uniques, popularité très inégale (loi de Zipf)
+    articles = []
+    vus = set()
+    while len(articles) < nb_articles:
+        categorie = rng.choice(list(CATALOGUE))
+        designation = f"{rng.choice(CATALOGUE[categorie])} {rng.choice(MATIERES)} {rng.choice(FINITIONS)}"
+        if designation in vus:
+            designation = f"{designation} {len(articles) + 1}"
+        vus.add(designation)
+        prix = round(rng.lognormvariate(7, 0.8), -1) or 50.0
+        articles.append([designation, categorie, "pièce" if rng.random() < 0.9 else "lot", prix])
+    popularite = [1 / (rang + 1) ** 0.8 for rang in range(nb_articles)]
+    rng.shuffle(popularite)
+
+    nb_entrees = int(nb_mouvements * PART_ENTREES)
+    nb_sorties = nb_mouvements - nb_entrees
+    indices = range(nb_articles)
+
+    # (date, article, variation, ligne)
+    mouvements = []
+    for jour, article in zip(rng.choices(jours, cum_weights=cumul_jours, k=nb_sorties),
+                             rng.choices(indices, weights=popularite, k=nb_sorties)):
+        quantite = rng.choices(list(QUANTITES_SORTIE), weights=list(QUANTITES_SORTIE.values()))[0]
+        motif = rng.choices(list(MOTIFS), weights=list(MOTIFS.values()))[0]
+        utilisateur = "Caissier" if motif == "Vente" else rng.choice(["Awa", "Moussa", "Fatou"])
+        mouvements.append((jour, article, -quantite, ('sorties', quantite, motif, utilisateur, "")))
+    # Réapprovisionnements, plus fréquents pour les articles populaires et
+    # dimensionnés sur leur consommation
+    consomme = [0] * nb_articles
+    for _, article, variation, _ in mouvements:
+        consomme[article] -= variation
+    receptions = list(zip(rng.choices(jours, k=nb_entrees),
+                          rng.choices(indices, weights=popularite, k=nb_entrees)))
+    nb_receptions = [0] * nb_articles
+    for _, article in receptions:
+        nb_receptions[article] += 1
+    for jour, article in receptions:
+        quantite = max(10, round(consomme[article] / nb_receptions[article] * rng.uniform(0.8, 1.15), -1))
+        prix_total = round(quantite * articles[article][3] * rng.uniform(0.5, 0.7), 2)
+        mouvements.append((jour, article, quantite, ('entrees', quantite, rng.choice(FOURNISSEURS),
+                                                     prix_total, "")))
+    mouvements.sort(key=lambda mouvement: mouvement[0])
+
+    # Stock d'ouverture: de quoi ne jamais passer sous zéro, plus une marge
+    niveau = [0] * nb_articles
+    plus_bas = [0] * nb_articles
+    for _, article, variation, _ in mouvements:
+        niveau[article] += variation
+        plus_bas[article] = min(plus_bas[article], niveau[article])
+    ouverture = [-plus_bas[i] + rng.randint(0, 60) for i in indices]
+
+    # Codes-barres: étiquette interne (EAN-13 en 2...) pour tous, EAN fabricant pour certains.
+    # Tirés à part pour que le reste de la base ne dépende pas de leur présence
+    rng_codes = random.Random(f"{graine}-codes")
+    codes = []
+    for i in indices:
+        interne = f"2{i + 1:011d}"
+        codes.append((interne + cle_ean(interne), i + 1))
+        if rng_codes.random() < PART_CODES_FABRICANT:
+            fabricant = f"3{rng_codes.randrange(10 ** 11):011d}"
+            codes.append((fabricant + cle_ean(fabricant), i + 1))
+
+    if os.path.exists(chemin):
+        os.remove(chemin)
+    db = DatabaseManager(chemin)
+    with db.transaction() as cursor:
+        cursor.executemany("""
+            INSERT INTO articles (id, designation, categorie, quantite, unite, prix_unitaire,
+                                  seuil_minimum, date_creation)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(i + 1, designation, categorie, ouverture[i] + niveau[i], unite, prix,
+               rng.choice([5, 10, 20, 30]), f"{debut.isoformat()} 08:00:00")
+              for i, (designation, categorie, unite, prix) in enumerate(articles)])
+        cursor.executemany("INSERT OR IGNORE INTO codes_barres (code, article_id) VALUES (?, ?)", codes)
+        # Indexation plein texte des mouvements en une requête par table, comme à l'import
+        cursor.execute("UPDATE indexation_differee SET active = 1")
+        cursor.executemany("""
+            INSERT INTO entrees (article_id, quantite, date_entree, fournisseur, prix_total, commentaire)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(article + 1, ligne[1], jour.isoformat(), *ligne[2:])
+              for jour, article, _, ligne in mouvements if ligne[0] == 'entrees'])
+        cursor.executemany("""
+            INSERT INTO sorties (article_id, quantite, date_sortie, motif, utilisateur, commentaire)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(article + 1, ligne[1], jour.isoformat(), *ligne[2:])
+              for jour, article, _, ligne in mouvements if ligne[0] == 'sorties'])
+        for table in ('entrees', 'sorties'):
+            type_recherche, principal, secondaire = INDEXATION_RECHERCHE[table]
+            cursor.execute(f"""
+                INSERT INTO recherche (rowid, principal, secondaire)
+                SELECT id * 4 + {type_recherche}, {principal}, {secondaire} FROM {table}
+            """)
+        cursor.execute("UPDATE indexation_differee SET active = 0")
+
+        # Journal: ouverture datée du début de l'historique, puis les mouvements
+        cursor.executemany("""
+            INSERT INTO journal_stock (article_id, date_mouvement, variation, nature)
+            VALUES (?, ?, ?, 'ouverture')
+        """, [(i + 1, debut.isoformat(), ouverture[i]) for i in indices if ouverture[i]])
+        db.journaliser(cursor, 'entrees', 0)
+        db.journaliser(cursor, 'sorties', 0)
+
+    # Comme une base en service: fins de mois déjà clôturées
+    StockService(db).cloturer_mois_ecoules()
+    db.close()
+
+    # Tout dans le fichier principal, pour pouvoir le copier seul
+    conn = sqlite3.connect(chemin)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return time.perf_counter() - debut_chrono
+
+
+def chemin_base(dossier, nb_articles, nb_mouvements, graine, fin):
+    return os.path.join(dossier, f"base_{nb_articles}x{nb_mouvements}_g{graine}_{fin.isoformat()}.db")
+
+
+class Banc:
+    """Mesure les opérations de l'interface sur une copie de base, hors écran"""
+
+    def __init__(self, app, repetitions=REPETITIONS, graine=1, fin=None):
+        self.app = app
+        self.repetitions = repetitions
+        self.fin = fin or date.today()
+        self.rng = random.Random(graine)
+
+    def attendre(self, fenetre):
+        """Traite les événements jusqu'à ce que plus aucune tâche de fond ne tourne"""
+        from PyQt5.QtCore import QThreadPool
+        pool = QThreadPool.globalInstance()
+        calme = 0
+        while calme < 2:
+            pool.waitForDone(10)
+            self.app.processEvents()
+            calme = calme + 1 if fenetre.taches_en_cours == 0 and pool.activeThreadCount() == 0 else 0
+
+    def mesurer(self, operation, *args):
+        durees = []
+        for _ in range(self.repetitions):
+            debut = time.perf_counter()
+            operation(*args)
+            durees.append(time.perf_counter() - debut)
+        return durees
+
+    def executer(self, base):
+        """Retourne {opération: [durées]} pour une base (copiée, jamais modifiée)"""
+        import vaisselles
+
+        resultats = {}
+        dossier_travail = tempfile.mkdtemp(prefix="bench_")
+        repertoire = os.getcwd()
+        try:
+            # L'application ouvre stock_vaisselle.db dans le répertoire courant
+            shutil.copy(base, os.path.join(dossier_travail, "stock_vaisselle.db"))
+            os.chdir(dossier_travail)
+
+            debut = time.perf_counter()
+            fenetre = vaisselles.StockManagementApp()
+            self.attendre(fenetre)
+            resultats['demarrage'] = [time.perf_counter() - debut]
+
+            resultats['load_data'] = self.mesurer(self.charger, fenetre, fenetre.load_data)
+            resultats['load_dashboard'] = self.mesurer(self.charger, fenetre, fenetre.load_dashboard)
+            resultats['filter_articles'] = self.mesurer(self.filtrer, fenetre)
+            resultats['enregistrer_vente'] = self.mesurer(self.vendre, fenetre, vaisselles.VenteDialog)
+            codes = [row[0] for row in fenetre.db_manager.execute_query(
+                "SELECT c.code FROM codes_barres c JOIN articles a ON a.id = c.article_id "
+                "WHERE a.quantite > ? ORDER BY c.code", (SCANS_VENTE * self.repetitions,)
+            )]
+            if codes:  # bases générées avant les codes-barres
+                resultats['scanner_vente'] = self.mesurer(self.scanner, fenetre, vaisselles.VenteDialog, codes)
+
+            # Rapport des mouvements sur le dernier mois complet (cas de la fin de mois)
+            fin_mois = self.fin.replace(day=1) - timedelta(days=1)
+            periodes = {'rapport_mouvements': {'date_debut': fin_mois.replace(day=1), 'date_fin': fin_mois}}
+            for rapport in fenetre.service.rapports.values():
+                nom = rapport.__name__
+                fichier = os.path.join(dossier_travail, f"{nom}.pdf")
+                resultats[nom] = self.mesurer(lambda: rapport(fichier, **periodes.get(nom, {})))
+
+            fenetre.close()
+        finally:
+            os.chdir(repertoire)
+            shutil.rmtree(dossier_travail, ignore_errors=True)
+        return resultats
+
+    def charger(self, fenetre, chargement):
+        chargement()
+        self.attendre(fenetre)
+
+    def filtrer(self, fenetre):
+        """Une série de filtres usuels: texte, catégorie, état du stock"""
+        mots = ["ass", "verre", "porcelaine bleu", "inox", "zzz", ""]
+        categories = [fenetre.category_filter.itemText(i) for i in range(fenetre.category_filter.count())]
+        for mot in mots:
+            for widget, texte in ((fenetre.search_edit, mot),
+                                  (fenetre.category_filter, self.rng.choice(categories)),
+                                  (fenetre.stock_filter, self.rng.choice(["Tous les stocks", "Stock bas"]))):
+                widget.blockSignals(True)
+                if widget is fenetre.search_edit:
+                    widget.setText(texte)
+                else:
+                    widget.setCurrentText(texte)
+                widget.blockSignals(False)
+            fenetre.filter_articles()
+        self.app.processEvents()
+
+    def vendre(self, fenetre, dialogue):
+        """Une vente de trois articles par la fenêtre de vente, jusqu'au rafraîchissement de l'écran"""
+        vente = dialogue(fenetre.service)
+        for index in self.rng.sample(range(len(vente.articles)), min(3, len(vente.articles))):
+            vente.selecteur.choisir(vente.articles[index][0])
+            vente.qte_spin.setValue(1)
+            vente.ajouter_au_panier()
+        vente.enregistrer_vente()
+        self.attendre(fenetre)
+
+    def scanner(self, fenetre, dialogue, codes):
+        """Une vente saisie à la douchette (touches simulées, articles parfois scannés deux fois)"""
+        from PyQt5.QtCore import Qt
+        from PyQt5.QtTest import QTest
+        vente = dialogue(fenetre.service)
+        distincts = self.rng.sample(codes, min(SCANS_VENTE * 2 // 3, len(codes)))
+        for code in distincts + self.rng.sample(distincts, len(distincts) // 2):
+            QTest.keyClicks(vente.scan_edit, code)
+            QTest.keyClick(vente.scan_edit, Qt.Key_Return)
+        vente.enregistrer_vente()
+        self.attendre(fenetre)
+
+
+def version_code():
+    """Commit courant du dépôt, si disponible"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def lire_tailles(texte):
+    """'200x5000,2000x500000' -> [(200, 5000), (2000, 500000)]"""
+    tailles = []
+    for taille in texte.split(','):
+        articles, _, mouvements = taille.strip().lower().partition('x')
+        tailles.append((int(articles), int(mouvements)))
+    return tailles
+
+
+def comparer(avant, apres, sortie=sys.stdout):
+    """Affiche les médianes de deux fichiers de résultats; retourne le nombre de régressions"""
+    def indexer(chemin):
+        with open(chemin, encoding='utf-8') as f:
+            resultats = json.load(f)['resultats']
+        return {(r['articles'], r['mouvements'], r['operation']): r['mediane'] for r in resultats}
+
+    anciens, nouveaux = indexer(avant), indexer(apres)
+    communes = sorted(anciens.keys() & nouveaux.keys())
+    if not communes:
+        print("Aucune mesure commune (tailles différentes?)", file=sortie)
+    regressions = 0
+    print(f"{'taille':>14} {'opération':<22} {'avant':>9} {'après':>9} {'ratio':>6}", file=sortie)
+    for cle in communes:
+        articles, mouvements, operation = cle
+        ratio = nouveaux[cle] / anciens[cle] if anciens[cle] else float('inf')
+        signal = ""
+        if ratio > SEUIL_REGRESSION:
+            regressions += 1
+            signal = "  plus lent"
+        print(f"{articles:>6}x{mouvements:<7} {operation:<22} {anciens[cle]:>8.3f}s {nouveaux[cle]:>8.3f}s "
+              f"{ratio:>6.2f}{signal}", file=sortie)
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bancs d'essai de la gestion de stocks")
+    parser.add_argument('--tailles', default=TAILLES_DEFAUT,
+                        help=f"articlesxmouvements séparés par des virgules (défaut {TAILLES_DEFAUT})")
+    parser.add_argument('--repetitions', type=int, default=REPETITIONS)
+    parser.add_argument('--graine', type=int, default=1)
+    parser.add_argument('--annees', type=int, default=3, help="années d'historique générées")
+    parser.add_argument('--fin', help="date du dernier jour d'historique AAAA-MM-JJ (défaut: aujourd'hui)")
+    parser.add_argument('--dossier', default=DOSSIER_BASES, help="dossier des bases générées (réutilisées)")
+    parser.add_argument('--sortie', default="bench.json", help="fichier JSON des résultats")
+    parser.add_argument('--generer', action='store_true', help="génère les bases sans rien mesurer")
+    parser.add_argument('--comparer', nargs=2, metavar=('AVANT', 'APRES'),
+                        help="compare deux fichiers de résultats au lieu de mesurer")
+    args = parser.parse_args(argv)
+
+    if args.comparer:
+        return 1 if comparer(*args.comparer) else 0
+
+    fin = date.fromisoformat(args.fin) if args.fin else date.today()
+    os.makedirs(args.dossier, exist_ok=True)
+    bases = []
+    for nb_articles, nb_mouvements in lire_tailles(args.tailles):
+        chemin = chemin_base(args.dossier, nb_articles, nb_mouvements, args.graine, fin)
+        if not os.path.exists(chemin):
+            print(f"Génération de {chemin}...", file=sys.stderr)
+            duree = generer_base(chemin, nb_articles, nb_mouvements, args.annees, args.graine, fin)
+            print(f"  {duree:.1f}s", file=sys.stderr)
+        bases.append((nb_articles, nb_mouvements, os.path.abspath(chemin)))
+    if args.generer:
+        return 0
+
+    # Interface hors écran, sans serveur d'affichage
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtCore import QT_VERSION_STR
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+
+    banc = Banc(app, args.repetitions, args.graine, fin)
+    resultats = []
+    for nb_articles, nb_mouvements, chemin in bases:
+        print(f"Mesures sur {nb_articles} articles, {nb_mouvements} mouvements...", file=sys.stderr)
+        for operation, durees in banc.executer(chemin).items():
+            resultats.append({
+                'articles': nb_articles, 'mouvements': nb_mouvements, 'operation': operation,
+                'durees': [round(duree, 6) for duree in durees],
+                'mediane': round(statistics.median(durees), 6), 'minimum': round(min(durees), 6),
+            })
+            print(f"  {operation:<22} {statistics.median(durees):8.3f}s", file=sys.stderr)
+
+    with open(args.sortie, 'w', encoding='utf-8') as f:
+        json.dump({
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': version_code(),
+            'graine': args.graine, 'annees': args.annees, 'fin': fin.isoformat(),
+            'repetitions': args.repetitions,
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'qt': QT_VERSION_STR,
+            'plateforme': platform.platform(),
+            'resultats': resultats,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"Résultats écrits dans {args.sortie}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,784 @@
+"""Serveur HTTP/JSON de la base de stock, et client utilisé par l'interface en mode poste
+
+Un seul processus ouvre la base; les caisses et la réserve passent par lui.
+Les lectures sont servies par un petit pool de threads (une connexion SQLite
+chacun), toutes les écritures passent par une file et un unique thread
+écrivain qui valide les demandes arrivées ensemble en un seul commit: il n'y
+a jamais deux écrivains, donc jamais de « database is locked ».
+
+    python vaisselles.py --serve --host 0.0.0.0 --port 8765
+    python vaisselles.py --serveur http://192.168.1.10:8765
+"""
+import os
+import re
+import sys
+import json
+import uuid
+import select
+import asyncio
+import tempfile
+import threading
+import http.client
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from collections import namedtuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from stock import (StockInsuffisantError, ConflitVersionError, CodeBarreError, DatabaseManager, StockService, IndexRecherche,
+                   RAPPORTS_CLI, COLONNES_IMPORT, EXPORTS, ECRIVAINS_EXPORT)
+
+PORT_DEFAUT = 8765
+LECTEURS = 4                 # threads (et connexions) de lecture
+TAILLE_LOT_ECRITURE = 64     # demandes d'écriture validées au plus par commit
+ATTENTE_CHANGEMENTS = 25     # secondes d'attente d'un client sur /changements
+HISTORIQUE_CHANGEMENTS = 1000
+CORPS_MAX = 256 * 1024 * 1024
+
+# Tables signalées quand un client doit tout recharger
+TOUTES_TABLES = ['articles', 'stock', 'entrees', 'sorties', 'alertes']
+
+TYPES_CONTENU = {
+    '.pdf': "application/pdf",
+    '.csv': "text/csv; charset=utf-8",
+    '.xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    '.parquet': "application/vnd.apache.parquet",
+}
+
+class ErreurHTTP(Exception):
+    """Erreur renvoyée au client avec un code HTTP"""
+    def __init__(self, statut, message):
+        self.statut = statut
+        super().__init__(message)
+
+class ErreurServeur(Exception):
+    """Erreur signalée par le serveur à un client"""
+    def __init__(self, statut, message):
+        self.statut = statut
+        super().__init__(message)
+
+# Requête décodée: groupes du chemin, paramètres de l'URL, corps brut
+Requete = namedtuple('Requete', 'groupes params corps')
+# Réponse binaire (rapport, export) plutôt que JSON
+Fichier = namedtuple('Fichier', 'contenu type_contenu entetes')
+
+def corps_json(requete):
+    try:
+        return json.loads(requete.corps or b"null")
+    except ValueError as e:
+        raise ErreurHTTP(400, f"JSON invalide: {e}")
+
+def fichier_temporaire(extension):
+    descripteur, chemin = tempfile.mkstemp(suffix=extension, prefix="vaisselles_")
+    os.close(descripteur)
+    return chemin
+
+def lire_et_supprimer(chemin):
+    try:
+        with open(chemin, 'rb') as fichier:
+            return fichier.read()
+    finally:
+        os.remove(chemin)
+
+class ServeurStock:
+    """Serveur asyncio: routes JSON, pool de lecture et file d'écriture unique"""
+
+    def __init__(self, db_path="stock_vaisselle.db", lecteurs=LECTEURS):
+        self.db = DatabaseManager(db_path)
+        self.service = StockService(self.db)
+        self.lecture = ThreadPoolExecutor(lecteurs, thread_name_prefix="lecture")
+        self.ecriture = ThreadPoolExecutor(1, thread_name_prefix="ecriture")
+
+        # Journal des changements publiés, lu par les clients sur /changements
+        self.instance = uuid.uuid4().hex
+        self.sequence = 0
+        self.changements = []  # [(sequence, tables, article_ids)]
+
+        self.boucle = None
+        self.file_ecriture = None
+        self._nouveau_changement = None
+        self.db.abonner(self._changement_publie)
+
+        # (méthode, chemin, fonction, mode): mode 'lecture', 'ecriture', 'ecriture_seule'
+        # (hors des lots, avec ses propres transactions) ou 'async'
+        self.routes = [(methode, re.compile(motif + "$"), fonction, mode) for methode, motif, fonction, mode in [
+            ('GET', r"/articles", self.get_articles, 'lecture'),
+            ('GET', r"/articles/disponibles", self.get_articles_disponibles, 'lecture'),
+            ('GET', r"/articles/(\d+)", self.get_article, 'lecture'),
+            ('GET', r"/articles/(\d+)/codes", self.get_codes_article, 'lecture'),
+            ('GET', r"/articles/par-code", self.get_article_par_code, 'lecture'),
+            ('POST', r"/articles", self.post_article, 'ecriture'),
+            ('PUT', r"/articles/(\d+)", self.put_article, 'ecriture'),
+            ('DELETE', r"/articles/(\d+)", self.delete_article, 'ecriture'),
+            ('GET', r"/categories", self.get_categories, 'lecture'),
+            ('GET', r"/tableau-de-bord", self.get_tableau_bord, 'lecture'),
+            ('GET', r"/ventes-du-jour", self.get_ventes_du_jour, 'lecture'),
+            ('GET', r"/alertes", self.get_alertes, 'lecture'),
+            ('POST', r"/alertes/acquitter", self.post_acquitter, 'ecriture'),
+            ('GET', r"/mouvements/(entrees|sorties)", self.get_mouvements, 'lecture'),
+            ('GET', r"/mouvements/(entrees|sorties)/nombre", self.get_nombre_mouvements, 'lecture'),
+            ('POST', r"/(entrees|sorties)", self.post_mouvements, 'ecriture'),
+            ('POST', r"/ventes", self.post_vente, 'ecriture'),
+            ('POST', r"/reservations", self.post_reservation, 'ecriture'),
+            ('DELETE', r"/reservations/([\w-]+)", self.delete_reservations, 'ecriture'),
+            ('GET', r"/recherche", self.get_recherche, 'lecture'),
+            ('GET', r"/analyses", self.get_analyses, 'lecture'),
+            ('POST', r"/previsions", self.post_previsions, 'ecriture'),
+            ('POST', r"/clotures", self.post_clotures, 'ecriture'),
+            ('POST', r"/rapports/([a-z-]+)", self.post_rapport, 'lecture'),
+            ('POST', r"/imports/(articles|entrees|sorties)", self.post_import, 'ecriture_seule'),
+            ('GET', r"/exports/(articles|entrees|sorties)", self.get_export, 'async'),
+            ('GET', r"/changements", self.get_changements, 'async'),
+        ]]
+
+    # --- Lectures ---
+
+    def get_articles(self, requete):
+        ids = requete.params.get('ids')
+        return self.db.fetch_articles([int(i) for i in ids.split(',') if i] if ids is not None else None)
+
+    def get_articles_disponibles(self, requete):
+        return self.service.articles_disponibles()
+
+    def get_article(self, requete):
+        article = self.service.article(int(requete.groupes[0]))
+        if article is None:
+            raise ErreurHTTP(404, "Article introuvable")
+        return article
+
+    def get_codes_article(self, requete):
+        return self.service.codes_article(int(requete.groupes[0]))
+
+    def get_article_par_code(self, requete):
+        # Code inconnu: null plutôt qu'une erreur, c'est un résultat courant au scan
+        return self.service.article_par_code(requete.params['code'])
+
+    def get_categories(self, requete):
+        return self.db.fetch_categories()
+
+    def get_tableau_bord(self, requete):
+        return self.db.fetch_dashboard()
+
+    def get_ventes_du_jour(self, requete):
+        return self.service.ventes_du_jour()
+
+    def get_alertes(self, requete):
+        return self.service.alertes(requete.params.get('non_acquittees') == '1')
+
+    def get_mouvements(self, requete):
+        params = requete.params
+        apres = (params['apres_date'], int(params['apres_id'])) if 'apres_date' in params else None
+        return self.db.fetch_mouvements_page(
+            requete.groupes[0], params['du'], params['au'], apres, int(params.get('limite', 200))
+        )
+
+    def get_nombre_mouvements(self, requete):
+        return self.db.count_mouvements(requete.groupes[0], requete.params['du'], requete.params['au'])
+
+    def get_recherche(self, requete):
+        return self.db.search(requete.params.get('q', ""), int(requete.params.get('limite', 50)))
+
+    def get_analyses(self, requete):
+        return self.service.analyses.resume(
+            requete.params.get('frequence', "D"), int(requete.params.get('fenetre', 7))
+        )
+
+    def post_rapport(self, requete):
+        if requete.groupes[0] not in RAPPORTS_CLI:
+            raise ErreurHTTP(404, "Rapport inconnu")
+        options = corps_json(requete) or {}
+        chemin = fichier_temporaire(".pdf")
+        try:
+            self.service.rapports[RAPPORTS_CLI[requete.groupes[0]]](chemin, **options)
+        except BaseException:
+            os.remove(chemin)
+            raise
+        return Fichier(lire_et_supprimer(chemin), TYPES_CONTENU['.pdf'], {})
+
+    # --- Écritures (exécutées par le thread écrivain) ---
+
+    def post_article(self, requete):
+        return self.service.ajouter_article(corps_json(requete))
+
+    def put_article(self, requete):
+        self.service.modifier_article(int(requete.groupes[0]), corps_json(requete))
+
+    def delete_article(self, requete):
+        self.service.supprimer_article(int(requete.groupes[0]))
+
+    def post_acquitter(self, requete):
+        return self.service.acquitter_alertes((corps_json(requete) or {}).get('ids'))
+
+    def post_mouvements(self, requete):
+        lignes = corps_json(requete)
+        if isinstance(lignes, dict):
+            lignes = [lignes]
+        if requete.groupes[0] == 'entrees':
+            self.db.enregistrer_entrees(lignes)
+        else:
+            self.db.enregistrer_sorties(lignes)
+        return len(lignes)
+
+    def post_vente(self, requete):
+        vente = corps_json(requete)
+        jour = vente.get('jour')
+        self.service.enregistrer_vente(
+            [tuple(ligne) for ligne in vente['panier']], vente.get('utilisateur', "Caissier"),
+            date.fromisoformat(jour) if jour else None, vente.get('reservation')
+        )
+
+    def post_reservation(self, requete):
+        reservation = corps_json(requete)
+        return self.service.reserver(reservation['panier'], int(reservation['article_id']),
+                                     int(reservation['quantite']))
+
+    def delete_reservations(self, requete):
+        self.service.liberer_reservations(requete.groupes[0])
+
+    def post_previsions(self, requete):
+        return self.service.calculer_previsions((corps_json(requete) or {}).get('appliquer_seuils', True))
+
+    def post_clotures(self, requete):
+        return self.service.cloturer_mois_ecoules()
+
+    def post_import(self, requete):
+        extension = requete.params.get('extension', ".csv").lower()
+        if extension not in (".csv", ".xlsx"):
+            raise ErreurHTTP(400, "Format d'import non géré")
+        chemin = fichier_temporaire(extension)
+        rejets = fichier_temporaire(".rejets.csv")
+        try:
+            with open(chemin, 'wb') as fichier:
+                fichier.write(requete.corps)
+            resultat = self.service.importer(chemin, requete.groupes[0], rejets)
+            resultat['rejets'] = None
+            if resultat.pop('fichier_rejets'):
+                with open(rejets, encoding='utf-8-sig') as fichier:
+                    resultat['rejets'] = fichier.read()
+        finally:
+            os.remove(chemin)
+            if os.path.exists(rejets):
+                os.remove(rejets)
+        return resultat
+
+    def _exporter(self, requete):
+        params = requete.params
+        extension = params.get('extension', ".csv").lower()
+        if extension not in ECRIVAINS_EXPORT:
+            raise ErreurHTTP(400, "Format d'export non géré")
+        chemin = fichier_temporaire(extension)
+        try:
+            # Le point de reprise est avancé par get_export, dans la file d'écriture
+            resultat = self.service.exporter(
+                requete.groupes[0], chemin, params.get('du'), params.get('au'), params.get('depuis'),
+                avancer_reprise=False
+            )
+        except BaseException:
+            os.remove(chemin)
+            raise
+        return resultat, Fichier(lire_et_supprimer(chemin), TYPES_CONTENU[extension], {
+            'X-Lignes': resultat['lignes'], 'X-Dernier-Id': resultat['dernier_id'] or "",
+        })
+
+    async def get_export(self, requete):
+        resultat, fichier = await self.boucle.run_in_executor(self.lecture, self._exporter, requete)
+        depuis = requete.params.get('depuis')
+        if depuis:
+            # Seule l'avancée du point de reprise passe par la file d'écriture
+            await self._ecrire(partial(self.service.avancer_point_de_reprise,
+                                       depuis, requete.groupes[0], resultat['dernier_id']))
+        return fichier
+
+    # --- File d'écriture ---
+
+    async def _ecrire(self, operation, seule=False):
+        """Exécute une écriture dans le thread écrivain
+
+        seule: l'opération gère ses propres transactions (import par lots); elle ne rejoint
+        pas la transaction commune d'un lot.
+        """
+        futur = self.boucle.create_future()
+        await self.file_ecriture.put((operation, futur, seule))
+        return await futur
+
+    async def _ecrivain(self):
+        """Prend les demandes en attente et les valide ensemble, dans un seul thread"""
+        while True:
+            lot = [await self.file_ecriture.get()]
+            while not lot[-1][2] and len(lot) < TAILLE_LOT_ECRITURE and not self.file_ecriture.empty():
+                lot.append(self.file_ecriture.get_nowait())
+            # Une opération à part ferme le lot et passe après lui, dans l'ordre d'arrivée
+            seule = lot.pop() if lot[-1][2] else None
+
+            if lot:
+                operations = [operation for operation, _, _ in lot]
+                try:
+                    resultats = await self.boucle.run_in_executor(self.ecriture, self._executer_lot, operations)
+                except Exception as e:
+                    resultats = [(None, e)] * len(lot)
+                self._repondre(lot, resultats)
+
+            if seule:
+                try:
+                    resultats = [(await self.boucle.run_in_executor(self.ecriture, seule[0]), None)]
+                except Exception as e:
+                    resultats = [(None, e)]
+                self._repondre([seule], resultats)
+
+    @staticmethod
+    def _repondre(lot, resultats):
+        for (_, futur, _), (resultat, erreur) in zip(lot, resultats):
+            if futur.done():
+                continue
+            if erreur is not None:
+                futur.set_exception(erreur)
+            else:
+                futur.set_result(resultat)
+
+    def _executer_lot(self, operations):
+        """Exécute les opérations en une transaction; chacune a son point de sauvegarde
+
+        Une opération refusée (stock insuffisant...) est annulée seule, les autres sont validées.
+        """
+        resultats = []
+        with self.db.transaction():
+            for operation in operations:
+                try:
+                    with self.db.point_de_sauvegarde():
+                        resultats.append((operation(), None))
+                except Exception as e:
+                    resultats.append((None, e))
+        return resultats
+
+    # --- Changements ---
+
+    def _changement_publie(self, tables, article_ids):
+        # Appelé après chaque commit, dans le thread écrivain
+        self.boucle.call_soon_threadsafe(self._ajouter_changement, tables, article_ids)
+
+    def _ajouter_changement(self, tables, article_ids):
+        self.sequence += 1
+        self.changements.append((self.sequence, sorted(tables), None if article_ids is None else sorted(article_ids)))
+        del self.changements[:-HISTORIQUE_CHANGEMENTS]
+        self._nouveau_changement.set()
+        self._nouveau_changement = asyncio.Event()
+
+    async def get_changements(self, requete):
+        """Changements postérieurs à `depuis`, en attendant le prochain s'il n'y en a pas encore"""
+        params = requete.params
+        if 'depuis' not in params:
+            # Première demande d'un client: position actuelle du journal
+            return {'instance': self.instance, 'sequence': self.sequence, 'changements': []}
+        depuis = int(params['depuis'])
+        plus_ancien = self.changements[0][0] if self.changements else self.sequence + 1
+        if params.get('instance') not in (None, self.instance) or depuis > self.sequence \
+                or depuis + 1 < plus_ancien:
+            # Serveur redémarré ou client trop en retard: tout est à relire
+            return {'instance': self.instance, 'sequence': self.sequence,
+                    'changements': [[TOUTES_TABLES, None]]}
+
+        if depuis == self.sequence:
+            try:
+                await asyncio.wait_for(self._nouveau_changement.wait(), ATTENTE_CHANGEMENTS)
+            except asyncio.TimeoutError:
+                pass
+        return {
+            'instance': self.instance, 'sequence': self.sequence,
+            'changements': [[tables, ids] for sequence, tables, ids in self.changements if sequence > depuis],
+        }
+
+    # --- HTTP ---
+
+    async def _traiter(self, methode, cible, corps):
+        chemin, _, requete_url = cible.partition('?')
+        params = dict(parse_qsl(requete_url))
+        for methode_route, motif, fonction, mode in self.routes:
+            correspondance = motif.match(chemin)
+            if correspondance and methode_route == methode:
+                break
+        else:
+            raise ErreurHTTP(404, f"Pas de route pour {methode} {chemin}")
+
+        requete = Requete(correspondance.groups(), params, corps)
+        if mode == 'async':
+            return await fonction(requete)
+        if mode in ('ecriture', 'ecriture_seule'):
+            return await self._ecrire(partial(fonction, requete), seule=mode == 'ecriture_seule')
+        return await self.boucle.run_in_executor(self.lecture, fonction, requete)
+
+    async def _reponse(self, methode, cible, corps):
+        """Retourne (statut, type de contenu, données, en-têtes supplémentaires)"""
+        try:
+            resultat = await self._traiter(methode, cible, corps)
+        except ErreurHTTP as e:
+            statut, erreur = e.statut, {'erreur': str(e)}
+        except StockInsuffisantError as e:
+            statut, erreur = 409, {'erreur': str(e), 'type': 'StockInsuffisantError',
+                                   'details': [e.article_id, e.designation, e.demande, e.disponible]}
+        except ConflitVersionError as e:
+            statut, erreur = 409, {'erreur': str(e), 'type': 'ConflitVersionError',
+                                   'details': [e.article_id, e.designation, e.version_lue, e.version_actuelle]}
+        except CodeBarreError as e:
+            statut, erreur = 409, {'erreur': str(e), 'type': 'CodeBarreError',
+                                   'details': [e.code, e.article_id, e.designation]}
+        except (KeyError, ValueError, TypeError) as e:
+            statut, erreur = 400, {'erreur': f"Requête invalide: {e}"}
+        except Exception as e:
+            print(f"Erreur sur {methode} {cible}: {e!r}", file=sys.stderr)
+            statut, erreur = 500, {'erreur': str(e)}
+        else:
+            if isinstance(resultat, Fichier):
+                return 200, resultat.type_contenu, resultat.contenu, resultat.entetes
+            return 200, "application/json", json.dumps(resultat, default=str).encode('utf-8'), {}
+        return statut, "application/json", json.dumps(erreur).encode('utf-8'), {}
+
+    async def _connexion(self, reader, writer):
+        """Une connexion HTTP/1.1, gardée ouverte entre les requêtes (keep-alive)"""
+        try:
+            while True:
+                ligne = await reader.readline()
+                if not ligne:
+                    break
+                methode, cible, version = ligne.decode('latin-1').split()
+                entetes = {}
+                while True:
+                    ligne = await reader.readline()
+                    if ligne in (b"\r\n", b"\n", b""):
+                        break
+                    nom, _, valeur = ligne.decode('latin-1').partition(':')
+                    entetes[nom.strip().lower()] = valeur.strip()
+
+                longueur = int(entetes.get('content-length', 0))
+                if longueur > CORPS_MAX:
+                    break
+                corps = await reader.readexactly(longueur) if longueur else b""
+
+                statut, type_contenu, donnees, supplementaires = await self._reponse(methode, cible, corps)
+                fermer = entetes.get('connection', '').lower() == 'close' or version == "HTTP/1.0"
+                lignes = [
+                    f"HTTP/1.1 {statut} {http.client.responses.get(statut, '')}",
+                    f"Content-Type: {type_contenu}",
+                    f"Content-Length: {len(donnees)}",
+                    f"Connection: {'close' if fermer else 'keep-alive'}",
+                ] + [f"{nom}: {valeur}" for nom, valeur in supplementaires.items()]
+                writer.write(("\r\n".join(lignes) + "\r\n\r\n").encode('latin-1') + donnees)
+                await writer.drain()
+                if fermer:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def servir(self, host="127.0.0.1", port=PORT_DEFAUT, pret=None):
+        """Démarre le serveur et tourne jusqu'à annulation"""
+        self.boucle = asyncio.get_running_loop()
+        self.file_ecriture = asyncio.Queue()
+        self._nouveau_changement = asyncio.Event()
+        ecrivain = asyncio.create_task(self._ecrivain())
+
+        serveur = await asyncio.start_server(self._connexion, host, port)
+        adresse = serveur.sockets[0].getsockname()
+        if pret is not None:
+            pret(adresse)
+
+        # Travaux de démarrage habituels de l'application, une fois pour tous les postes
+        for nom, operation in [("Clôtures", self.service.cloturer_mois_ecoules),
+                               ("Prévisions", self.service.calculer_previsions)]:
+            asyncio.create_task(self._travail_demarrage(nom, operation))
+
+        try:
+            async with serveur:
+                await serveur.serve_forever()
+        finally:
+            ecrivain.cancel()
+            self.lecture.shutdown()
+            self.ecriture.shutdown()
+            self.db.close()
+
+    async def _travail_demarrage(self, nom, operation):
+        try:
+            await self._ecrire(operation)
+        except Exception as e:
+            print(f"{nom} non calculées: {e}", file=sys.stderr)
+
+# Requêtes rejouées après une coupure: une écriture a pu être validée avant que la réponse ne se perde
+METHODES_REJOUABLES = {'GET', 'HEAD'}
+
+class ClientHTTP:
+    """Requêtes JSON vers le serveur, une connexion persistante par thread"""
+
+    def __init__(self, url, delai=ATTENTE_CHANGEMENTS + 35):
+        adresse = urlsplit(url if "://" in url else "http://" + url)
+        self.hote = adresse.hostname
+        self.port = adresse.port or PORT_DEFAUT
+        self.delai = delai
+        self._local = threading.local()
+
+    def _connexion(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn.sock is not None and select.select([conn.sock], [], [], 0)[0]:
+            # Lisible au repos: fermée par le serveur (arrêt, redémarrage), on en ouvre une autre
+            conn.close()
+            conn = None
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.hote, self.port, timeout=self.delai)
+        return conn
+
+    def requete(self, methode, chemin, params=None, corps=None, avec_entetes=False, rejouable=None):
+        """Envoie une requête; retourne le JSON décodé ou les octets (et les en-têtes si demandé)
+
+        rejouable: renvoi permis après une coupure (par défaut pour GET et HEAD seulement).
+        """
+        if rejouable is None:
+            rejouable = methode in METHODES_REJOUABLES
+        if params:
+            chemin += "?" + urlencode({nom: valeur for nom, valeur in params.items() if valeur is not None})
+        entetes = {}
+        if corps is not None and not isinstance(corps, bytes):
+            corps = json.dumps(corps, default=str).encode('utf-8')
+            entetes['Content-Type'] = "application/json"
+
+        for tentative in range(2):
+            conn = self._connexion()
+            try:
+                conn.request(methode, chemin, body=corps, headers=entetes)
+                reponse = conn.getresponse()
+                donnees = reponse.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # Connexion coupée en cours de requête: seules les lectures sont renvoyées
+                conn.close()
+                self._local.conn = None
+                if tentative or not rejouable:
+                    raise
+
+        if reponse.getheader('Content-Type', '').startswith("application/json"):
+            donnees = json.loads(donnees)
+        if reponse.status >= 400:
+            if isinstance(donnees, dict) and donnees.get('type') == 'StockInsuffisantError':
+                raise StockInsuffisantError(*donnees['details'])
+            if isinstance(donnees, dict) and donnees.get('type') == 'ConflitVersionError':
+                raise ConflitVersionError(*donnees['details'])
+            if isinstance(donnees, dict) and donnees.get('type') == 'CodeBarreError':
+                raise CodeBarreError(*donnees['details'])
+            message = donnees.get('erreur') if isinstance(donnees, dict) else donnees
+            raise ErreurServeur(reponse.status, message)
+        return (donnees, dict(reponse.getheaders())) if avec_entetes else donnees
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+class BaseDistante:
+    """Équivalent distant des lectures de DatabaseManager utilisées par l'interface"""
+
+    def __init__(self, url):
+        self.url = url
+        self.client = ClientHTTP(url)
+        self._abonnes = []
+        self._ecoute = None
+        self._arret = threading.Event()
+
+    def fetch_articles(self, article_ids=None):
+        ids = None if article_ids is None else ",".join(str(i) for i in article_ids)
+        return [tuple(row) for row in self.client.requete('GET', "/articles", {'ids': ids})]
+
+    def fetch_categories(self):
+        return self.client.requete('GET', "/categories")
+
+    def fetch_dashboard(self):
+        return self.client.requete('GET', "/tableau-de-bord")
+
+    def fetch_mouvements_page(self, table, date_from, date_to, apres=None, limite=200):
+        params = {'du': date_from, 'au': date_to, 'limite': limite}
+        if apres is not None:
+            params['apres_date'], params['apres_id'] = apres
+        return [tuple(row) for row in self.client.requete('GET', f"/mouvements/{table}", params)]
+
+    def count_mouvements(self, table, date_from, date_to):
+        return self.client.requete('GET', f"/mouvements/{table}/nombre", {'du': date_from, 'au': date_to})
+
+    def search(self, texte, limite=50):
+        return [tuple(row) for row in self.client.requete('GET', "/recherche", {'q': texte, 'limite': limite})]
+
+    def abonner(self, callback):
+        """Comme DatabaseManager.abonner, pour les écritures de tous les postes
+
+        Les changements sont attendus sur /changements par un thread d'écoute;
+        le callback est appelé dans ce thread.
+        """
+        self._abonnes.append(callback)
+        if self._ecoute is None:
+            self._ecoute = threading.Thread(target=self._ecouter, name="changements", daemon=True)
+            self._ecoute.start()
+
+    def _ecouter(self):
+        client = ClientHTTP(self.url)
+        instance = sequence = None
+        while not self._arret.is_set():
+            try:
+                reponse = client.requete('GET', "/changements", {'depuis': sequence, 'instance': instance})
+            except (OSError, ErreurServeur):
+                # Serveur injoignable: on réessaie; au retour, les changements manqués sont
+                # relus depuis la dernière séquence (tout, si le serveur a redémarré)
+                if self._arret.wait(2):
+                    break
+                continue
+
+            if instance is not None:
+                for tables, article_ids in reponse['changements']:
+                    for callback in list(self._abonnes):
+                        callback(frozenset(tables), None if article_ids is None else frozenset(article_ids))
+            instance, sequence = reponse['instance'], reponse['sequence']
+        client.close()
+
+    def close(self):
+        self._arret.set()
+        self.client.close()
+
+class AnalysesDistantes:
+    def __init__(self, client):
+        self.client = client
+
+    def resume(self, frequence="D", fenetre=7, nb_articles=20):
+        return self.client.requete('GET', "/analyses", {'frequence': frequence, 'fenetre': fenetre})
+
+class ServiceDistant:
+    """Équivalent distant de StockService pour l'interface en mode poste
+
+    Les fichiers (rapports, imports, exports) restent sur le poste: ils sont
+    envoyés au serveur ou reçus de lui. La progression n'est pas suivie.
+    """
+
+    def __init__(self, base):
+        self.db = base
+        self.client = base.client
+        self.analyses = AnalysesDistantes(self.client)
+        self.rapports = {
+            libelle: partial(self._rapport, nom) for nom, libelle in RAPPORTS_CLI.items()
+        }
+
+    def articles(self):
+        return self.db.fetch_articles()
+
+    def article(self, article_id):
+        return tuple(self.client.requete('GET', f"/articles/{article_id}"))
+
+    def articles_disponibles(self):
+        return [tuple(row) for row in self.client.requete('GET', "/articles/disponibles")]
+
+    def article_par_code(self, code):
+        article = self.client.requete('GET', "/articles/par-code", params={'code': code})
+        return tuple(article) if article is not None else None
+
+    def codes_article(self, article_id):
+        return self.client.requete('GET', f"/articles/{article_id}/codes")
+
+    def index_articles(self):
+        # Construit sur le poste à chaque dialogue, sans l'usage récent du serveur
+        index = IndexRecherche()
+        index.construire(self.articles())
+        return index
+
+    def ajouter_article(self, data):
+        return self.client.requete('POST', "/articles", corps=data)
+
+    def modifier_article(self, article_id, data):
+        self.client.requete('PUT', f"/articles/{article_id}", corps=data)
+
+    def supprimer_article(self, article_id):
+        self.client.requete('DELETE', f"/articles/{article_id}")
+
+    def ajouter_entree(self, data):
+        self.client.requete('POST', "/entrees", corps=data)
+
+    def ajouter_sortie(self, data):
+        self.client.requete('POST', "/sorties", corps=data)
+
+    def enregistrer_vente(self, panier, utilisateur="Caissier", jour=None, reservation=None):
+        self.client.requete('POST', "/ventes", corps={'panier': panier, 'utilisateur': utilisateur,
+                                                      'jour': jour, 'reservation': reservation})
+
+    def reserver(self, panier, article_id, quantite):
+        return self.client.requete('POST', "/reservations",
+                                   corps={'panier': panier, 'article_id': article_id, 'quantite': quantite})
+
+    def liberer_reservations(self, panier):
+        self.client.requete('DELETE', f"/reservations/{panier}")
+
+    def ventes_du_jour(self):
+        return self.client.requete('GET', "/ventes-du-jour")
+
+    def alertes(self, non_acquittees=False):
+        return [tuple(row) for row in self.client.requete(
+            'GET', "/alertes", {'non_acquittees': 1 if non_acquittees else 0}
+        )]
+
+    def acquitter_alertes(self, alerte_ids=None):
+        return self.client.requete('POST', "/alertes/acquitter", corps={'ids': alerte_ids})
+
+    def calculer_previsions(self, appliquer_seuils=True):
+        return self.client.requete('POST', "/previsions", corps={'appliquer_seuils': appliquer_seuils})
+
+    def cloturer_mois_ecoules(self):
+        return self.client.requete('POST', "/clotures")
+
+    def _rapport(self, nom, filename, date_debut=None, date_fin=None, progression=None):
+        options = {'date_debut': date_debut, 'date_fin': date_fin} if nom == 'mouvements' else {}
+        contenu = self.client.requete('POST', f"/rapports/{nom}", corps=options)
+        with open(filename, 'wb') as fichier:
+            fichier.write(contenu)
+
+    def importer(self, chemin, type_import, fichier_rejets=None, taille_lot=None, progression=None):
+        if type_import not in COLONNES_IMPORT:
+            raise ValueError(f"Type d'import inconnu: {type_import}")
+        with open(chemin, 'rb') as fichier:
+            contenu = fichier.read()
+        resultat = self.client.requete(
+            'POST', f"/imports/{type_import}", {'extension': os.path.splitext(chemin)[1]}, contenu
+        )
+        rejets = resultat.pop('rejets')
+        resultat['fichier_rejets'] = None
+        if rejets:
+            resultat['fichier_rejets'] = fichier_rejets or os.path.splitext(chemin)[0] + ".rejets.csv"
+            with open(resultat['fichier_rejets'], 'w', encoding='utf-8-sig', newline='') as fichier:
+                fichier.write(rejets)
+        return resultat
+
+    def exporter(self, table, chemin, date_debut=None, date_fin=None, depuis=None,
+                 taille_lot=None, progression=None):
+        if table not in EXPORTS:
+            raise ValueError(f"Table inconnue: {table}")
+        contenu, entetes = self.client.requete('GET', f"/exports/{table}", {
+            'extension': os.path.splitext(chemin)[1], 'du': date_debut, 'au': date_fin, 'depuis': depuis,
+        }, avec_entetes=True, rejouable=not depuis)  # l'export incrémental avance son point de reprise
+        with open(chemin, 'wb') as fichier:
+            fichier.write(contenu)
+        dernier_id = entetes.get('X-Dernier-Id')
+        return {'lignes': int(entetes.get('X-Lignes', 0)), 'dernier_id': int(dernier_id) if dernier_id else None}
+
+def main(argv=None):
+    """Lance le serveur jusqu'à Ctrl+C"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="vaisselles --serve", description="Serveur de la base de stock")
+    parser.add_argument('--db', default="stock_vaisselle.db", help="chemin de la base SQLite")
+    parser.add_argument('--host', default="127.0.0.1",
+                        help="adresse d'écoute (0.0.0.0 pour accepter les autres postes)")
+    parser.add_argument('--port', type=int, default=PORT_DEFAUT)
+    args = parser.parse_args(argv)
+
+    serveur = ServeurStock(args.db)
+    try:
+        asyncio.run(serveur.servir(
+            args.host, args.port, pret=lambda adresse: print(f"Serveur de stock sur http://{adresse[0]}:{adresse[1]}")
+        ))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2887 @@
+"""Cœur métier de la gestion de stocks: base de données et opérations, sans interface
+
+Importable sans PyQt5 ni reportlab (chargé seulement pour générer un rapport):
+la fenêtre Qt, la ligne de commande et les traitements par lots s'appuient dessus.
+"""
+import os
+import sys
+import csv
+import time
+import sqlite3
+import itertools
+import threading
+import unicodedata
+import re
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from functools import lru_cache
+from collections import deque
+from datetime import datetime, date, timedelta, timezone
+
+class StockInsuffisantError(Exception):
+    """Levée quand une sortie ferait passer le stock d'un article sous zéro"""
+    def __init__(self, article_id, designation, demande, disponible):
+        self.article_id = article_id
+        self.designation = designation
+        self.demande = demande
+        self.disponible = disponible
+        super().__init__(
+            f"Stock insuffisant pour '{designation}': {demande} demandé(s), {disponible} disponible(s)"
+        )
+
+class ConflitVersionError(Exception):
+    """Levée quand un article a été modifié ailleurs depuis sa lecture (version différente)"""
+    def __init__(self, article_id, designation, version_lue, version_actuelle):
+        self.article_id = article_id
+        self.designation = designation
+        self.version_lue = version_lue
+        self.version_actuelle = version_actuelle
+        super().__init__(
+            f"'{designation}' a été modifié entre-temps (version {version_lue}, "
+            f"actuelle {version_actuelle}): rechargez la fiche avant de l'enregistrer"
+        )
+
+class CodeBarreError(Exception):
+    """Levée quand un code-barres est déjà attribué à un autre article"""
+    def __init__(self, code, article_id, designation):
+        self.code = code
+        self.article_id = article_id
+        self.designation = designation
+        super().__init__(f"Le code-barres {code} est déjà attribué à '{designation}'")
+
+def plier_texte(texte):
+    """Normalise un texte pour la recherche: minuscules et sans accents"""
+    decompose = unicodedata.normalize('NFKD', texte)
+    return ''.join(c for c in decompose if not unicodedata.combining(c)).casefold()
+
+# Migrations du schéma: (version, description, étapes), appliquées dans l'ordre et une seule fois.
+# Une étape est soit une requête SQL, soit une fonction recevant le curseur.
+MIGRATIONS = [
+    (1, "Index sur les dates et les articles des mouvements", [
+        "CREATE INDEX IF NOT EXISTS idx_sorties_date_article ON sorties (date_sortie, article_id)",
+        "CREATE INDEX IF NOT EXISTS idx_entrees_date_article ON entrees (date_entree, article_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sorties_article ON sorties (article_id)",
+        "CREATE INDEX IF NOT EXISTS idx_entrees_article ON entrees (article_id)",
+        "CREATE INDEX IF NOT EXISTS idx_articles_designation ON articles (designation)",
+    ]),
+    (2, "Index (date, id) pour la pagination des mouvements", [
+        # id étant le rowid, un index sur la date seule est trié par (date, id)
+        "CREATE INDEX IF NOT EXISTS idx_entrees_date ON entrees (date_entree)",
+        "CREATE INDEX IF NOT EXISTS idx_sorties_date ON sorties (date_sortie)",
+    ]),
+    (3, "Recherche plein texte (FTS5) sur les articles et les mouvements", [
+        # rowid = id * 4 + type (1 article, 2 entrée, 3 sortie): mise à jour par clé, sans parcours
+        """CREATE VIRTUAL TABLE IF NOT EXISTS recherche USING fts5(
+            principal, secondaire,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )""",
+        """INSERT INTO recherche (rowid, principal, secondaire)
+           SELECT id * 4 + 1, designation, categorie FROM articles""",
+        """INSERT INTO recherche (rowid, principal, secondaire)
+           SELECT id * 4 + 2, fournisseur, commentaire FROM entrees""",
+        """INSERT INTO recherche (rowid, principal, secondaire)
+           SELECT id * 4 + 3, motif || ' ' || COALESCE(utilisateur, ''), commentaire FROM sorties""",
+        """CREATE TRIGGER IF NOT EXISTS recherche_articles_ai AFTER INSERT ON articles BEGIN
+            INSERT INTO recherche (rowid, principal, secondaire)
+            VALUES (NEW.id * 4 + 1, NEW.designation, NEW.categorie);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recherche_articles_au
+           AFTER UPDATE OF designation, categorie ON articles BEGIN
+            DELETE FROM recherche WHERE rowid = OLD.id * 4 + 1;
+            INSERT INTO recherche (rowid, principal, secondaire)
+            VALUES (NEW.id * 4 + 1, NEW.designation, NEW.categorie);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recherche_articles_ad AFTER DELETE ON articles BEGIN
+            DELETE FROM recherche WHERE rowid = OLD.id * 4 + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recherche_entrees_ai AFTER INSERT ON entrees BEGIN
+            INSERT INTO recherche (rowid, principal, secondaire)
+            VALUES (NEW.id * 4 + 2, NEW.fournisseur, NEW.commentaire);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recherche_entrees_au
+           AFTER UPDATE OF fournisseur, commentaire ON entrees BEGIN
+            DELETE FROM recherche WHERE rowid = OLD.id * 4 + 2;
+            INSERT INTO recherche (rowid, principal, secondaire)
+            VALUES (NEW.id * 4 + 2, NEW.fournisseur, NEW.commentaire);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recherche_entrees_ad AFTER DELETE ON entrees BEGIN
+            DELETE FROM recherche WHERE rowid = OLD.id * 4 + 2;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recherche_sorties_ai AFTER INSERT ON sorties BEGIN
+            INSERT INTO recherche (rowid, principal, secondaire)
+            VALUES (NEW.id * 4 + 3, NEW.motif || ' ' || COALESCE(NEW.utilisateur, ''), NEW.commentaire);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recherche_sorties_au
+           AFTER UPDATE OF motif, utilisateur, commentaire ON sorties BEGIN
+            DELETE FROM recherche WHERE rowid = OLD.id * 4 + 3;
+            INSERT INTO recherche (rowid, principal, secondaire)
+            VALUES (NEW.id * 4 + 3, NEW.motif || ' ' || COALESCE(NEW.utilisateur, ''), NEW.commentaire);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recherche_sorties_ad AFTER DELETE ON sorties BEGIN
+            DELETE FROM recherche WHERE rowid = OLD.id * 4 + 3;
+        END""",
+    ]),
+]
+
+# Recalcul complet des agrégats du tableau de bord (initialisation de la migration 4;
+# la vérification utilise SQL_RECALCUL_TABLEAU_BORD et SQL_RECALCUL_VENTES_JOUR)
+SQL_RECALCUL_AGREGATS = [
+    "DELETE FROM tableau_bord",
+    """INSERT INTO tableau_bord (id, nb_articles, nb_stock_bas, valeur_stock)
+       SELECT 1, COUNT(*),
+              COALESCE(SUM(quantite <= seuil_minimum AND quantite > 0), 0),
+              COALESCE(SUM(quantite * prix_unitaire), 0)
+       FROM articles""",
+    "DELETE FROM ventes_jour",
+    """INSERT INTO ventes_jour (date_vente, montant)
+       SELECT s.date_sortie, SUM(s.quantite * a.prix_unitaire)
+       FROM sorties s
+       JOIN articles a ON s.article_id = a.id
+       GROUP BY s.date_sortie""",
+]
+
+MIGRATIONS.append((4, "Agrégats du tableau de bord maintenus par triggers", [
+    """CREATE TABLE IF NOT EXISTS tableau_bord (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        nb_articles INTEGER NOT NULL DEFAULT 0,
+        nb_stock_bas INTEGER NOT NULL DEFAULT 0,
+        valeur_stock REAL NOT NULL DEFAULT 0.0
+    )""",
+    """CREATE TABLE IF NOT EXISTS ventes_jour (
+        date_vente DATE PRIMARY KEY,
+        montant REAL NOT NULL DEFAULT 0.0
+    )""",
+    *SQL_RECALCUL_AGREGATS,
+    """CREATE TRIGGER IF NOT EXISTS tableau_bord_articles_ai AFTER INSERT ON articles BEGIN
+        UPDATE tableau_bord SET
+            nb_articles = nb_articles + 1,
+            nb_stock_bas = nb_stock_bas + (NEW.quantite <= NEW.seuil_minimum AND NEW.quantite > 0),
+            valeur_stock = valeur_stock + NEW.quantite * NEW.prix_unitaire
+        WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tableau_bord_articles_au
+       AFTER UPDATE OF quantite, seuil_minimum, prix_unitaire ON articles BEGIN
+        UPDATE tableau_bord SET
+            nb_stock_bas = nb_stock_bas
+                - (OLD.quantite <= OLD.seuil_minimum AND OLD.quantite > 0)
+                + (NEW.quantite <= NEW.seuil_minimum AND NEW.quantite > 0),
+            valeur_stock = valeur_stock
+                - OLD.quantite * OLD.prix_unitaire + NEW.quantite * NEW.prix_unitaire
+        WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tableau_bord_articles_ad AFTER DELETE ON articles BEGIN
+        UPDATE tableau_bord SET
+            nb_articles = nb_articles - 1,
+            nb_stock_bas = nb_stock_bas - (OLD.quantite <= OLD.seuil_minimum AND OLD.quantite > 0),
+            valeur_stock = valeur_stock - OLD.quantite * OLD.prix_unitaire
+        WHERE id = 1;
+    END""",
+    # Les ventes sont valorisées au prix de l'article au moment de la sortie
+    """CREATE TRIGGER IF NOT EXISTS ventes_jour_sorties_ai AFTER INSERT ON sorties BEGIN
+        INSERT INTO ventes_jour (date_vente, montant)
+        VALUES (NEW.date_sortie,
+                NEW.quantite * COALESCE((SELECT prix_unitaire FROM articles WHERE id = NEW.article_id), 0))
+        ON CONFLICT (date_vente) DO UPDATE SET montant = montant + excluded.montant;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ventes_jour_sorties_ad AFTER DELETE ON sorties BEGIN
+        UPDATE ventes_jour
+        SET montant = montant
+            - OLD.quantite * COALESCE((SELECT prix_unitaire FROM articles WHERE id = OLD.article_id), 0)
+        WHERE date_vente = OLD.date_sortie;
+    END""",
+    # Index partiel: les alertes ne parcourent que les articles sous leur seuil
+    """CREATE INDEX IF NOT EXISTS idx_articles_stock_bas
+       ON articles (quantite) WHERE quantite <= seuil_minimum""",
+]))
+
+# Texte indexé pour chaque table de mouvements: (type dans le rowid, principal, secondaire)
+INDEXATION_RECHERCHE = {
+    'entrees': (2, "fournisseur", "commentaire"),
+    'sorties': (3, "motif || ' ' || COALESCE(utilisateur, '')", "commentaire"),
+}
+
+MIGRATIONS.append((5, "Indexation plein texte différable pendant les imports en masse", [
+    # Un déclencheur FTS5 par ligne vide le tampon d'index à chaque insertion: un import
+    # suspend l'indexation dans sa propre transaction et indexe tout le lot en une requête
+    "CREATE TABLE IF NOT EXISTS indexation_differee (active INTEGER NOT NULL)",
+    """INSERT INTO indexation_differee (active)
+       SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM indexation_differee)""",
+    "DROP TRIGGER IF EXISTS recherche_entrees_ai",
+    """CREATE TRIGGER recherche_entrees_ai AFTER INSERT ON entrees
+       WHEN (SELECT active FROM indexation_differee) = 0 BEGIN
+        INSERT INTO recherche (rowid, principal, secondaire)
+        VALUES (NEW.id * 4 + 2, NEW.fournisseur, NEW.commentaire);
+    END""",
+    "DROP TRIGGER IF EXISTS recherche_sorties_ai",
+    """CREATE TRIGGER recherche_sorties_ai AFTER INSERT ON sorties
+       WHEN (SELECT active FROM indexation_differee) = 0 BEGIN
+        INSERT INTO recherche (rowid, principal, secondaire)
+        VALUES (NEW.id * 4 + 3, NEW.motif || ' ' || COALESCE(NEW.utilisateur, ''), NEW.commentaire);
+    END""",
+]))
+
+MIGRATIONS.append((6, "Points de reprise des exports incrémentaux", [
+    """CREATE TABLE IF NOT EXISTS export_watermarks (
+        nom TEXT PRIMARY KEY,
+        table_source TEXT NOT NULL,
+        dernier_id INTEGER NOT NULL,
+        date_export TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+]))
+
+MIGRATIONS.append((7, "Journal de stock et clôtures périodiques", [
+    # Journal en ajout seul de toutes les variations de stock
+    """CREATE TABLE IF NOT EXISTS journal_stock (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        article_id INTEGER NOT NULL,
+        date_mouvement DATE NOT NULL,
+        variation INTEGER NOT NULL,
+        nature TEXT NOT NULL,
+        reference INTEGER,
+        date_saisie TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_journal_article_date ON journal_stock (article_id, date_mouvement)",
+    "CREATE INDEX IF NOT EXISTS idx_journal_date ON journal_stock (date_mouvement)",
+    """CREATE TRIGGER IF NOT EXISTS journal_stock_bu BEFORE UPDATE ON journal_stock BEGIN
+        SELECT RAISE(ABORT, 'Le journal de stock est en ajout seul');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS journal_stock_bd BEFORE DELETE ON journal_stock BEGIN
+        SELECT RAISE(ABORT, 'Le journal de stock est en ajout seul');
+    END""",
+    # Stock de chaque article en fin de journée à chaque date de clôture (absent = 0)
+    """CREATE TABLE IF NOT EXISTS clotures (
+        date_cloture DATE PRIMARY KEY,
+        date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS instantanes_stock (
+        date_cloture DATE NOT NULL,
+        article_id INTEGER NOT NULL,
+        quantite INTEGER NOT NULL,
+        prix_unitaire REAL NOT NULL DEFAULT 0.0,
+        PRIMARY KEY (date_cloture, article_id)
+    ) WITHOUT ROWID""",
+    # Un mouvement antidaté corrige les clôtures déjà faites à partir de sa date
+    """CREATE TRIGGER IF NOT EXISTS journal_stock_ai AFTER INSERT ON journal_stock BEGIN
+        INSERT INTO instantanes_stock (date_cloture, article_id, quantite, prix_unitaire)
+        SELECT date_cloture, NEW.article_id, NEW.variation,
+               COALESCE((SELECT prix_unitaire FROM articles WHERE id = NEW.article_id), 0)
+        FROM clotures
+        WHERE date_cloture >= NEW.date_mouvement
+        ON CONFLICT (date_cloture, article_id) DO UPDATE SET quantite = quantite + excluded.quantite;
+    END""",
+    # Reprise de l'historique: mouvements existants, puis stock d'ouverture qui
+    # explique l'écart avec la quantité actuelle, daté au plus tôt
+    """INSERT INTO journal_stock (article_id, date_mouvement, variation, nature, reference)
+       SELECT article_id, date_entree, quantite, 'entree', id FROM entrees""",
+    """INSERT INTO journal_stock (article_id, date_mouvement, variation, nature, reference)
+       SELECT article_id, date_sortie, -quantite, 'sortie', id FROM sorties""",
+    """INSERT INTO journal_stock (article_id, date_mouvement, variation, nature, reference)
+       SELECT a.id,
+              MIN(COALESCE(date(a.date_creation, 'localtime'), '9999-12-31'),
+                  COALESCE(j.premiere_date, '9999-12-31')),
+              a.quantite - COALESCE(j.total, 0), 'ouverture', NULL
+       FROM articles a
+       LEFT JOIN (SELECT article_id, SUM(variation) AS total, MIN(date_mouvement) AS premiere_date
+                  FROM journal_stock GROUP BY article_id) j ON j.article_id = a.id
+       WHERE a.quantite != COALESCE(j.total, 0)""",
+]))
+
+MIGRATIONS.append((8, "Prévisions de consommation et suggestions d'achat", [
+    """CREATE TABLE IF NOT EXISTS previsions (
+        article_id INTEGER PRIMARY KEY,
+        taux_journalier REAL NOT NULL,
+        ecart_type REAL NOT NULL,
+        delai REAL NOT NULL,
+        stock_securite REAL NOT NULL,
+        point_commande INTEGER NOT NULL,
+        quantite_suggeree INTEGER NOT NULL,
+        date_calcul TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+]))
+
+# Niveau d'une alerte de stock selon la quantité
+SQL_NIVEAU_ALERTE = "CASE WHEN NEW.quantite <= 0 THEN 'epuise' ELSE 'stock_bas' END"
+# Numéro d'ordre des événements d'alerte (lu par l'index)
+SQL_EVENEMENT_SUIVANT = "(SELECT COALESCE(MAX(evenement), 0) + 1 FROM alertes_stock)"
+
+MIGRATIONS.append((9, "File des alertes de stock alimentée par triggers", [
+    # Une alerte est ouverte au passage sous le seuil et résolue au retour au-dessus;
+    # une seule alerte ouverte par article
+    """CREATE TABLE IF NOT EXISTS alertes_stock (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        article_id INTEGER NOT NULL,
+        niveau TEXT NOT NULL,
+        quantite INTEGER NOT NULL,
+        seuil INTEGER NOT NULL,
+        date_alerte TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+        acquittee INTEGER NOT NULL DEFAULT 0,
+        date_acquittement TIMESTAMP,
+        date_resolution TIMESTAMP,
+        evenement INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_alertes_ouvertes
+       ON alertes_stock (article_id) WHERE date_resolution IS NULL""",
+    "CREATE INDEX IF NOT EXISTS idx_alertes_evenement ON alertes_stock (evenement)",
+    f"""CREATE TRIGGER IF NOT EXISTS alertes_stock_articles_ai AFTER INSERT ON articles
+       WHEN NEW.quantite <= NEW.seuil_minimum BEGIN
+        INSERT INTO alertes_stock (article_id, niveau, quantite, seuil, evenement)
+        VALUES (NEW.id, {SQL_NIVEAU_ALERTE}, NEW.quantite, NEW.seuil_minimum, {SQL_EVENEMENT_SUIVANT});
+    END""",
+    # Passage sous le seuil, ou stock bas qui s'épuise: l'alerte (re)devient à acquitter
+    f"""CREATE TRIGGER IF NOT EXISTS alertes_stock_articles_au
+       AFTER UPDATE OF quantite, seuil_minimum ON articles
+       WHEN NEW.quantite <= NEW.seuil_minimum
+        AND (OLD.quantite > OLD.seuil_minimum OR (NEW.quantite <= 0 AND OLD.quantite > 0)) BEGIN
+        INSERT INTO alertes_stock (article_id, niveau, quantite, seuil, evenement)
+        VALUES (NEW.id, {SQL_NIVEAU_ALERTE}, NEW.quantite, NEW.seuil_minimum, {SQL_EVENEMENT_SUIVANT})
+        ON CONFLICT (article_id) WHERE date_resolution IS NULL DO UPDATE SET
+            niveau = excluded.niveau, quantite = excluded.quantite, seuil = excluded.seuil,
+            date_alerte = excluded.date_alerte, evenement = excluded.evenement,
+            acquittee = 0, date_acquittement = NULL;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS alertes_stock_articles_resolution
+       AFTER UPDATE OF quantite, seuil_minimum ON articles
+       WHEN NEW.quantite > NEW.seuil_minimum AND OLD.quantite <= OLD.seuil_minimum BEGIN
+        UPDATE alertes_stock
+        SET date_resolution = datetime('now', 'localtime'), evenement = {SQL_EVENEMENT_SUIVANT}
+        WHERE article_id = NEW.id AND date_resolution IS NULL;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS alertes_stock_articles_ad AFTER DELETE ON articles BEGIN
+        UPDATE alertes_stock
+        SET date_resolution = datetime('now', 'localtime'), evenement = {SQL_EVENEMENT_SUIVANT}
+        WHERE article_id = OLD.id AND date_resolution IS NULL;
+    END""",
+    # Alertes déjà en cours
+    """INSERT INTO alertes_stock (article_id, niveau, quantite, seuil)
+       SELECT id, CASE WHEN quantite <= 0 THEN 'epuise' ELSE 'stock_bas' END, quantite, seuil_minimum
+       FROM articles WHERE quantite <= seuil_minimum""",
+    "UPDATE alertes_stock SET evenement = id",
+]))
+
+MIGRATIONS.append((10, "Version des articles et réservations de paniers", [
+    "ALTER TABLE articles ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+    # Toute modification d'un article change sa version (écriture conditionnelle possible)
+    """CREATE TRIGGER IF NOT EXISTS articles_version_au AFTER UPDATE ON articles
+       WHEN NEW.version = OLD.version BEGIN
+        UPDATE articles SET version = OLD.version + 1 WHERE id = NEW.id;
+    END""",
+    # Quantités mises de côté par un panier en cours, jusqu'à expiration (UTC)
+    """CREATE TABLE IF NOT EXISTS reservations (
+        panier TEXT NOT NULL,
+        article_id INTEGER NOT NULL,
+        quantite INTEGER NOT NULL,
+        expiration TIMESTAMP NOT NULL,
+        PRIMARY KEY (panier, article_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_reservations_article ON reservations (article_id, expiration)",
+    "CREATE INDEX IF NOT EXISTS idx_reservations_expiration ON reservations (expiration)",
+]))
+
+MIGRATIONS.append((11, "Versions d'articles croissantes (relecture incrémentale du catalogue)", [
+    # Chaque écriture donne à l'article une version plus grande que toutes les autres:
+    # "version > dernière vue" liste ce qui a changé, quel que soit le processus
+    "DROP TRIGGER IF EXISTS articles_version_au",
+    """CREATE TRIGGER articles_version_au AFTER UPDATE ON articles
+       WHEN NEW.version = OLD.version BEGIN
+        UPDATE articles SET version = (SELECT MAX(version) FROM articles) + 1 WHERE id = NEW.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS articles_version_ai AFTER INSERT ON articles BEGIN
+        UPDATE articles SET version = (SELECT MAX(version) FROM articles) + 1 WHERE id = NEW.id;
+    END""",
+    "CREATE INDEX IF NOT EXISTS idx_articles_version ON articles (version)",
+]))
+
+MIGRATIONS.append((12, "Codes-barres des articles", [
+    # Plusieurs codes possibles par article (EAN du fabricant, étiquette interne...), chacun unique
+    """CREATE TABLE IF NOT EXISTS codes_barres (
+        code TEXT PRIMARY KEY,
+        article_id INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_codes_barres_article ON codes_barres (article_id)",
+    # Un code ajouté, retiré ou réattribué change la version de l'article: le catalogue le relit
+    """CREATE TRIGGER IF NOT EXISTS codes_barres_ai AFTER INSERT ON codes_barres BEGIN
+        UPDATE articles SET version = (SELECT MAX(version) FROM articles) + 1 WHERE id = NEW.article_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS codes_barres_ad AFTER DELETE ON codes_barres BEGIN
+        UPDATE articles SET version = (SELECT MAX(version) FROM articles) + 1 WHERE id = OLD.article_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS codes_barres_au AFTER UPDATE ON codes_barres BEGIN
+        UPDATE articles SET version = (SELECT MAX(version) FROM articles) + 1
+        WHERE id IN (OLD.article_id, NEW.article_id);
+    END""",
+]))
+
+# Ventes du jour recalculées au prix enregistré sur chaque sortie
+SQL_RECALCUL_TABLEAU_BORD = SQL_RECALCUL_AGREGATS[:2]
+SQL_RECALCUL_VENTES_JOUR = [
+    "DELETE FROM ventes_jour",
+    """INSERT INTO ventes_jour (date_vente, montant)
+       SELECT date_sortie, SUM(quantite * prix_unitaire) FROM sorties GROUP BY date_sortie""",
+]
+
+MIGRATIONS.append((13, "Prix de vente enregistré sur chaque sortie", [
+    # Sans lui, supprimer une sortie après un changement de prix faussait les ventes du jour
+    "ALTER TABLE sorties ADD COLUMN prix_unitaire REAL",
+    # Sorties existantes: le prix connu le plus proche est le prix actuel (celui de la migration 4)
+    """UPDATE sorties
+       SET prix_unitaire = COALESCE((SELECT prix_unitaire FROM articles WHERE id = sorties.article_id), 0)""",
+    """CREATE TRIGGER IF NOT EXISTS sorties_prix_ai AFTER INSERT ON sorties
+       WHEN NEW.prix_unitaire IS NULL BEGIN
+        UPDATE sorties
+        SET prix_unitaire = COALESCE((SELECT prix_unitaire FROM articles WHERE id = NEW.article_id), 0)
+        WHERE id = NEW.id;
+    END""",
+    "DROP TRIGGER IF EXISTS ventes_jour_sorties_ai",
+    """CREATE TRIGGER ventes_jour_sorties_ai AFTER INSERT ON sorties BEGIN
+        INSERT INTO ventes_jour (date_vente, montant)
+        VALUES (NEW.date_sortie, NEW.quantite * COALESCE(
+            NEW.prix_unitaire, (SELECT prix_unitaire FROM articles WHERE id = NEW.article_id), 0))
+        ON CONFLICT (date_vente) DO UPDATE SET montant = montant + excluded.montant;
+    END""",
+    "DROP TRIGGER IF EXISTS ventes_jour_sorties_ad",
+    """CREATE TRIGGER ventes_jour_sorties_ad AFTER DELETE ON sorties BEGIN
+        UPDATE ventes_jour SET montant = montant - OLD.quantite * COALESCE(OLD.prix_unitaire, 0)
+        WHERE date_vente = OLD.date_sortie;
+    END""",
+]))
+
+def cle_ean(corps):
+    """Chiffre de contrôle EAN/UPC d'un corps de code (tous les chiffres sauf le dernier)"""
+    somme = sum(int(c) * (3 if i % 2 == 0 else 1) for i, c in enumerate(reversed(corps)))
+    return str((10 - somme % 10) % 10)
+
+def normaliser_code(code):
+    """Code-barres tel qu'enregistré: sans espaces autour; ValueError si vide ou clé EAN fausse
+    
+    Les codes de 8, 12 ou 13 chiffres (EAN-8, UPC-A, EAN-13) doivent avoir une clé de contrôle
+    juste; les autres (codes internes, Code 128...) sont acceptés tels quels.
+    """
+    code = str(code).strip()
+    if not code:
+        raise ValueError("Code-barres vide")
+    if code.isdigit() and len(code) in (8, 12, 13) and cle_ean(code[:-1]) != code[-1]:
+        raise ValueError(f"Clé de contrôle invalide pour le code EAN {code}")
+    return code
+
+# Durée de vie d'une réservation de panier sans activité (secondes)
+DUREE_RESERVATION = 15 * 60
+
+# Quantité d'un article (articles.id) réservée par les autres paniers encore valides
+SQL_RESERVE_AUTRES = """(SELECT COALESCE(SUM(r.quantite), 0) FROM reservations r
+    WHERE r.article_id = articles.id AND r.panier != ? AND r.expiration > datetime('now'))"""
+
+# Report des lignes d'une table dans le journal de stock: (article, date, variation, nature)
+JOURNAL_SOURCES = {
+    'entrees': ("article_id", "date_entree", "quantite", 'entree'),
+    'sorties': ("article_id", "date_sortie", "-quantite", 'sortie'),
+    'articles': ("id", "date('now', 'localtime')", "quantite", 'creation'),
+}
+
+# Types de résultats de la recherche plein texte (rowid % 4)
+SOURCES_RECHERCHE = {1: "Article", 2: "Entrée", 3: "Sortie"}
+
+# Requêtes des onglets de mouvements: (colonnes affichées, jointure, colonne de date)
+REQUETES_MOUVEMENTS = {
+    'entrees': (
+        "e.id, a.designation, e.quantite, e.date_entree, e.fournisseur, e.prix_total, e.commentaire",
+        "entrees e JOIN articles a ON e.article_id = a.id",
+        "e.date_entree",
+    ),
+    'sorties': (
+        "s.id, a.designation, s.quantite, s.date_sortie, s.motif, s.utilisateur, s.commentaire",
+        "sorties s JOIN articles a ON s.article_id = a.id",
+        "s.date_sortie",
+    ),
+}
+
+# Trace des requêtes: VAISSELLES_TRACE_SQL=<seuil en ms> l'active dès l'ouverture de la base
+VARIABLE_TRACE = "VAISSELLES_TRACE_SQL"
+SEUIL_LENTE_MS = 100
+JOURNAL_LENTES = "requetes_lentes.log"
+ECHANTILLONS_TRACE = 2000   # derniers appels gardés par forme de requête pour les percentiles
+COLONNES_TRACE = ["Requête", "Exécutions", "Appels", "Total (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Lignes"]
+
+LITTERAUX_SQL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LISTES_SQL = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+
+@lru_cache(maxsize=2048)
+def forme_requete(sql):
+    """Forme d'une requête, pour regrouper ses exécutions: littéraux et listes de paramètres remplacés"""
+    forme = LITTERAUX_SQL.sub("?", " ".join(sql.split()))
+    return LISTES_SQL.sub("IN (?, ...)", forme)
+
+def centile(valeurs_triees, rang):
+    """Centile (rang entre 0 et 100) d'une liste triée, par la méthode du rang le plus proche"""
+    if not valeurs_triees:
+        return 0.0
+    return valeurs_triees[min(len(valeurs_triees) - 1, int(len(valeurs_triees) * rang / 100))]
+
+class StatistiquesRequete:
+    __slots__ = ('executions', 'appels', 'total', 'lignes', 'durees')
+    
+    def __init__(self):
+        self.executions = 0  # instructions vues par SQLite (trace), triggers compris
+        self.appels = 0      # appels chronométrés depuis Python
+        self.total = 0.0
+        self.lignes = 0
+        self.durees = deque(maxlen=ECHANTILLONS_TRACE)
+
+class Appel:
+    """Un appel chronométré: exécution puis lectures de ses lignes"""
+    __slots__ = ('stats', 'duree', 'journalise')
+    
+    def __init__(self, stats, duree):
+        self.stats = stats
+        self.duree = duree
+        self.journalise = False
+
+class TraceRequetes:
+    """Compteurs, latences et lignes par forme de requête, et journal des requêtes lentes
+    
+    Les exécutions (triggers compris) viennent de set_trace_callback; durées et
+    lignes lues sont mesurées par les curseurs des connexions tracées. Une requête
+    plus lente que le seuil est écrite dans le journal avec son plan d'exécution.
+    """
+    def __init__(self, seuil_ms=SEUIL_LENTE_MS, journal=JOURNAL_LENTES):
+        self.seuil = seuil_ms / 1000
+        self.journal = journal
+        self._verrou = threading.Lock()
+        self.reinitialiser()
+    
+    def reinitialiser(self):
+        with self._verrou:
+            self.formes = {}
+            self._plans = set()  # formes dont le plan a déjà été journalisé
+    
+    def _stats(self, sql):
+        forme = forme_requete(sql)
+        stats = self.formes.get(forme)
+        if stats is None:
+            stats = self.formes.setdefault(forme, StatistiquesRequete())
+        return stats
+    
+    def instruction(self, sql):
+        """Callback de set_trace_callback: une instruction lancée par SQLite"""
+        if sql.startswith("EXPLAIN"):
+            return  # plans demandés par la trace elle-même
+        with self._verrou:
+            self._stats(sql).executions += 1
+    
+    def appel(self, sql, duree, lignes):
+        """Enregistre l'exécution d'une requête depuis Python; retourne l'appel, complété par les lectures"""
+        with self._verrou:
+            stats = self._stats(sql)
+            appel = Appel(stats, duree)
+            stats.appels += 1
+            stats.total += duree
+            stats.lignes += lignes
+            stats.durees.append(appel)
+        return appel
+    
+    def lecture(self, appel, duree, lignes):
+        with self._verrou:
+            appel.duree += duree
+            appel.stats.total += duree
+            appel.stats.lignes += lignes
+    
+    def verifier(self, appel, curseur, sql, parametres):
+        """Journalise l'appel s'il a dépassé le seuil (une seule fois)"""
+        if appel.journalise or appel.duree < self.seuil:
+            return
+        appel.journalise = True
+        forme = forme_requete(sql)
+        with self._verrou:
+            nouveau_plan = forme not in self._plans
+            self._plans.add(forme)
+        
+        lignes = [f"{datetime.now().isoformat(sep=' ', timespec='milliseconds')} "
+                  f"{appel.duree * 1000:.1f} ms [{threading.current_thread().name}] {' '.join(sql.split())}"]
+        if parametres:
+            lignes.append(f"    paramètres: {str(parametres)[:500]}")
+        if nouveau_plan and parametres is not None:
+            try:
+                # Curseur brut: ni chronométré, ni compté
+                plan = sqlite3.Cursor(curseur.connection).execute(
+                    "EXPLAIN QUERY PLAN " + sql, parametres or ()
+                ).fetchall()
+                lignes.extend(f"    plan: {'  ' * bool(parent)}{detail}" for _, parent, _, detail in plan)
+            except sqlite3.Error:
+                pass  # instruction sans plan (PRAGMA, BEGIN...)
+        with self._verrou, open(self.journal, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lignes) + "\n")
+    
+    def statistiques(self):
+        """Une ligne par forme de requête (voir COLONNES_TRACE), par temps total décroissant; durées en ms"""
+        with self._verrou:
+            formes = [(forme, stats.executions, stats.appels, stats.total, stats.lignes,
+                       sorted(appel.duree for appel in stats.durees))
+                      for forme, stats in self.formes.items()]
+        return sorted((
+            (forme, executions, appels, round(total * 1000, 1), round(centile(durees, 50) * 1000, 2),
+             round(centile(durees, 95) * 1000, 2), round(centile(durees, 99) * 1000, 2), lignes)
+            for forme, executions, appels, total, lignes, durees in formes
+        ), key=lambda ligne: ligne[3], reverse=True)
+
+class CurseurTrace(sqlite3.Cursor):
+    """Curseur qui chronomètre ses requêtes et ses lectures pour la trace de sa connexion"""
+    _appel = None
+    
+    def execute(self, sql, parameters=()):
+        debut = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._mesurer(sql, parameters, time.perf_counter() - debut)
+    
+    def executemany(self, sql, seq_of_parameters):
+        debut = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._mesurer(sql, None, time.perf_counter() - debut)
+    
+    def _mesurer(self, sql, parametres, duree):
+        trace = self.connection.trace
+        if trace is None:
+            self._appel = None
+            return
+        lignes = max(self.rowcount, 0) if self.description is None else 0
+        self._appel = trace.appel(sql, duree, lignes)
+        self._requete = (trace, sql, parametres)
+        trace.verifier(self._appel, self, sql, parametres)
+    
+    def _lu(self, debut, lignes, fin):
+        if self._appel is not None:
+            trace, sql, parametres = self._requete
+            trace.lecture(self._appel, time.perf_counter() - debut, lignes)
+            if fin:
+                trace.verifier(self._appel, self, sql, parametres)
+    
+    def fetchone(self):
+        debut = time.perf_counter()
+        row = super().fetchone()
+        self._lu(debut, row is not None, row is None)
+        return row
+    
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        debut = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._lu(debut, len(rows), len(rows) < size)
+        return rows
+    
+    def fetchall(self):
+        debut = time.perf_counter()
+        rows = super().fetchall()
+        self._lu(debut, len(rows), True)
+        return rows
+    
+    def __next__(self):
+        debut = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._lu(debut, 0, True)
+            raise
+        self._lu(debut, 1, False)
+        return row
+
+class ConnexionTracee(sqlite3.Connection):
+    """Connexion dont les curseurs sont chronométrés quand une trace y est attachée"""
+    trace = None
+    
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = sqlite3.Cursor if self.trace is None else CurseurTrace
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        if self.trace is None:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        if self.trace is None:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# Usage récent des articles (nombre de sorties sur 30 jours), pour classer les suggestions
+SQL_USAGE_RECENT = """SELECT article_id, COUNT(*) FROM sorties
+    WHERE date_sortie >= date('now', 'localtime', '-30 days') GROUP BY article_id"""
+SUGGESTIONS_MAX = 20
+MOTS = re.compile(r"\w+")
+
+class IndexRecherche:
+    """Recherche instantanée des articles par désignation, sans accents ni casse
+    
+    Les débuts de mots sont cherchés par dichotomie dans une liste triée, les
+    morceaux de mots (3 caractères et plus) par trigrammes. Les résultats sont
+    classés par qualité de correspondance (début de désignation, débuts de mots,
+    morceaux), puis usage récent et désignation. Mis à jour article par article;
+    utilisable depuis plusieurs threads.
+    """
+    def __init__(self, usage=None):
+        self.textes = {}       # id -> désignation pliée
+        self.mots = []         # (mot plié, id), trié
+        self.trigrammes = {}   # trigramme -> ids
+        self.usage = dict(usage or {})
+        self._ordre = None     # ids par usage décroissant puis désignation, refait après un changement
+        self._verrou = threading.Lock()
+    
+    @staticmethod
+    def _trigrammes(texte):
+        return {texte[i:i + 3] for i in range(len(texte) - 2)}
+    
+    def construire(self, articles):
+        """Réindexe tout à partir de lignes (id, designation, ...)"""
+        textes = {article[0]: plier_texte(article[1]) for article in articles}
+        mots = sorted((mot, article_id) for article_id, texte in textes.items() for mot in set(MOTS.findall(texte)))
+        trigrammes = {}
+        for article_id, texte in textes.items():
+            for trigramme in self._trigrammes(texte):
+                trigrammes.setdefault(trigramme, set()).add(article_id)
+        with self._verrou:
+            self.textes, self.mots, self.trigrammes = textes, mots, trigrammes
+            self._ordre = None
+    
+    def ajouter(self, article_id, designation):
+        """Indexe un article (nouveau ou renommé)"""
+        texte = plier_texte(designation)
+        with self._verrou:
+            if self.textes.get(article_id) == texte:
+                return
+            self._retirer(article_id)
+            self.textes[article_id] = texte
+            for mot in set(MOTS.findall(texte)):
+                insort(self.mots, (mot, article_id))
+            for trigramme in self._trigrammes(texte):
+                self.trigrammes.setdefault(trigramme, set()).add(article_id)
+    
+    def retirer(self, article_id):
+        with self._verrou:
+            self._retirer(article_id)
+    
+    def _retirer(self, article_id):
+        self._ordre = None
+        texte = self.textes.pop(article_id, None)
+        if texte is None:
+            return
+        for mot in set(MOTS.findall(texte)):
+            del self.mots[bisect_left(self.mots, (mot, article_id))]
+        for trigramme in self._trigrammes(texte):
+            ids = self.trigrammes[trigramme]
+            ids.discard(article_id)
+            if not ids:
+                del self.trigrammes[trigramme]
+    
+    def utiliser(self, article_id):
+        """Compte un choix de l'article (le fait remonter dans les suggestions)"""
+        with self._verrou:
+            self.usage[article_id] = self.usage.get(article_id, 0) + 1
+            self._ordre = None
+    
+    def _commencant_par(self, debut):
+        ids = set()
+        position = bisect_left(self.mots, (debut,))
+        while position < len(self.mots) and self.mots[position][0].startswith(debut):
+            ids.add(self.mots[position][1])
+            position += 1
+        return ids
+    
+    def rechercher(self, texte, limite=SUGGESTIONS_MAX, parmi=None):
+        """Ids des articles dont la désignation contient tous les mots tapés (début de mot
+        ou morceau de 3 caractères et plus), les meilleurs d'abord; parmi restreint les ids possibles"""
+        requete = MOTS.findall(plier_texte(texte))
+        complet = " ".join(requete)
+        with self._verrou:
+            if self._ordre is None:
+                self._ordre = sorted(self.textes, key=lambda i: (-self.usage.get(i, 0), self.textes[i], i))
+                self._rangs = {article_id: rang for rang, article_id in enumerate(self._ordre)}
+            
+            # Candidats, et parmi eux ceux dont chaque mot tapé commence un mot de la désignation
+            candidats = prefixes = None
+            for mot in requete:
+                ids = self._commencant_par(mot)
+                prefixes = ids if prefixes is None else prefixes & ids
+                if len(mot) >= 3:
+                    plus_petite = min((self.trigrammes.get(t, ()) for t in self._trigrammes(mot)), key=len)
+                    ids = ids | {i for i in plus_petite if mot in self.textes[i]}
+                candidats = ids if candidats is None else candidats & ids
+                if not candidats:
+                    return []
+            if parmi is not None and candidats is not None:
+                candidats &= set(parmi)
+            
+            def niveau(article_id):
+                if self.textes[article_id].startswith(complet):
+                    return 0
+                return 1 if article_id in prefixes else 2
+            
+            if candidats is not None and len(candidats) * 16 < len(self._ordre):
+                return sorted(candidats, key=lambda i: (niveau(i), self._rangs[i]))[:limite]
+            
+            # Beaucoup de candidats: parcours par ordre d'usage, arrêté dès que le
+            # premier niveau est plein (cas des premières lettres tapées)
+            niveaux = ([], [], [])
+            for article_id in self._ordre:
+                if candidats is None:
+                    if parmi is not None and article_id not in parmi:
+                        continue
+                    niveaux[0].append(article_id)
+                elif article_id in candidats:
+                    niveaux[niveau(article_id)].append(article_id)
+                else:
+                    continue
+                if len(niveaux[0]) >= limite:
+                    break
+            return (niveaux[0] + niveaux[1] + niveaux[2])[:limite]
+
+class CatalogueArticles:
+    """Copie en mémoire des articles, partagée par les threads d'un DatabaseManager
+    
+    Avant chaque lecture le catalogue se revalide. Sans commit de ce processus
+    (compteur d'écritures) ni d'une autre connexion (PRAGMA data_version), il est
+    servi sans requête; sinon seuls les articles de version supérieure à la
+    dernière vue sont relus, et tout est relu si des articles ont été supprimés.
+    À ne pas utiliser dans une transaction (elle verrait ses propres écritures non validées).
+    """
+    COLONNES = "id, designation, categorie, quantite, unite, prix_unitaire, seuil_minimum, date_creation, version"
+    
+    def __init__(self, db):
+        self.db = db
+        self._verrou = threading.Lock()
+        self.fiches = {}          # id -> ligne complète (colonnes de SELECT *)
+        self.version_vue = None   # plus grande version lue, None tant que rien n'est chargé
+        self.reservations = []    # (article_id, panier, quantite, expiration UTC)
+        self._vues = {}           # listes triées dérivées des fiches, refaites après un changement
+        self._index = None        # IndexRecherche, construit à la première recherche
+        self.codes = {}           # code-barres -> id
+        self.codes_par_article = {}
+    
+    def _valider(self):
+        conn = self.db.get_connection()
+        # Lu avant les requêtes: un commit arrivé pendant la relecture sera vu la fois suivante
+        etat = (conn.execute("PRAGMA data_version").fetchone()[0], self.db.generation_ecritures)
+        if self.version_vue is not None and getattr(conn, 'catalogue_vu', None) == etat:
+            return
+        
+        with self._verrou:
+            relu = self.version_vue is None
+            if relu:
+                lignes = conn.execute(f"SELECT {self.COLONNES} FROM articles").fetchall()
+                self.fiches = {ligne[0]: ligne for ligne in lignes}
+                self._charger_codes(conn)
+            else:
+                lignes = conn.execute(
+                    f"SELECT {self.COLONNES} FROM articles WHERE version > ?", (self.version_vue,)
+                ).fetchall()
+                self.fiches.update((ligne[0], ligne) for ligne in lignes)
+                if conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0] != len(self.fiches):
+                    relu = True
+                    lignes = conn.execute(f"SELECT {self.COLONNES} FROM articles").fetchall()
+                    self.fiches = {ligne[0]: ligne for ligne in lignes}
+                    self._charger_codes(conn)
+                    if self._index is not None:
+                        self._index.construire(lignes)
+                elif lignes:
+                    self._charger_codes(conn, [ligne[0] for ligne in lignes])
+                    if self._index is not None:
+                        for ligne in lignes:
+                            self._index.ajouter(ligne[0], ligne[1])
+            # Une relecture complète peut ne rien rendre (dernier article supprimé)
+            if lignes or relu:
+                self.version_vue = max((ligne[8] for ligne in self.fiches.values()), default=0)
+                self._vues.clear()
+            self.reservations = conn.execute(
+                "SELECT article_id, panier, quantite, expiration FROM reservations"
+            ).fetchall()
+        conn.catalogue_vu = etat
+    
+    def _charger_codes(self, conn, article_ids=None):
+        """Relit les codes-barres des articles donnés (de tous si None ou s'ils sont nombreux)"""
+        if article_ids is None or len(article_ids) > 500:
+            self.codes, self.codes_par_article = {}, {}
+            lignes = conn.execute("SELECT code, article_id FROM codes_barres").fetchall()
+        else:
+            for article_id in article_ids:
+                for code in self.codes_par_article.pop(article_id, ()):
+                    if self.codes.get(code) == article_id:
+                        del self.codes[code]
+            lignes = conn.execute(
+                f"SELECT code, article_id FROM codes_barres WHERE article_id IN ({', '.join('?' * len(article_ids))})",
+                article_ids
+            ).fetchall()
+        for code, article_id in lignes:
+            self.codes[code] = article_id
+            self.codes_par_article.setdefault(article_id, []).append(code)
+    
+    def _vue(self, nom, calcul):
+        self._valider()
+        with self._verrou:
+            vue = self._vues.get(nom)
+            if vue is None:
+                vue = self._vues[nom] = calcul()
+            return vue
+    
+    def articles(self):
+        """Colonnes de l'onglet Articles, triées par désignation"""
+        return list(self._vue('articles', lambda: [
+            fiche[:7] for fiche in sorted(self.fiches.values(), key=lambda fiche: fiche[1])
+        ]))
+    
+    def lignes(self, article_ids):
+        """Colonnes de l'onglet Articles pour les articles donnés (ceux qui existent), par id"""
+        self._valider()
+        with self._verrou:
+            return [self.fiches[i][:7] for i in sorted(set(article_ids)) if i in self.fiches]
+    
+    def fiche(self, article_id):
+        self._valider()
+        with self._verrou:
+            return self.fiches.get(article_id)
+    
+    def par_code(self, code):
+        """Fiche de l'article portant ce code-barres, ou None"""
+        self._valider()
+        with self._verrou:
+            return self.fiches.get(self.codes.get(code))
+    
+    def codes_de(self, article_id):
+        self._valider()
+        with self._verrou:
+            return sorted(self.codes_par_article.get(article_id, ()))
+    
+    def categories(self):
+        return list(self._vue('categories', lambda: sorted({fiche[2] for fiche in self.fiches.values()})))
+    
+    def index(self):
+        """Index de recherche des désignations, construit au premier appel puis tenu à jour"""
+        self._valider()
+        with self._verrou:
+            if self._index is None:
+                conn = self.db.get_connection()
+                self._index = IndexRecherche(conn.execute(SQL_USAGE_RECENT).fetchall())
+                self._index.construire(self.fiches.values())
+            return self._index
+    
+    def disponibles(self, panier=""):
+        """(id, designation, prix_unitaire, quantité non réservée par les autres paniers), si positive"""
+        articles = self._vue('par_designation', lambda: sorted(self.fiches.values(), key=lambda fiche: fiche[1]))
+        maintenant = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        reserve = {}
+        for article_id, autre_panier, quantite, expiration in self.reservations:
+            if autre_panier != panier and expiration > maintenant:
+                reserve[article_id] = reserve.get(article_id, 0) + quantite
+        return [(fiche[0], fiche[1], fiche[5], fiche[3] - reserve.get(fiche[0], 0)) for fiche in articles
+                if fiche[3] - reserve.get(fiche[0], 0) > 0]
+
+class DatabaseManager:
+    # Pragmas appliqués à chaque nouvelle connexion (None = valeur SQLite par défaut)
+    PRAGMAS_PAR_DEFAUT = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,      # en Kio, soit ~16 Mo
+        'mmap_size': 268435456,    # 256 Mo
+    }
+
+    def __init__(self, db_path="stock_vaisselle.db", pragmas=None, trace_sql=None):
+        self.db_path = db_path
+        self.pragmas = dict(self.PRAGMAS_PAR_DEFAUT)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        
+        # Trace des requêtes (désactivée par défaut): seuil des requêtes lentes en ms
+        if trace_sql is None and os.environ.get(VARIABLE_TRACE):
+            try:
+                trace_sql = float(os.environ[VARIABLE_TRACE])
+            except ValueError:
+                trace_sql = SEUIL_LENTE_MS
+        self.trace = TraceRequetes(trace_sql) if trace_sql is not None else None
+        self.trace_active = self.trace is not None
+        
+        # Une connexion persistante par thread, gardée ouverte entre les requêtes
+        self._local = threading.local()
+        self._connexions = []
+        self._verrou = threading.Lock()
+        
+        # Abonnés aux changements: callback(tables, article_ids)
+        self._abonnes = []
+        
+        # Numéro du dernier commit fait par ce processus
+        self._ecritures = itertools.count(1)
+        self.generation_ecritures = 0
+        
+        self.init_database()
+        
+        # Dernier événement de la file des alertes déjà signalé
+        self._evenement_alertes = self.dernier_evenement_alertes()
+        
+        # Catalogue des articles en mémoire, revalidé après chaque commit
+        self.catalogue = CatalogueArticles(self)
+    
+    def get_connection(self):
+        """Retourne la connexion du thread courant, ouverte au premier appel"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=ConnexionTracee)
+            if self.trace_active:
+                self._tracer(conn, self.trace)
+            for nom, valeur in self.pragmas.items():
+                if valeur is not None:
+                    conn.execute(f"PRAGMA {nom} = {valeur}")
+            self._local.conn = conn
+            with self._verrou:
+                self._connexions.append(conn)
+        return conn
+    
+    @staticmethod
+    def _tracer(conn, trace):
+        conn.trace = trace
+        conn.set_trace_callback(trace.instruction if trace else None)
+    
+    def activer_trace(self, seuil_ms=None, journal=None):
+        """Active la trace des requêtes sur toutes les connexions (les statistiques déjà prises sont gardées)"""
+        if self.trace is None:
+            self.trace = TraceRequetes()
+        if seuil_ms is not None:
+            self.trace.seuil = seuil_ms / 1000
+        if journal:
+            self.trace.journal = journal
+        with self._verrou:
+            self.trace_active = True
+            for conn in self._connexions:
+                self._tracer(conn, self.trace)
+        return self.trace
+    
+    def desactiver_trace(self):
+        """Arrête la trace; les statistiques restent consultables dans self.trace"""
+        with self._verrou:
+            self.trace_active = False
+            for conn in self._connexions:
+                self._tracer(conn, None)
+    
+    def close(self):
+        """Ferme toutes les connexions ouvertes (à appeler à la fermeture de l'application)"""
+        with self._verrou:
+            connexions, self._connexions = self._connexions, []
+            self._local = threading.local()
+        
+        for conn in connexions:
+            conn.close()
+    
+    def init_database(self):
+        """Initialise la base de données avec les tables nécessaires"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # Table des articles
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                designation TEXT NOT NULL,
+                categorie TEXT NOT NULL,
+                quantite INTEGER DEFAULT 0,
+                unite TEXT DEFAULT 'pièce',
+                prix_unitaire REAL DEFAULT 0.0,
+                seuil_minimum INTEGER DEFAULT 10,
+                date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Table des entrées
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS entrees (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                article_id INTEGER,
+                quantite INTEGER NOT NULL,
+                date_entree DATE NOT NULL,
+                fournisseur TEXT,
+                prix_total REAL DEFAULT 0.0,
+                commentaire TEXT,
+                FOREIGN KEY (article_id) REFERENCES articles (id)
+            )
+        ''')
+        
+        # Table des sorties
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sorties (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                article_id INTEGER,
+                quantite INTEGER NOT NULL,
+                date_sortie DATE NOT NULL,
+                motif TEXT NOT NULL,
+                utilisateur TEXT,
+                commentaire TEXT,
+                FOREIGN KEY (article_id) REFERENCES articles (id)
+            )
+        ''')
+        
+        # Table des utilisateurs
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS utilisateurs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nom_utilisateur TEXT UNIQUE NOT NULL,
+                mot_de_passe TEXT NOT NULL,
+                role TEXT DEFAULT 'utilisateur',
+                date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Insérer un utilisateur admin par défaut
+        cursor.execute('''
+            INSERT OR IGNORE INTO utilisateurs (nom_utilisateur, mot_de_passe, role)
+            VALUES ('admin', 'admin123', 'admin')
+        ''')
+        
+        conn.commit()
+        cursor.close()
+
+        self.migrate()
+
+    def get_schema_version(self):
+        """Retourne la version actuelle du schéma (0 si aucune migration appliquée)"""
+        return self.execute_query("SELECT COALESCE(MAX(version), 0) FROM schema_version")[0][0]
+
+    def migrate(self):
+        """Applique les migrations en attente, chacune dans sa propre transaction"""
+        self.execute_query('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                date_application TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        version_actuelle = self.get_schema_version()
+        appliquees = 0
+
+        for version, description, etapes in MIGRATIONS:
+            if version <= version_actuelle:
+                continue
+
+            with self.transaction() as cursor:
+                for etape in etapes:
+                    if callable(etape):
+                        etape(cursor)
+                    else:
+                        cursor.execute(etape)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, description)
+                )
+            appliquees += 1
+
+        if appliquees:
+            # Statistiques à jour pour que le planificateur utilise les nouveaux index
+            self.execute_query("ANALYZE")
+
+    def in_transaction(self):
+        """Indique si une transaction explicite est en cours dans le thread courant"""
+        return getattr(self._local, 'profondeur', 0) > 0
+    
+    @contextmanager
+    def transaction(self):
+        """Unité de travail: tout ce qui est exécuté dans le bloc est validé en un seul commit.
+        
+        Les transactions imbriquées sont fusionnées dans la transaction englobante.
+        En cas d'exception, tout le bloc est annulé.
+        """
+        conn = self.get_connection()
+        profondeur = getattr(self._local, 'profondeur', 0)
+        if profondeur == 0:
+            # IMMEDIATE: on prend le verrou d'écriture dès le début pour éviter les interblocages
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.profondeur = profondeur + 1
+        
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        except BaseException:
+            self._local.profondeur = profondeur
+            if profondeur == 0:
+                conn.rollback()
+                self._local.changements = None
+            raise
+        else:
+            self._local.profondeur = profondeur
+            if profondeur == 0:
+                conn.commit()
+                self.generation_ecritures = next(self._ecritures)
+                self._publier_changements()
+        finally:
+            cursor.close()
+    
+    @contextmanager
+    def point_de_sauvegarde(self):
+        """Dans une transaction: si le bloc échoue, seul le bloc (et ce qu'il a notifié) est annulé"""
+        conn = self.get_connection()
+        en_attente = getattr(self._local, 'changements', None)
+        if en_attente is not None:
+            en_attente = [set(en_attente[0]), None if en_attente[1] is None else set(en_attente[1])]
+        conn.execute("SAVEPOINT point_de_sauvegarde")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK TO point_de_sauvegarde")
+            conn.execute("RELEASE point_de_sauvegarde")
+            self._local.changements = en_attente
+            raise
+        conn.execute("RELEASE point_de_sauvegarde")
+    
+    def abonner(self, callback):
+        """Abonne callback(tables, article_ids) aux écritures faites par ce DatabaseManager
+        
+        tables est un ensemble parmi 'articles' (fiche article), 'stock' (quantité seule),
+        'entrees', 'sorties' et 'alertes' (alerte de stock ouverte, résolue ou acquittée,
+        détectée par les triggers au moment de l'écriture); article_ids est l'ensemble des articles touchés, ou None
+        si on ne le sait pas. Le callback est appelé après le commit, dans le thread
+        qui a écrit.
+        """
+        self._abonnes.append(callback)
+    
+    def notifier(self, tables, article_ids=None):
+        """Signale un changement; dans une transaction, il n'est publié qu'au commit"""
+        en_attente = getattr(self._local, 'changements', None)
+        if en_attente is None:
+            en_attente = self._local.changements = [set(), set()]
+        en_attente[0].update(tables)
+        if article_ids is None or en_attente[1] is None:
+            en_attente[1] = None
+        else:
+            en_attente[1].update(article_ids)
+        
+        if not self.in_transaction():
+            self._publier_changements()
+    
+    def _publier_changements(self):
+        en_attente = getattr(self._local, 'changements', None)
+        self._local.changements = None
+        if not en_attente:
+            return
+        tables, article_ids = en_attente
+        if tables & {'articles', 'stock', 'alertes'} and self._alertes_changees():
+            tables.add('alertes')
+        for callback in list(self._abonnes):
+            callback(frozenset(tables), None if article_ids is None else frozenset(article_ids))
+    
+    def execute_query(self, query, params=None):
+        """Exécute une requête et retourne les résultats"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            
+            # Requête qui retourne des lignes (SELECT, WITH ... SELECT, PRAGMA)
+            if cursor.description is not None:
+                results = cursor.fetchall()
+            else:
+                if not self.in_transaction():
+                    conn.commit()
+                    self.generation_ecritures = next(self._ecritures)
+                results = cursor.rowcount
+        except Exception:
+            # Ne pas laisser de transaction ouverte sur la connexion persistante
+            # (dans une transaction explicite, c'est elle qui annule)
+            if not self.in_transaction():
+                conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        
+        return results
+    
+    def executemany(self, query, seq_params):
+        """Exécute une requête pour chaque jeu de paramètres, en un seul commit"""
+        with self.transaction() as cursor:
+            cursor.executemany(query, seq_params)
+            return cursor.rowcount
+    
+    def iterer(self, query, params=(), taille_lot=250):
+        """Parcourt le résultat d'une requête par lots de lignes, sans tout charger en mémoire"""
+        cursor = self.get_connection().cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(taille_lot)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+    
+    @staticmethod
+    def dernier_id(cursor, table):
+        return cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    
+    @staticmethod
+    def journaliser(cursor, table, apres_id):
+        """Reporte dans le journal de stock les lignes de table ('entrees', 'sorties'
+        ou 'articles' pour le stock initial) dont l'id dépasse apres_id"""
+        article, jour, variation, nature = JOURNAL_SOURCES[table]
+        cursor.execute(f"""
+            INSERT INTO journal_stock (article_id, date_mouvement, variation, nature, reference)
+            SELECT {article}, {jour}, {variation}, '{nature}', id FROM {table}
+            WHERE id > ? AND quantite != 0
+        """, (apres_id,))
+    
+    @staticmethod
+    def journaliser_ajustement(cursor, article_id, variation, nature='ajustement'):
+        """Journalise une variation de stock faite hors mouvement (correction, suppression)"""
+        if variation:
+            cursor.execute("""
+                INSERT INTO journal_stock (article_id, date_mouvement, variation, nature)
+                VALUES (?, date('now', 'localtime'), ?, ?)
+            """, (article_id, variation, nature))
+    
+    def enregistrer_entrees(self, lignes):
+        """Enregistre un lot d'entrées et augmente les stocks en une seule transaction
+        
+        Chaque ligne est un dict: article_id, quantite, date, fournisseur, prix_total, commentaire
+        """
+        with self.transaction() as cursor:
+            dernier_id = self.dernier_id(cursor, 'entrees')
+            cursor.executemany("""
+                INSERT INTO entrees (article_id, quantite, date_entree, fournisseur, prix_total, commentaire)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(l['article_id'], l['quantite'], str(l['date']), l.get('fournisseur', ''),
+                   l.get('prix_total', 0.0), l.get('commentaire', '')) for l in lignes])
+            self.journaliser(cursor, 'entrees', dernier_id)
+            
+            cumul = self._cumul_par_article(lignes)
+            cursor.executemany(
+                "UPDATE articles SET quantite = quantite + ? WHERE id = ?",
+                [(quantite, article_id) for article_id, quantite in cumul.items()]
+            )
+            self.notifier({'entrees', 'stock'}, cumul.keys())
+    
+    def enregistrer_sorties(self, lignes, reservation=None):
+        """Enregistre un lot de sorties (ex: un panier) et diminue les stocks en une seule transaction
+        
+        Chaque ligne est un dict: article_id, quantite, date, motif, utilisateur, commentaire.
+        Lève StockInsuffisantError (et n'enregistre rien) si un article passerait sous zéro
+        ou sous ce que les autres paniers ont réservé; `reservation` est le panier dont
+        les réservations sont consommées.
+        """
+        with self.transaction() as cursor:
+            dernier_id = self.dernier_id(cursor, 'sorties')
+            cursor.executemany("""
+                INSERT INTO sorties (article_id, quantite, date_sortie, motif, utilisateur, commentaire)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(l['article_id'], l['quantite'], str(l['date']), l['motif'],
+                   l.get('utilisateur', ''), l.get('commentaire', '')) for l in lignes])
+            self.journaliser(cursor, 'sorties', dernier_id)
+            
+            cumul = self._cumul_par_article(lignes)
+            self.notifier({'sorties', 'stock'}, cumul.keys())
+            
+            for article_id, quantite in cumul.items():
+                # Décrément conditionnel: refuse de passer sous zéro ou d'entamer les réservations des autres
+                cursor.execute(
+                    f"UPDATE articles SET quantite = quantite - ? WHERE id = ? AND quantite - {SQL_RESERVE_AUTRES} >= ?",
+                    (quantite, article_id, reservation or "", quantite)
+                )
+                if cursor.rowcount == 0:
+                    row = cursor.execute(
+                        f"SELECT designation, quantite - {SQL_RESERVE_AUTRES} FROM articles WHERE id = ?",
+                        (reservation or "", article_id)
+                    ).fetchone()
+                    designation, disponible = row if row else (f"#{article_id}", 0)
+                    raise StockInsuffisantError(article_id, designation, quantite, max(disponible, 0))
+            
+            if reservation:
+                cursor.execute("DELETE FROM reservations WHERE panier = ?", (reservation,))
+    
+    def reserver(self, panier, article_id, quantite, duree=DUREE_RESERVATION):
+        """Réserve `quantite` d'un article pour un panier (remplace sa réservation précédente)
+        
+        Lève StockInsuffisantError si le stock non réservé par les autres paniers ne suffit pas.
+        Chaque réservation prolonge celles du panier de `duree` secondes; retourne l'expiration (UTC).
+        """
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM reservations WHERE expiration <= datetime('now')")
+            row = cursor.execute(
+                f"SELECT designation, quantite - {SQL_RESERVE_AUTRES} FROM articles WHERE id = ?",
+                (panier, article_id)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Article inconnu: {article_id}")
+            designation, disponible = row
+            if quantite > disponible:
+                raise StockInsuffisantError(article_id, designation, quantite, max(disponible, 0))
+            
+            if quantite > 0:
+                cursor.execute("""
+                    INSERT INTO reservations (panier, article_id, quantite, expiration)
+                    VALUES (?, ?, ?, datetime('now'))
+                    ON CONFLICT (panier, article_id) DO UPDATE SET quantite = excluded.quantite
+                """, (panier, article_id, quantite))
+            else:
+                cursor.execute("DELETE FROM reservations WHERE panier = ? AND article_id = ?", (panier, article_id))
+            cursor.execute(
+                "UPDATE reservations SET expiration = datetime('now', ?) WHERE panier = ?",
+                (f"+{int(duree)} seconds", panier)
+            )
+            return cursor.execute("SELECT datetime('now', ?)", (f"+{int(duree)} seconds",)).fetchone()[0]
+    
+    def liberer_reservations(self, panier):
+        """Rend au stock disponible tout ce qu'un panier avait réservé"""
+        return self.execute_query("DELETE FROM reservations WHERE panier = ?", (panier,))
+    
+    def search(self, texte, limite=50):
+        """Recherche plein texte dans les articles, entrées et sorties
+        
+        Chaque mot est cherché comme préfixe, sans tenir compte des accents ni de
+        la casse; les résultats sont classés par pertinence (bm25). Si rien n'est
+        trouvé, on retente avec des mots raccourcis d'une lettre pour tolérer une
+        faute de frappe en fin de mot ("assiete" trouve "Assiette").
+        Retourne des tuples (type, id, désignation, date, détail).
+        """
+        mots = re.findall(r"\w+", plier_texte(texte))
+        if not mots:
+            return []
+        
+        resultats = self._search_fts(mots, limite)
+        if not resultats and any(len(mot) > 3 for mot in mots):
+            resultats = self._search_fts([mot[:-1] if len(mot) > 3 else mot for mot in mots], limite)
+        return resultats
+    
+    def _search_fts(self, mots, limite):
+        requete_fts = " ".join(f'"{mot}"*' for mot in mots)
+        query = """
+            SELECT r.rid % 4, r.rid / 4,
+                   COALESCE(a.designation, ae.designation, aso.designation),
+                   COALESCE(e.date_entree, s.date_sortie),
+                   CASE r.rid % 4
+                       WHEN 1 THEN a.categorie
+                       WHEN 2 THEN TRIM(COALESCE(e.fournisseur, '') || ' ' || COALESCE(e.commentaire, ''))
+                       ELSE TRIM(s.motif || ' ' || COALESCE(s.utilisateur, '') || ' ' || COALESCE(s.commentaire, ''))
+                   END
+            FROM (
+                SELECT rowid AS rid, bm25(recherche, 2.0, 1.0) AS score
+                FROM recherche
+                WHERE recherche MATCH ?
+                ORDER BY score
+                LIMIT ?
+            ) r
+            LEFT JOIN articles a ON r.rid % 4 = 1 AND a.id = r.rid / 4
+            LEFT JOIN entrees e ON r.rid % 4 = 2 AND e.id = r.rid / 4
+            LEFT JOIN articles ae ON ae.id = e.article_id
+            LEFT JOIN sorties s ON r.rid % 4 = 3 AND s.id = r.rid / 4
+            LEFT JOIN articles aso ON aso.id = s.article_id
+            ORDER BY r.score
+        """
+        return [
+            (SOURCES_RECHERCHE[source], ref_id, designation, date_mvt, detail)
+            for source, ref_id, designation, date_mvt, detail
+            in self.execute_query(query, (requete_fts, limite))
+        ]
+    
+    def fetch_mouvements_page(self, table, date_from, date_to, apres=None, limite=200):
+        """Retourne une page de mouvements triés par (date, id) décroissants
+        
+        `apres` est la clé (date, id) de la dernière ligne de la page précédente
+        (pagination par clé: le coût ne dépend pas de la position dans l'historique).
+        """
+        colonnes, source, col_date = REQUETES_MOUVEMENTS[table]
+        id_col = col_date.split('.')[0] + '.id'
+        query = f"SELECT {colonnes} FROM {source} WHERE {col_date} BETWEEN ? AND ?"
+        params = [str(date_from), str(date_to)]
+        
+        if apres is not None:
+            query += f" AND ({col_date}, {id_col}) < (?, ?)"
+            params.extend(apres)
+        
+        query += f" ORDER BY {col_date} DESC, {id_col} DESC LIMIT ?"
+        params.append(limite)
+        return self.execute_query(query, params)
+    
+    def count_mouvements(self, table, date_from, date_to):
+        """Compte les mouvements d'une période"""
+        _, source, col_date = REQUETES_MOUVEMENTS[table]
+        query = f"SELECT COUNT(*) FROM {source} WHERE {col_date} BETWEEN ? AND ?"
+        return self.execute_query(query, (str(date_from), str(date_to)))[0][0]
+    
+    def ajouter_article(self, data):
+        """Crée un article et retourne son id"""
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO articles (designation, categorie, quantite, unite, prix_unitaire, seuil_minimum)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (data['designation'], data['categorie'], data['quantite'],
+                  data['unite'], data['prix_unitaire'], data['seuil_minimum']))
+            article_id = cursor.lastrowid
+            self.journaliser_ajustement(cursor, article_id, data['quantite'], 'creation')
+            if data.get('codes'):
+                self.enregistrer_codes(cursor, article_id, data['codes'])
+            self.notifier({'articles'}, {article_id})
+        return article_id
+    
+    def modifier_article(self, article_id, data):
+        """Met à jour la fiche d'un article (un changement de quantité est journalisé comme ajustement)
+        
+        Si data contient 'version' (lue avec la fiche), l'écriture n'a lieu que si l'article
+        n'a pas changé depuis; sinon ConflitVersionError est levée. Si data contient 'codes',
+        ils remplacent les codes-barres de l'article.
+        """
+        with self.transaction() as cursor:
+            row = cursor.execute(
+                "SELECT quantite, designation, version FROM articles WHERE id = ?", (article_id,)
+            ).fetchone()
+            if row:
+                quantite, designation, version = row
+                if data.get('version') is not None and data['version'] != version:
+                    raise ConflitVersionError(article_id, designation, data['version'], version)
+                self.journaliser_ajustement(cursor, article_id, data['quantite'] - quantite)
+            cursor.execute("""
+                UPDATE articles 
+                SET designation=?, categorie=?, quantite=?, unite=?, prix_unitaire=?, seuil_minimum=?
+                WHERE id=?
+            """, (data['designation'], data['categorie'], data['quantite'],
+                  data['unite'], data['prix_unitaire'], data['seuil_minimum'], article_id))
+            if 'codes' in data:
+                self.enregistrer_codes(cursor, article_id, data['codes'])
+            self.notifier({'articles'}, {article_id})
+    
+    def supprimer_article(self, article_id):
+        """Supprime un article et tous ses mouvements"""
+        with self.transaction() as cursor:
+            # Le journal garde l'historique: la suppression y ramène le stock à zéro
+            row = cursor.execute("SELECT quantite FROM articles WHERE id = ?", (article_id,)).fetchone()
+            if row:
+                self.journaliser_ajustement(cursor, article_id, -row[0], 'suppression')
+            
+            # Supprimer les mouvements associés
+            cursor.execute("DELETE FROM entrees WHERE article_id = ?", (article_id,))
+            cursor.execute("DELETE FROM sorties WHERE article_id = ?", (article_id,))
+            cursor.execute("DELETE FROM codes_barres WHERE article_id = ?", (article_id,))
+            
+            # Supprimer l'article
+            cursor.execute("DELETE FROM articles WHERE id = ?", (article_id,))
+            self.notifier({'articles', 'entrees', 'sorties'}, {article_id})
+    
+    def enregistrer_codes(self, cursor, article_id, codes):
+        """Remplace les codes-barres d'un article (dans la transaction du curseur)
+        
+        Lève CodeBarreError si un code appartient déjà à un autre article.
+        """
+        codes = {normaliser_code(code) for code in codes}
+        anciens = {row[0] for row in cursor.execute(
+            "SELECT code FROM codes_barres WHERE article_id = ?", (article_id,)
+        )}
+        for code in anciens - codes:
+            cursor.execute("DELETE FROM codes_barres WHERE code = ?", (code,))
+        for code in sorted(codes - anciens):
+            row = cursor.execute("""
+                SELECT c.article_id, a.designation FROM codes_barres c
+                LEFT JOIN articles a ON a.id = c.article_id WHERE c.code = ?
+            """, (code,)).fetchone()
+            if row and row[1] is not None:
+                raise CodeBarreError(code, row[0], row[1])
+            # Code resté sur un article supprimé hors de l'application: il est repris
+            cursor.execute("""
+                INSERT INTO codes_barres (code, article_id) VALUES (?, ?)
+                ON CONFLICT (code) DO UPDATE SET article_id = excluded.article_id
+            """, (code, article_id))
+    
+    @staticmethod
+    def _cumul_par_article(lignes):
+        """Additionne les quantités par article (un seul UPDATE par article)"""
+        cumul = {}
+        for ligne in lignes:
+            cumul[ligne['article_id']] = cumul.get(ligne['article_id'], 0) + ligne['quantite']
+        return cumul
+
+    def get_total_ventes_du_jour(self):
+        """Retourne la somme totale des produits vendus aujourd'hui (agrégat maintenu par trigger)"""
+        today = date.today().isoformat()
+        rows = self.execute_query("SELECT montant FROM ventes_jour WHERE date_vente = ?", (today,))
+        return rows[0][0] if rows else 0
+    
+    def get_tableau_bord(self):
+        """Retourne les agrégats du tableau de bord: (nb_articles, nb_stock_bas, valeur_stock)"""
+        rows = self.execute_query("SELECT nb_articles, nb_stock_bas, valeur_stock FROM tableau_bord")
+        return rows[0] if rows else (0, 0, 0.0)
+    
+    def fetch_articles(self, article_ids=None):
+        """Retourne les articles affichés dans l'onglet Articles (tous, ou seulement ceux donnés)"""
+        query = """
+            SELECT id, designation, categorie, quantite, unite, prix_unitaire, seuil_minimum
+            FROM articles
+        """
+        if not self.in_transaction():
+            return self.catalogue.articles() if article_ids is None else self.catalogue.lignes(article_ids)
+        if article_ids is None:
+            return self.execute_query(query + " ORDER BY designation")
+        
+        article_ids = list(article_ids)
+        rows = []
+        for debut in range(0, len(article_ids), 500):
+            lot = article_ids[debut:debut + 500]
+            rows.extend(self.execute_query(
+                query + f" WHERE id IN ({', '.join('?' * len(lot))})", lot
+            ))
+        return rows
+    
+    def fetch_article(self, article_id):
+        """Retourne la fiche complète d'un article, ou None"""
+        if not self.in_transaction():
+            return self.catalogue.fiche(article_id)
+        rows = self.execute_query("SELECT * FROM articles WHERE id = ?", (article_id,))
+        return rows[0] if rows else None
+    
+    def fetch_article_par_code(self, code):
+        """Fiche complète de l'article portant ce code-barres, ou None"""
+        code = str(code).strip()
+        if not self.in_transaction():
+            return self.catalogue.par_code(code)
+        rows = self.execute_query(
+            "SELECT a.* FROM codes_barres c JOIN articles a ON a.id = c.article_id WHERE c.code = ?", (code,)
+        )
+        return rows[0] if rows else None
+    
+    def fetch_codes_article(self, article_id):
+        """Codes-barres d'un article, triés"""
+        if not self.in_transaction():
+            return self.catalogue.codes_de(article_id)
+        rows = self.execute_query("SELECT code FROM codes_barres WHERE article_id = ? ORDER BY code", (article_id,))
+        return [row[0] for row in rows]
+    
+    def fetch_categories(self):
+        """Retourne la liste triée des catégories utilisées"""
+        if not self.in_transaction():
+            return self.catalogue.categories()
+        rows = self.execute_query("SELECT DISTINCT categorie FROM articles ORDER BY categorie")
+        return [row[0] for row in rows]
+    
+    def fetch_alertes(self, non_acquittees=False):
+        """Retourne les alertes ouvertes: (alerte_id, designation, quantite, seuil, unite, acquittee)
+        
+        Les alertes à acquitter viennent en premier, puis par quantité croissante.
+        """
+        return self.execute_query(f"""
+            SELECT al.id, a.designation, a.quantite, a.seuil_minimum, a.unite, al.acquittee
+            FROM alertes_stock al JOIN articles a ON a.id = al.article_id
+            WHERE al.date_resolution IS NULL {"AND al.acquittee = 0" if non_acquittees else ""}
+            ORDER BY al.acquittee, a.quantite ASC
+        """)
+    
+    def acquitter_alertes(self, alerte_ids=None):
+        """Marque des alertes ouvertes (toutes si alerte_ids est None) comme vues; retourne leur nombre"""
+        with self.transaction() as cursor:
+            condition, params = "", ()
+            if alerte_ids is not None:
+                alerte_ids = list(alerte_ids)
+                condition = f"AND id IN ({','.join('?' * len(alerte_ids))})"
+                params = alerte_ids
+            cursor.execute(f"""
+                UPDATE alertes_stock
+                SET acquittee = 1, date_acquittement = datetime('now', 'localtime'),
+                    evenement = (SELECT MAX(evenement) + 1 FROM alertes_stock)
+                WHERE date_resolution IS NULL AND acquittee = 0 {condition}
+            """, params)
+            nombre = cursor.rowcount
+            if nombre:
+                self.notifier({'alertes'})
+        return nombre
+    
+    def dernier_evenement_alertes(self):
+        return self.execute_query("SELECT COALESCE(MAX(evenement), 0) FROM alertes_stock")[0][0]
+    
+    def _alertes_changees(self):
+        """Vrai si les triggers ont modifié la file des alertes depuis le dernier appel"""
+        dernier = self.dernier_evenement_alertes()
+        with self._verrou:
+            change = dernier > self._evenement_alertes
+            self._evenement_alertes = max(dernier, self._evenement_alertes)
+        return change
+    
+    def fetch_mouvements_recents(self, limite=10):
+        """Retourne les derniers mouvements: (date, type, designation, quantite)"""
+        # Les plus récents de chaque côté suffisent (lus par l'index de date)
+        query = """
+            SELECT * FROM (
+                SELECT date_entree as date, 'Entrée' as type, a.designation, e.quantite
+                FROM entrees e
+                JOIN articles a ON e.article_id = a.id
+                ORDER BY e.date_entree DESC, e.id DESC
+                LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT date_sortie as date, 'Sortie' as type, a.designation, s.quantite
+                FROM sorties s
+                JOIN articles a ON s.article_id = a.id
+                ORDER BY s.date_sortie DESC, s.id DESC
+                LIMIT ?
+            )
+            ORDER BY date DESC
+            LIMIT ?
+        """
+        return self.execute_query(query, (limite, limite, limite))
+    
+    def fetch_dashboard(self):
+        """Retourne toutes les données du tableau de bord en une fois"""
+        return {
+            'agregats': self.get_tableau_bord(),
+            'ventes_du_jour': self.get_total_ventes_du_jour(),
+            'alertes': self.fetch_alertes(),
+            'mouvements_recents': self.fetch_mouvements_recents(),
+        }
+    
+    def date_cloture(self, jour):
+        """Dernière clôture faite à la date donnée ou avant (None si aucune)"""
+        return self.execute_query(
+            "SELECT MAX(date_cloture) FROM clotures WHERE date_cloture <= ?", (str(jour),)
+        )[0][0]
+    
+    def stock_a_date(self, jour, article_id=None):
+        """Stock de chaque article en fin de journée à la date donnée
+        
+        Lit la dernière clôture antérieure et n'ajoute que les variations journalisées
+        depuis. Retourne [(article_id, designation, quantite, valeur)], la valeur au prix
+        de la clôture (ou au prix actuel pour un article sans clôture).
+        """
+        jour = str(jour)
+        cloture = self.date_cloture(jour) or ""
+        filtre_base, filtre_journal, filtre_article = "", "", ""
+        if article_id is not None:
+            filtre_base, filtre_journal, filtre_article = (
+                " AND article_id = :article", " AND article_id = :article", " WHERE a.id = :article"
+            )
+        return self.execute_query(f"""
+            WITH base AS (
+                SELECT article_id, quantite, prix_unitaire FROM instantanes_stock
+                WHERE date_cloture = :cloture{filtre_base}
+            ), delta AS (
+                SELECT article_id, SUM(variation) AS variation FROM journal_stock
+                WHERE date_mouvement > :cloture AND date_mouvement <= :jour{filtre_journal}
+                GROUP BY article_id
+            )
+            SELECT a.id, a.designation,
+                   COALESCE(b.quantite, 0) + COALESCE(d.variation, 0) AS quantite,
+                   (COALESCE(b.quantite, 0) + COALESCE(d.variation, 0))
+                       * COALESCE(b.prix_unitaire, a.prix_unitaire) AS valeur
+            FROM articles a
+            LEFT JOIN base b ON b.article_id = a.id
+            LEFT JOIN delta d ON d.article_id = a.id{filtre_article}
+            ORDER BY a.designation
+        """, {'cloture': cloture, 'jour': jour, 'article': article_id})
+    
+    def cloturer(self, jour):
+        """Enregistre le stock de fin de journée de chaque article à la date donnée
+        
+        Calculé depuis la clôture précédente et les seules variations intermédiaires.
+        Retourne False si cette date était déjà clôturée.
+        """
+        jour = str(jour)
+        with self.transaction() as cursor:
+            if cursor.execute("SELECT 1 FROM clotures WHERE date_cloture = ?", (jour,)).fetchone():
+                return False
+            precedente = cursor.execute(
+                "SELECT MAX(date_cloture) FROM clotures WHERE date_cloture < ?", (jour,)
+            ).fetchone()[0] or ""
+            cursor.execute("""
+                INSERT INTO instantanes_stock (date_cloture, article_id, quantite, prix_unitaire)
+                SELECT :jour, t.article_id, SUM(t.quantite), COALESCE(a.prix_unitaire, 0)
+                FROM (
+                    SELECT article_id, quantite FROM instantanes_stock WHERE date_cloture = :precedente
+                    UNION ALL
+                    SELECT article_id, variation FROM journal_stock
+                    WHERE date_mouvement > :precedente AND date_mouvement <= :jour
+                ) t
+                LEFT JOIN articles a ON a.id = t.article_id
+                GROUP BY t.article_id
+                HAVING SUM(t.quantite) != 0
+            """, {'jour': jour, 'precedente': precedente})
+            cursor.execute("INSERT INTO clotures (date_cloture) VALUES (?)", (jour,))
+        return True
+    
+    def reconcilier(self):
+        """Articles dont la quantité ne correspond pas au journal: [(id, designation, quantite, journal)]"""
+        attendu = {article_id: quantite for article_id, _, quantite, _ in self.stock_a_date("9999-12-31")}
+        return [
+            (article_id, designation, quantite, attendu.get(article_id, 0))
+            for article_id, designation, quantite in self.execute_query(
+                "SELECT id, designation, quantite FROM articles ORDER BY designation"
+            )
+            if quantite != attendu.get(article_id, 0)
+        ]
+    
+    def corriger_journal(self, ecarts):
+        """Aligne le journal sur les quantités actuelles par des lignes d'ajustement"""
+        with self.transaction() as cursor:
+            for article_id, _, quantite, journal in ecarts:
+                self.journaliser_ajustement(cursor, article_id, quantite - journal)
+    
+    def enregistrer_previsions(self, previsions, appliquer_seuils=True):
+        """Remplace les prévisions [(article_id, taux, ecart_type, delai, stock_securite, point, qte)]
+        
+        Avec appliquer_seuils, le seuil minimum des articles consommés devient leur point de commande.
+        Retourne le nombre de seuils modifiés.
+        """
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM previsions")
+            cursor.executemany("""
+                INSERT INTO previsions (article_id, taux_journalier, ecart_type, delai,
+                                        stock_securite, point_commande, quantite_suggeree)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, previsions)
+            if not appliquer_seuils:
+                return 0
+            
+            cursor.execute("""
+                SELECT a.id FROM articles a JOIN previsions p ON p.article_id = a.id
+                WHERE p.point_commande > 0 AND a.seuil_minimum != p.point_commande
+            """)
+            modifies = [article_id for article_id, in cursor.fetchall()]
+            if modifies:
+                cursor.execute("""
+                    UPDATE articles
+                    SET seuil_minimum = (SELECT p.point_commande FROM previsions p WHERE p.article_id = articles.id)
+                    WHERE id IN (SELECT p.article_id FROM previsions p
+                                 WHERE p.point_commande > 0 AND p.point_commande != articles.seuil_minimum)
+                """)
+                self.notifier({'articles'}, modifies)
+            return len(modifies)
+    
+    def recalculer_agregats(self):
+        """Recalcule entièrement les agrégats du tableau de bord depuis les tables sources"""
+        with self.transaction() as cursor:
+            for query in SQL_RECALCUL_TABLEAU_BORD + SQL_RECALCUL_VENTES_JOUR:
+                cursor.execute(query)
+
+class StockService:
+    """Opérations métier sur le stock, sans interface graphique
+    
+    Utilisé par la fenêtre Qt, la ligne de commande et les traitements par lots.
+    """
+    TITRE_STYLE = {'fontSize': 18, 'alignment': 1, 'spaceAfter': 30}  # Centré
+    
+    def __init__(self, db_manager=None):
+        self.db = db_manager if db_manager is not None else DatabaseManager()
+        self.rapports = {
+            "Inventaire complet": self.rapport_inventaire,
+            "Mouvements (Entrées/Sorties)": self.rapport_mouvements,
+            "Stocks bas": self.rapport_stocks_bas,
+            "Suggestions d'achat": self.rapport_suggestions,
+        }
+        self._analyses = None
+    
+    @property
+    def analyses(self):
+        """Moteur d'analyses des ventes (pandas, importé au premier usage)"""
+        if self._analyses is None:
+            from analyses import Analyses
+            self._analyses = Analyses(self.db)
+        return self._analyses
+    
+    # --- Articles ---
+    
+    def articles(self):
+        return self.db.fetch_articles()
+    
+    def article(self, article_id):
+        return self.db.fetch_article(article_id)
+    
+    def index_articles(self):
+        """Index de recherche instantanée des articles (voir IndexRecherche)"""
+        return self.db.catalogue.index()
+    
+    def article_par_code(self, code):
+        """Fiche de l'article scanné, ou None si le code est inconnu"""
+        return self.db.fetch_article_par_code(code)
+    
+    def codes_article(self, article_id):
+        return self.db.fetch_codes_article(article_id)
+    
+    def articles_disponibles(self):
+        """Articles vendables: (id, designation, prix_unitaire, quantite non réservée)"""
+        if not self.db.in_transaction():
+            return self.db.catalogue.disponibles()
+        return self.db.execute_query(
+            f"SELECT id, designation, prix_unitaire, quantite - {SQL_RESERVE_AUTRES} AS disponible "
+            "FROM articles WHERE disponible > 0 ORDER BY designation", ("",)
+        )
+    
+    def ajouter_article(self, data):
+        return self.db.ajouter_article(data)
+    
+    def modifier_article(self, article_id, data):
+        self.db.modifier_article(article_id, data)
+    
+    def supprimer_article(self, article_id):
+        self.db.supprimer_article(article_id)
+    
+    # --- Mouvements et ventes ---
+    
+    def ajouter_entree(self, data):
+        self.db.enregistrer_entrees([data])
+    
+    def ajouter_sortie(self, data):
+        """Enregistre une sortie; lève StockInsuffisantError si le stock ne suffit pas"""
+        self.db.enregistrer_sorties([data])
+    
+    def enregistrer_vente(self, panier, utilisateur="Caissier", jour=None, reservation=None):
+        """Enregistre un panier [(article_id, quantite), ...] en une seule transaction
+        
+        reservation: identifiant du panier dont les réservations sont consommées par la vente.
+        """
+        jour = (jour or date.today()).isoformat()
+        self.db.enregistrer_sorties([
+            {'article_id': article_id, 'quantite': quantite, 'date': jour,
+             'motif': "Vente", 'utilisateur': utilisateur, 'commentaire': ""}
+            for article_id, quantite in panier
+        ], reservation)
+    
+    def reserver(self, panier, article_id, quantite):
+        return self.db.reserver(panier, article_id, quantite)
+    
+    def liberer_reservations(self, panier):
+        self.db.liberer_reservations(panier)
+    
+    def ventes_du_jour(self):
+        return self.db.get_total_ventes_du_jour()
+    
+    def nb_stocks_bas(self):
+        return self.db.get_tableau_bord()[1]
+    
+    def alertes(self, non_acquittees=False):
+        return self.db.fetch_alertes(non_acquittees)
+    
+    def acquitter_alertes(self, alerte_ids=None):
+        return self.db.acquitter_alertes(alerte_ids)
+    
+    # --- Journal de stock et clôtures ---
+    
+    def stock_a_date(self, jour, article_id=None):
+        return self.db.stock_a_date(jour, article_id)
+    
+    def cloturer(self, jour):
+        return self.db.cloturer(jour)
+    
+    def cloturer_mois_ecoules(self):
+        """Clôture chaque fin de mois écoulée qui ne l'est pas encore; retourne les dates clôturées"""
+        premiere = self.db.execute_query("SELECT MIN(date_mouvement) FROM journal_stock")[0][0]
+        if not premiere:
+            return []
+        annee, mois = int(premiere[:4]), int(premiere[5:7])
+        aujourdhui = date.today()
+        faites = []
+        while (annee, mois) < (aujourdhui.year, aujourdhui.month):
+            annee, mois = (annee + 1, 1) if mois == 12 else (annee, mois + 1)
+            fin_mois = date(annee, mois, 1) - timedelta(days=1)
+            if self.db.cloturer(fin_mois):
+                faites.append(fin_mois)
+        return faites
+    
+    def reconcilier(self, corriger=False):
+        """Compare les quantités au journal; avec corriger, journalise les écarts en ajustements"""
+        ecarts = self.db.reconcilier()
+        if corriger and ecarts:
+            self.db.corriger_journal(ecarts)
+        return ecarts
+    
+    # --- Prévisions et réapprovisionnement ---
+    
+    def calculer_previsions(self, appliquer_seuils=True):
+        """Prévoit la consommation de tous les articles et enregistre points de commande et suggestions
+        
+        Retourne {'articles': n, 'a_commander': n, 'seuils_modifies': n}.
+        """
+        previsions = self.analyses.previsions()
+        lignes = [
+            (int(article_id), float(taux), float(ecart), float(delai), float(securite), int(point), int(qte))
+            for article_id, taux, ecart, delai, securite, point, qte in previsions.itertuples()
+        ]
+        seuils_modifies = self.db.enregistrer_previsions(lignes, appliquer_seuils)
+        return {
+            'articles': len(lignes),
+            'a_commander': sum(1 for ligne in lignes if ligne[6] > 0),
+            'seuils_modifies': seuils_modifies,
+        }
+    
+    # --- Import en masse ---
+    
+    def importer(self, chemin, type_import, fichier_rejets=None, taille_lot=5000, progression=None):
+        """Importe un fichier CSV ou XLSX d'articles, d'entrées ou de sorties
+        
+        Les lignes valides sont insérées par lots, chacun dans sa propre transaction,
+        et les stocks mis à jour par une seule requête par lot. Les lignes refusées
+        sont écrites avec leur motif dans fichier_rejets (par défaut <fichier>.rejets.csv).
+        Retourne {'importees': n, 'rejetees': n, 'fichier_rejets': chemin ou None}.
+        """
+        if type_import not in COLONNES_IMPORT:
+            raise ValueError(f"Type d'import inconnu: {type_import}")
+        fichier_rejets = fichier_rejets or os.path.splitext(chemin)[0] + ".rejets.csv"
+        importer_lot = self._importer_articles if type_import == 'articles' else self._importer_mouvements
+        
+        resultat = {'importees': 0, 'rejetees': 0, 'fichier_rejets': None}
+        article_ids = set()
+        rejets = None
+        try:
+            lignes = lire_tableau(chemin)
+            entete = next(lignes, None)
+            if entete is None:
+                return resultat
+            colonnes = self._colonnes_import(type_import, entete)
+            contexte = self._contexte_import(type_import)
+            
+            lot = []
+            for numero, valeurs in enumerate(lignes, start=2):
+                lot.append((numero, valeurs))
+                if len(lot) < taille_lot:
+                    continue
+                refusees = importer_lot(type_import, colonnes, contexte, lot, resultat, article_ids)
+                rejets = self._ecrire_rejets(rejets, fichier_rejets, entete, refusees, resultat)
+                lot = []
+                if progression:
+                    progression(resultat['importees'], resultat['rejetees'])
+            if lot:
+                refusees = importer_lot(type_import, colonnes, contexte, lot, resultat, article_ids)
+                rejets = self._ecrire_rejets(rejets, fichier_rejets, entete, refusees, resultat)
+                if progression:
+                    progression(resultat['importees'], resultat['rejetees'])
+        finally:
+            if rejets is not None:
+                rejets[0].close()
+            # Un seul rafraîchissement pour tout l'import, même interrompu
+            if resultat['importees']:
+                if type_import == 'articles':
+                    self.db.notifier({'articles'}, None)
+                else:
+                    self.db.notifier({type_import, 'stock'}, article_ids)
+        return resultat
+    
+    @staticmethod
+    def _colonnes_import(type_import, entete):
+        """Position de chaque champ attendu dans l'entête du fichier (None si absent)"""
+        positions = {}
+        for position, nom in enumerate(entete):
+            nom = plier_texte(str(nom or "")).strip().replace(' ', '_')
+            positions.setdefault(ALIAS_IMPORT.get(nom, nom), position)
+        
+        colonnes = {champ: positions.get(champ) for champ in COLONNES_IMPORT[type_import]}
+        if type_import != 'articles' and colonnes['article_id'] is None and colonnes['designation'] is None:
+            raise ValueError("Le fichier doit contenir une colonne 'designation' ou 'article_id'")
+        manquantes = [champ for champ in CHAMPS_OBLIGATOIRES[type_import] if colonnes[champ] is None]
+        if manquantes:
+            raise ValueError(f"Colonnes manquantes: {', '.join(manquantes)}")
+        return colonnes
+    
+    def _contexte_import(self, type_import):
+        """Table de correspondance désignation -> id, chargée une fois pour tout l'import"""
+        exactes, pliees = {}, {}
+        for article_id, designation in self.db.execute_query("SELECT id, designation FROM articles"):
+            exactes[designation] = article_id
+            cle = plier_texte(designation).strip()
+            # Deux articles de même désignation pliée: ambigu, on ne résout pas
+            pliees[cle] = None if cle in pliees else article_id
+        return {'exactes': exactes, 'pliees': pliees, 'ids': set(exactes.values())}
+    
+    @staticmethod
+    def _ecrire_rejets(rejets, fichier_rejets, entete, refusees, resultat):
+        if not refusees:
+            return rejets
+        if rejets is None:
+            fichier = open(fichier_rejets, 'w', newline='', encoding='utf-8-sig')
+            rejets = (fichier, csv.writer(fichier, delimiter=';'))
+            rejets[1].writerow(['ligne', 'erreur'] + [str(nom or "") for nom in entete])
+            resultat['fichier_rejets'] = fichier_rejets
+        rejets[1].writerows([numero, erreur] + ["" if v is None else v for v in valeurs]
+                            for numero, erreur, valeurs in refusees)
+        resultat['rejetees'] += len(refusees)
+        return rejets
+    
+    @staticmethod
+    def _valeur(valeurs, colonnes, champ):
+        position = colonnes[champ]
+        if position is None or position >= len(valeurs):
+            return None
+        valeur = valeurs[position]
+        if isinstance(valeur, str):
+            valeur = valeur.strip()
+        return None if valeur == "" else valeur
+    
+    def _resoudre_article(self, valeurs, colonnes, contexte):
+        article_id = self._valeur(valeurs, colonnes, 'article_id')
+        if article_id is not None:
+            article_id = convertir_entier(article_id)
+            if article_id not in contexte['ids']:
+                raise ValueError(f"article_id inconnu: {article_id}")
+            return article_id
+        
+        designation = self._valeur(valeurs, colonnes, 'designation')
+        if designation is None:
+            raise ValueError("désignation manquante")
+        designation = str(designation)
+        if designation in contexte['exactes']:
+            return contexte['exactes'][designation]
+        cle = plier_texte(designation)
+        if cle not in contexte['pliees']:
+            raise ValueError(f"article inconnu: {designation}")
+        if contexte['pliees'][cle] is None:
+            raise ValueError(f"désignation ambiguë: {designation}")
+        return contexte['pliees'][cle]
+    
+    def _importer_mouvements(self, table, colonnes, contexte, lot, resultat, article_ids):
+        """Valide et insère un lot d'entrées ou de sorties; retourne les lignes refusées"""
+        refusees = []
+        valides = []
+        for numero, valeurs in lot:
+            try:
+                article_id = self._resoudre_article(valeurs, colonnes, contexte)
+                quantite = convertir_entier(self._valeur(valeurs, colonnes, 'quantite'))
+                if quantite <= 0:
+                    raise ValueError("la quantité doit être positive")
+                jour = convertir_date(self._valeur(valeurs, colonnes, 'date'))
+                if table == 'entrees':
+                    prix = self._valeur(valeurs, colonnes, 'prix_total')
+                    valides.append((numero, valeurs, (
+                        article_id, quantite, jour,
+                        str(self._valeur(valeurs, colonnes, 'fournisseur') or ""),
+                        0.0 if prix is None else convertir_reel(prix),
+                        str(self._valeur(valeurs, colonnes, 'commentaire') or ""),
+                    )))
+                else:
+                    motif = self._valeur(valeurs, colonnes, 'motif')
+                    if motif is None:
+                        raise ValueError("motif manquant")
+                    valides.append((numero, valeurs, (
+                        article_id, quantite, jour, str(motif),
+                        str(self._valeur(valeurs, colonnes, 'utilisateur') or ""),
+                        str(self._valeur(valeurs, colonnes, 'commentaire') or ""),
+                    )))
+            except ValueError as e:
+                refusees.append((numero, str(e), valeurs))
+        
+        if not valides:
+            return refusees
+        
+        with self.db.transaction() as cursor:
+            if table == 'sorties':
+                # Stock relu dans la transaction, moins ce que les paniers ouverts ont réservé
+                # (un import n'est pas un panier): une sortie qui le dépasserait est refusée
+                stock = dict(self._lire_par_ids(
+                    cursor, f"SELECT id, quantite - {SQL_RESERVE_AUTRES} FROM articles",
+                    {ligne[2][0] for ligne in valides}, ("",)
+                ))
+                acceptees = []
+                for numero, valeurs, ligne in valides:
+                    if stock.get(ligne[0], 0) < ligne[1]:
+                        refusees.append((numero, f"stock insuffisant ({stock.get(ligne[0], 0)} disponible(s))", valeurs))
+                    else:
+                        stock[ligne[0]] -= ligne[1]
+                        acceptees.append(ligne)
+                signe = -1
+                insertion = """
+                    INSERT INTO sorties (article_id, quantite, date_sortie, motif, utilisateur, commentaire)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """
+            else:
+                acceptees = [ligne for _, _, ligne in valides]
+                signe = 1
+                insertion = """
+                    INSERT INTO entrees (article_id, quantite, date_entree, fournisseur, prix_total, commentaire)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """
+            
+            # Indexation plein texte du lot en une seule requête (voir migration 5)
+            dernier_id = self.db.dernier_id(cursor, table)
+            cursor.execute("UPDATE indexation_differee SET active = 1")
+            cursor.executemany(insertion, acceptees)
+            type_recherche, principal, secondaire = INDEXATION_RECHERCHE[table]
+            cursor.execute(f"""
+                INSERT INTO recherche (rowid, principal, secondaire)
+                SELECT id * 4 + {type_recherche}, {principal}, {secondaire} FROM {table} WHERE id > ?
+            """, (dernier_id,))
+            cursor.execute("UPDATE indexation_differee SET active = 0")
+            self.db.journaliser(cursor, table, dernier_id)
+            
+            # Une seule mise à jour ensembliste des stocks pour tout le lot
+            cumul = {}
+            for ligne in acceptees:
+                cumul[ligne[0]] = cumul.get(ligne[0], 0) + ligne[1]
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS import_cumul (article_id INTEGER PRIMARY KEY, quantite INTEGER)")
+            cursor.execute("DELETE FROM import_cumul")
+            cursor.executemany("INSERT INTO import_cumul VALUES (?, ?)", cumul.items())
+            cursor.execute(f"""
+                UPDATE articles
+                SET quantite = quantite + {signe} * (SELECT c.quantite FROM import_cumul c WHERE c.article_id = articles.id)
+                WHERE id IN (SELECT article_id FROM import_cumul)
+            """)
+            cursor.execute("DELETE FROM import_cumul")
+        
+        article_ids.update(cumul)
+        resultat['importees'] += len(acceptees)
+        return refusees
+    
+    def _importer_articles(self, type_import, colonnes, contexte, lot, resultat, article_ids):
+        """Valide et insère un lot d'articles; retourne les lignes refusées"""
+        refusees = []
+        valides = []
+        for numero, valeurs in lot:
+            try:
+                designation = self._valeur(valeurs, colonnes, 'designation')
+                categorie = self._valeur(valeurs, colonnes, 'categorie')
+                if designation is None or categorie is None:
+                    raise ValueError("désignation et catégorie sont obligatoires")
+                designation = str(designation)
+                cle = plier_texte(designation)
+                if cle in contexte['pliees']:
+                    raise ValueError(f"article déjà existant: {designation}")
+                
+                quantite = self._valeur(valeurs, colonnes, 'quantite')
+                prix = self._valeur(valeurs, colonnes, 'prix_unitaire')
+                seuil = self._valeur(valeurs, colonnes, 'seuil_minimum')
+                ligne = (
+                    designation, str(categorie),
+                    0 if quantite is None else convertir_entier(quantite),
+                    str(self._valeur(valeurs, colonnes, 'unite') or 'pièce'),
+                    0.0 if prix is None else convertir_reel(prix),
+                    10 if seuil is None else convertir_entier(seuil),
+                )
+                if ligne[2] < 0 or ligne[4] < 0 or ligne[5] < 0:
+                    raise ValueError("quantité, prix et seuil ne peuvent pas être négatifs")
+            except ValueError as e:
+                refusees.append((numero, str(e), valeurs))
+            else:
+                # Les doublons à l'intérieur du fichier sont refusés aussi
+                contexte['pliees'][cle] = None
+                valides.append(ligne)
+        
+        if valides:
+            with self.db.transaction() as cursor:
+                dernier_id = self.db.dernier_id(cursor, 'articles')
+                cursor.executemany("""
+                    INSERT INTO articles (designation, categorie, quantite, unite, prix_unitaire, seuil_minimum)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, valides)
+                self.db.journaliser(cursor, 'articles', dernier_id)
+            resultat['importees'] += len(valides)
+        return refusees
+    
+    @staticmethod
+    def _lire_par_ids(cursor, query, ids, params=()):
+        ids = list(ids)
+        rows = []
+        for debut in range(0, len(ids), 500):
+            lot = ids[debut:debut + 500]
+            cursor.execute(query + f" WHERE id IN ({', '.join('?' * len(lot))})", [*params, *lot])
+            rows.extend(cursor.fetchall())
+        return rows
+    
+    # --- Export ---
+    
+    def exporter(self, table, chemin, date_debut=None, date_fin=None, depuis=None,
+                 taille_lot=5000, progression=None, avancer_reprise=True):
+        """Exporte articles, entrées ou sorties vers un fichier CSV, XLSX ou Parquet
+        
+        Les lignes sont lues et écrites par lots: la mémoire utilisée ne dépend pas
+        de la taille de l'historique. Avec `depuis` (nom d'un point de reprise), seuls
+        les mouvements ajoutés depuis le dernier export de ce nom sont écrits, et le
+        point de reprise n'avance qu'une fois le fichier complet (sauf avancer_reprise=False:
+        l'appelant le fait avec avancer_point_de_reprise, par exemple depuis son thread d'écriture).
+        Retourne {'lignes': n, 'dernier_id': id de la dernière ligne exportée}.
+        """
+        if table not in EXPORTS:
+            raise ValueError(f"Table d'export inconnue: {table}")
+        if depuis and table == 'articles':
+            raise ValueError("L'export incrémental ne concerne que les entrées et les sorties")
+        colonnes, source, col_id, col_date = EXPORTS[table]
+        ecrivain = ECRIVAINS_EXPORT.get(os.path.splitext(chemin)[1].lower())
+        if ecrivain is None:
+            raise ValueError(f"Format d'export non pris en charge: {chemin} (csv, xlsx ou parquet)")
+        
+        # Borne haute fixée au départ: le point de reprise correspond exactement au fichier
+        dernier_id = self.db.execute_query(f"SELECT COALESCE(MAX(id), 0) FROM {table}")[0][0]
+        conditions, params = [f"{col_id} <= ?"], [dernier_id]
+        if depuis:
+            conditions.append(f"{col_id} > ?")
+            params.append(self.point_de_reprise(depuis))
+        if date_debut:
+            conditions.append(f"{col_date} >= ?")
+            params.append(str(date_debut))
+        if date_fin:
+            conditions.append(f"{col_date} <= ?")
+            params.append(str(date_fin))
+        query = (f"SELECT {', '.join(expr for _, expr, _ in colonnes)} FROM {source}"
+                 f" WHERE {' AND '.join(conditions)} ORDER BY {col_id}")
+        total = self.db.execute_query(
+            f"SELECT COUNT(*) FROM {source} WHERE {' AND '.join(conditions)}", params
+        )[0][0]
+        
+        lignes = 0
+        with ecrivain(chemin, colonnes) as ecrire:
+            for rows in self.db.iterer(query, params, taille_lot):
+                ecrire(rows)
+                lignes += len(rows)
+                if progression:
+                    progression(lignes, total)
+        
+        if depuis and avancer_reprise:
+            self.avancer_point_de_reprise(depuis, table, dernier_id)
+        return {'lignes': lignes, 'dernier_id': dernier_id}
+    
+    def avancer_point_de_reprise(self, nom, table, dernier_id):
+        """Enregistre la fin d'un export incrémental (un point de reprise ne recule jamais)"""
+        self.db.execute_query("""
+            INSERT INTO export_watermarks (nom, table_source, dernier_id, date_export)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (nom) DO UPDATE SET
+                dernier_id = MAX(dernier_id, excluded.dernier_id), date_export = excluded.date_export
+        """, (nom, table, dernier_id))
+    
+    def point_de_reprise(self, nom):
+        """Id du dernier mouvement exporté sous ce nom (0 si jamais exporté)"""
+        rows = self.db.execute_query("SELECT dernier_id FROM export_watermarks WHERE nom = ?", (nom,))
+        return rows[0][0] if rows else 0
+    
+    # --- Rapports PDF (reportlab n'est importé qu'à la première génération) ---
+    #
+    # Les lignes sont lues par blocs et mises en page au fil de l'eau: chaque bloc
+    # devient un tableau dont l'entête se répète à chaque page, et seuls quelques
+    # blocs sont en mémoire à la fois, quelle que soit la taille du rapport.
+    
+    def _document(self, filename, titre):
+        """Prépare un document A4 avec son titre; retourne (doc, debut, styles)"""
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        
+        doc = SimpleDocTemplate(filename, pagesize=A4)
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], **self.TITRE_STYLE)
+        debut = [
+            Paragraph(f"{titre} - Gestion de Stocks", title_style),
+            Paragraph(f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal']),
+            Spacer(1, 20),
+        ]
+        return doc, debut, styles
+    
+    @staticmethod
+    def _construire(doc, flowables):
+        """Met en page des flowables fournis par un itérable, sans les matérialiser"""
+        doc.build(FluxFlowables(flowables))
+    
+    @staticmethod
+    def _style_table(couleur_entete, couleur_lignes, taille_entete=12):
+        from reportlab.lib import colors
+        from reportlab.platypus import TableStyle
+        
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), getattr(colors, couleur_entete)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), taille_entete),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), getattr(colors, couleur_lignes)),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ])
+    
+    def _tables(self, doc, entete, blocs, proportions, style, progression=None, total=None):
+        """Génère un tableau par bloc de lignes, entête répété en haut de chaque page
+        
+        proportions fixe la largeur des colonnes (en parts de la page) pour que
+        les tableaux successifs restent alignés.
+        """
+        from reportlab.platypus import LongTable
+        
+        somme = sum(proportions)
+        largeurs = [doc.width * p / somme for p in proportions]
+        faites = 0
+        for bloc in blocs:
+            table = LongTable([entete] + bloc, colWidths=largeurs, repeatRows=1)
+            table.setStyle(style)
+            yield table
+            faites += len(bloc)
+            if progression:
+                progression(faites, total)
+    
+    def rapport_inventaire(self, filename, progression=None):
+        """Génère un rapport d'inventaire PDF"""
+        from reportlab.lib import colors
+        from reportlab.platypus import Table, TableStyle
+        
+        doc, debut, styles = self._document(filename, "Rapport d'Inventaire")
+        total = self.db.get_tableau_bord()[0]
+        totaux = {'valeur': 0}
+        
+        def blocs():
+            for rows in self.db.iterer("""
+                SELECT designation, categorie, quantite, unite, prix_unitaire, 
+                       (quantite * prix_unitaire) as valeur_totale
+                FROM articles 
+                ORDER BY categorie, designation
+            """):
+                bloc = []
+                for designation, categorie, quantite, unite, prix_unit, valeur in rows:
+                    totaux['valeur'] += valeur or 0
+                    bloc.append([
+                        designation, categorie, str(quantite), unite,
+                        f"{prix_unit:.2f} FCFA", f"{valeur:.2f} FCFA"
+                    ])
+                yield bloc
+        
+        entete = ['Désignation', 'Catégorie', 'Quantité', 'Unité', 'Prix unit.', 'Valeur totale']
+        proportions = [2.6, 1.8, 1.2, 1, 1.7, 2.2]
+        
+        def contenu():
+            yield from debut
+            yield from self._tables(doc, entete, blocs(), proportions,
+                                    self._style_table('grey', 'beige'), progression, total)
+            
+            # Ligne de total, connue une fois toutes les lignes lues
+            somme = sum(proportions)
+            table = Table([['', '', '', '', 'TOTAL:', f"{totaux['valeur']:.2f} FCFA"]],
+                          colWidths=[doc.width * p / somme for p in proportions])
+            table.setStyle(TableStyle([
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ]))
+            yield table
+        
+        self._construire(doc, contenu())
+    
+    def rapport_mouvements(self, filename, date_debut=None, date_fin=None, progression=None):
+        """Génère le rapport PDF de tous les mouvements d'une période (tout l'historique par défaut)"""
+        from reportlab.platypus import Paragraph, Spacer
+        
+        doc, debut, styles = self._document(filename, "Rapport des Mouvements")
+        borne_debut = str(date_debut) if date_debut else "0000-01-01"
+        borne_fin = str(date_fin) if date_fin else "9999-12-31"
+        if date_debut or date_fin:
+            periode = f"Période du {date_debut or 'début'} au {date_fin or 'ce jour'}"
+            debut.insert(2, Paragraph(periode, styles['Normal']))
+        
+        nb_entrees = self.db.count_mouvements('entrees', borne_debut, borne_fin)
+        nb_sorties = self.db.count_mouvements('sorties', borne_debut, borne_fin)
+        total = nb_entrees + nb_sorties
+        progression_sorties = progression and (lambda faites, _: progression(nb_entrees + faites, total))
+        
+        def blocs_entrees():
+            for rows in self.db.iterer("""
+                SELECT e.date_entree, a.designation, e.quantite, e.fournisseur, e.prix_total
+                FROM entrees e
+                JOIN articles a ON e.article_id = a.id
+                WHERE e.date_entree BETWEEN ? AND ?
+                ORDER BY e.date_entree DESC, e.id DESC
+            """, (borne_debut, borne_fin)):
+                yield [[str(date_mvt), designation, str(quantite),
+                        fournisseur or '-', f"{prix:.2f} FCFA" if prix else '-']
+                       for date_mvt, designation, quantite, fournisseur, prix in rows]
+        
+        def blocs_sorties():
+            for rows in self.db.iterer("""
+                SELECT s.date_sortie, a.designation, s.quantite, s.motif, s.utilisateur
+                FROM sorties s
+                JOIN articles a ON s.article_id = a.id
+                WHERE s.date_sortie BETWEEN ? AND ?
+                ORDER BY s.date_sortie DESC, s.id DESC
+            """, (borne_debut, borne_fin)):
+                yield [[str(date_mvt), designation, str(quantite), motif or '-', utilisateur or '-']
+                       for date_mvt, designation, quantite, motif, utilisateur in rows]
+        
+        def contenu():
+            yield from debut
+            
+            # Entrées
+            yield Paragraph(f"ENTRÉES ({nb_entrees})", styles['Heading2'])
+            if nb_entrees:
+                yield from self._tables(
+                    doc, ['Date', 'Article', 'Quantité', 'Fournisseur', 'Prix'], blocs_entrees(),
+                    [1.4, 3, 1, 2.2, 1.6], self._style_table('green', 'lightgreen', 10),
+                    progression, total
+                )
+            else:
+                yield Paragraph("Aucune entrée enregistrée.", styles['Normal'])
+            
+            yield Spacer(1, 20)
+            
+            # Sorties
+            yield Paragraph(f"SORTIES ({nb_sorties})", styles['Heading2'])
+            if nb_sorties:
+                yield from self._tables(
+                    doc, ['Date', 'Article', 'Quantité', 'Motif', 'Utilisateur'], blocs_sorties(),
+                    [1.4, 3, 1, 2, 1.8], self._style_table('red', 'mistyrose', 10),
+                    progression_sorties, total
+                )
+            else:
+                yield Paragraph("Aucune sortie enregistrée.", styles['Normal'])
+        
+        self._construire(doc, contenu())
+    
+    def rapport_stocks_bas(self, filename, progression=None):
+        """Génère un rapport des stocks bas PDF"""
+        from reportlab.platypus import Paragraph
+        
+        doc, debut, styles = self._document(filename, "Rapport des Stocks Bas")
+        # Épuisés compris (le compteur du tableau de bord les exclut)
+        total = self.db.execute_query("SELECT COUNT(*) FROM articles WHERE quantite <= seuil_minimum")[0][0]
+        
+        def blocs():
+            for rows in self.db.iterer("""
+                SELECT designation, categorie, quantite, unite, seuil_minimum
+                FROM articles 
+                WHERE quantite <= seuil_minimum
+                ORDER BY quantite ASC, designation
+            """):
+                yield [[designation, categorie, str(quantite), unite, str(seuil),
+                        "ÉPUISÉ" if quantite == 0 else "STOCK BAS"]
+                       for designation, categorie, quantite, unite, seuil in rows]
+        
+        def contenu():
+            yield from debut
+            if total:
+                yield from self._tables(
+                    doc, ['Désignation', 'Catégorie', 'Stock actuel', 'Unité', 'Seuil minimum', 'Statut'],
+                    blocs(), [3, 2, 1.4, 1, 1.6, 1.4], self._style_table('red', 'mistyrose'),
+                    progression, total
+                )
+            else:
+                yield Paragraph("✅ Aucun stock bas détecté !", styles['Normal'])
+        
+        self._construire(doc, contenu())
+
+    def rapport_suggestions(self, filename, progression=None):
+        """Génère le rapport PDF des suggestions d'achat (dernières prévisions calculées)"""
+        from reportlab.platypus import Paragraph
+        
+        doc, debut, styles = self._document(filename, "Suggestions d'Achat")
+        total = self.db.execute_query("SELECT COUNT(*) FROM previsions WHERE quantite_suggeree > 0")[0][0]
+        
+        def blocs():
+            for rows in self.db.iterer("""
+                SELECT a.designation, a.quantite, p.taux_journalier, p.delai, p.point_commande,
+                       p.quantite_suggeree, p.quantite_suggeree * a.prix_unitaire,
+                       (SELECT e.fournisseur FROM entrees e WHERE e.article_id = a.id
+                        ORDER BY e.date_entree DESC, e.id DESC LIMIT 1)
+                FROM previsions p JOIN articles a ON a.id = p.article_id
+                WHERE p.quantite_suggeree > 0
+                ORDER BY a.quantite * 1.0 / p.point_commande, a.designation
+            """):
+                yield [[designation, str(quantite), f"{taux:.2f}", f"{delai:.0f} j", str(point),
+                        str(suggeree), f"{cout:.2f}", fournisseur or ""]
+                       for designation, quantite, taux, delai, point, suggeree, cout, fournisseur in rows]
+        
+        def contenu():
+            yield from debut
+            if total:
+                yield from self._tables(
+                    doc, ['Désignation', 'Stock', 'Conso/jour', 'Délai', 'Point cde', 'À commander',
+                          'Coût (FCFA)', 'Fournisseur'],
+                    blocs(), [3, 1, 1.2, 1, 1.2, 1.4, 1.6, 2], self._style_table('darkgreen', 'honeydew', 10),
+                    progression, total
+                )
+            else:
+                yield Paragraph("✅ Aucun achat à prévoir.", styles['Normal'])
+        
+        self._construire(doc, contenu())
+
+class FluxFlowables(list):
+    """Liste de flowables alimentée à la demande depuis un itérable
+    
+    platypus consomme la liste par le début en testant len() à chaque tour:
+    on n'y garde que quelques éléments d'avance au lieu du document entier.
+    """
+    AVANCE = 3
+    
+    def __init__(self, source):
+        super().__init__()
+        self._source = iter(source)
+    
+    def __len__(self):
+        while self._source is not None and list.__len__(self) < self.AVANCE:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return list.__len__(self)
+
+# --- Import en masse ---
+
+# Champs reconnus par type d'import, et ceux sans lesquels le fichier est refusé
+COLONNES_IMPORT = {
+    'articles': ('designation', 'categorie', 'quantite', 'unite', 'prix_unitaire', 'seuil_minimum'),
+    'entrees': ('article_id', 'designation', 'quantite', 'date', 'fournisseur', 'prix_total', 'commentaire'),
+    'sorties': ('article_id', 'designation', 'quantite', 'date', 'motif', 'utilisateur', 'commentaire'),
+}
+CHAMPS_OBLIGATOIRES = {
+    'articles': ('designation', 'categorie'),
+    'entrees': ('quantite', 'date'),
+    'sorties': ('quantite', 'date', 'motif'),
+}
+# Autres noms d'entête acceptés (déjà pliés: sans accents, en minuscules)
+ALIAS_IMPORT = {
+    'article': 'designation', 'produit': 'designation', 'libelle': 'designation',
+    'qte': 'quantite', 'quantity': 'quantite',
+    'date_entree': 'date', 'date_sortie': 'date',
+    'prix': 'prix_unitaire', 'prix_unit': 'prix_unitaire', 'prix_unit.': 'prix_unitaire',
+    'seuil': 'seuil_minimum',
+}
+
+def lire_tableau(chemin):
+    """Itère sur les lignes d'un fichier CSV ou XLSX (la première est l'entête), sans tout charger"""
+    if os.path.splitext(chemin)[1].lower() in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+        
+        classeur = load_workbook(chemin, read_only=True, data_only=True)
+        try:
+            for valeurs in classeur.worksheets[0].iter_rows(values_only=True):
+                if any(v is not None for v in valeurs):
+                    yield list(valeurs)
+        finally:
+            classeur.close()
+        return
+    
+    # CSV: encodage et séparateur déduits du début du fichier (Excel produit souvent du ';' en cp1252)
+    with open(chemin, 'rb') as fichier:
+        debut = fichier.read(65536)
+    try:
+        debut.decode('utf-8-sig')
+        encodage = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # Un caractère multi-octets coupé en fin d'extrait n'est pas une erreur
+        encodage = 'utf-8-sig' if e.start >= len(debut) - 3 else 'cp1252'
+    echantillon = debut.decode(encodage, errors='ignore')
+    try:
+        dialecte = csv.Sniffer().sniff(echantillon.split('\n', 1)[0], delimiters=';,\t')
+    except csv.Error:
+        dialecte = csv.excel
+    
+    with open(chemin, newline='', encoding=encodage) as fichier:
+        for valeurs in csv.reader(fichier, dialecte):
+            if any(v.strip() for v in valeurs):
+                yield valeurs
+
+# Espaces (y compris insécables) utilisés comme séparateurs de milliers
+ESPACES = re.compile(r"[\s\u00a0\u202f]")
+
+def convertir_entier(valeur):
+    if isinstance(valeur, float) and valeur.is_integer():
+        return int(valeur)
+    try:
+        return int(ESPACES.sub('', str(valeur)))
+    except ValueError:
+        raise ValueError(f"nombre entier invalide: {valeur}") from None
+
+def convertir_reel(valeur):
+    if isinstance(valeur, (int, float)):
+        return float(valeur)
+    try:
+        return float(ESPACES.sub('', str(valeur)).replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"montant invalide: {valeur}") from None
+
+FORMATS_DATE = ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y', '%d-%m-%Y', '%Y-%m-%d %H:%M:%S')
+
+def convertir_date(valeur):
+    """Date au format ISO (AAAA-MM-JJ) depuis un texte ou une date Excel"""
+    if valeur is None:
+        raise ValueError("date manquante")
+    if isinstance(valeur, (datetime, date)):
+        return valeur.strftime('%Y-%m-%d')
+    return _convertir_texte_date(str(valeur).strip())
+
+@lru_cache(maxsize=4096)
+def _convertir_texte_date(texte):
+    # Un fichier ne contient en général que quelques dates distinctes: strptime est mis en cache
+    for format_date in FORMATS_DATE:
+        try:
+            return datetime.strptime(texte, format_date).strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+    raise ValueError(f"date invalide: {texte}")
+
+# --- Export ---
+
+# Par table: (colonnes (nom, expression SQL, type), source, colonne id, colonne de date)
+EXPORTS = {
+    'articles': (
+        [('id', 'id', 'int'), ('designation', 'designation', 'text'), ('categorie', 'categorie', 'text'),
+         ('quantite', 'quantite', 'int'), ('unite', 'unite', 'text'),
+         ('prix_unitaire', 'prix_unitaire', 'float'), ('seuil_minimum', 'seuil_minimum', 'int'),
+         ('date_creation', 'date_creation', 'text')],
+        "articles", "id", "date(date_creation)",
+    ),
+    'entrees': (
+        [('id', 'e.id', 'int'), ('article_id', 'e.article_id', 'int'),
+         ('designation', 'a.designation', 'text'), ('quantite', 'e.quantite', 'int'),
+         ('date', 'e.date_entree', 'text'), ('fournisseur', 'e.fournisseur', 'text'),
+         ('prix_total', 'e.prix_total', 'float'), ('commentaire', 'e.commentaire', 'text')],
+        "entrees e LEFT JOIN articles a ON e.article_id = a.id", "e.id", "e.date_entree",
+    ),
+    'sorties': (
+        [('id', 's.id', 'int'), ('article_id', 's.article_id', 'int'),
+         ('designation', 'a.designation', 'text'), ('quantite', 's.quantite', 'int'),
+         ('date', 's.date_sortie', 'text'), ('motif', 's.motif', 'text'),
+         ('utilisateur', 's.utilisateur', 'text'), ('commentaire', 's.commentaire', 'text')],
+        "sorties s LEFT JOIN articles a ON s.article_id = a.id", "s.id", "s.date_sortie",
+    ),
+}
+
+@contextmanager
+def ecrivain_csv(chemin, colonnes):
+    with open(chemin, 'w', newline='', encoding='utf-8-sig') as fichier:
+        writer = csv.writer(fichier, delimiter=';')
+        writer.writerow([nom for nom, _, _ in colonnes])
+        yield writer.writerows
+
+# Nombre maximal de lignes d'une feuille Excel
+LIGNES_MAX_XLSX = 1048576
+
+@contextmanager
+def ecrivain_xlsx(chemin, colonnes):
+    from openpyxl import Workbook
+    
+    # Mode écriture seule: les lignes partent sur disque au fur et à mesure
+    classeur = Workbook(write_only=True)
+    entete = [nom for nom, _, _ in colonnes]
+    etat = {'feuille': None, 'lignes': 0}
+    
+    def nouvelle_feuille():
+        etat['feuille'] = classeur.create_sheet(f"Données {len(classeur.worksheets) + 1}")
+        etat['feuille'].append(entete)
+        etat['lignes'] = 1
+    
+    def ecrire(rows):
+        for row in rows:
+            # Feuille pleine: la suite continue sur une nouvelle feuille
+            if etat['lignes'] >= LIGNES_MAX_XLSX:
+                nouvelle_feuille()
+            etat['feuille'].append(row)
+            etat['lignes'] += 1
+    
+    nouvelle_feuille()
+    yield ecrire
+    classeur.save(chemin)
+
+@contextmanager
+def ecrivain_parquet(chemin, colonnes):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    types = {'int': pa.int64(), 'float': pa.float64(), 'text': pa.string()}
+    schema = pa.schema([(nom, types[type_]) for nom, _, type_ in colonnes])
+    
+    with pq.ParquetWriter(chemin, schema) as writer:
+        def ecrire(rows):
+            # Un groupe de lignes Parquet par lot, construit colonne par colonne
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(list(valeurs), type=champ.type) for valeurs, champ in zip(zip(*rows), schema)],
+                schema=schema
+            ))
+        yield ecrire
+
+ECRIVAINS_EXPORT = {'.csv': ecrivain_csv, '.xlsx': ecrivain_xlsx, '.parquet': ecrivain_parquet}
+
+RAPPORTS_CLI = {
+    'inventaire': "Inventaire complet",
+    'mouvements': "Mouvements (Entrées/Sorties)",
+    'stocks-bas': "Stocks bas",
+    'suggestions': "Suggestions d'achat",
+}
+
+def main(argv=None):
+    """Ligne de commande: rapports, alertes et ventes du jour sans lancer l'interface"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog="stock", description="Gestion de stocks de vaisselle")
+    parser.add_argument('--db', default="stock_vaisselle.db", help="chemin de la base SQLite")
+    commandes = parser.add_subparsers(dest='commande', required=True)
+    
+    rapport = commandes.add_parser('rapport', help="génère un rapport PDF")
+    rapport.add_argument('type', choices=sorted(RAPPORTS_CLI))
+    rapport.add_argument('fichier')
+    rapport.add_argument('--du', help="début de période AAAA-MM-JJ (rapport des mouvements)")
+    rapport.add_argument('--au', help="fin de période AAAA-MM-JJ (rapport des mouvements)")
+    importation = commandes.add_parser('import', help="importe un fichier CSV ou XLSX")
+    importation.add_argument('type', choices=sorted(COLONNES_IMPORT))
+    importation.add_argument('fichier')
+    importation.add_argument('--rejets', help="fichier des lignes refusées (défaut: <fichier>.rejets.csv)")
+    export = commandes.add_parser('export', help="exporte une table en CSV, XLSX ou Parquet")
+    export.add_argument('table', choices=sorted(EXPORTS))
+    export.add_argument('fichier', help="fichier .csv, .xlsx ou .parquet")
+    export.add_argument('--du', help="début de période AAAA-MM-JJ")
+    export.add_argument('--au', help="fin de période AAAA-MM-JJ")
+    export.add_argument('--depuis', metavar='NOM',
+                        help="n'exporte que les mouvements ajoutés depuis le dernier export de ce nom")
+    stock_date = commandes.add_parser('stock-a-date', help="stock et valeur en fin de journée à une date")
+    stock_date.add_argument('date', help="AAAA-MM-JJ")
+    stock_date.add_argument('--article', type=int, help="id d'un article")
+    cloture = commandes.add_parser('cloturer', help="enregistre les clôtures de stock")
+    cloture.add_argument('--date', help="clôture à cette date (défaut: toutes les fins de mois écoulées)")
+    reconciliation = commandes.add_parser('reconcilier', help="vérifie les quantités contre le journal")
+    reconciliation.add_argument('--corriger', action='store_true',
+                                help="journalise les écarts trouvés comme ajustements")
+    previsions = commandes.add_parser('previsions', help="prévoit la consommation et les achats à faire")
+    previsions.add_argument('--sans-seuils', action='store_true',
+                            help="ne remplace pas les seuils minimum par les points de commande")
+    alertes = commandes.add_parser('alertes', help="liste les alertes de stock bas en cours")
+    alertes.add_argument('--nouvelles', action='store_true', help="seulement les alertes non acquittées")
+    alertes.add_argument('--acquitter', action='store_true', help="acquitte les alertes listées")
+    commandes.add_parser('ventes-du-jour', help="affiche le total des ventes du jour")
+    commandes.add_parser('migrer', help="met le schéma de la base à jour")
+    
+    args = parser.parse_args(argv)
+    service = StockService(DatabaseManager(args.db))
+    try:
+        if args.commande == 'rapport':
+            options = {'progression': lambda faites, total: print(f"\r{faites}/{total} lignes", end="", file=sys.stderr)}
+            if args.type == 'mouvements':
+                options.update(date_debut=args.du, date_fin=args.au)
+            service.rapports[RAPPORTS_CLI[args.type]](args.fichier, **options)
+            print(file=sys.stderr)
+            print(f"Rapport généré: {args.fichier}")
+        elif args.commande == 'import':
+            resultat = service.importer(args.fichier, args.type, args.rejets)
+            print(f"{resultat['importees']} ligne(s) importée(s), {resultat['rejetees']} refusée(s)")
+            if resultat['fichier_rejets']:
+                print(f"Lignes refusées: {resultat['fichier_rejets']}")
+        elif args.commande == 'export':
+            resultat = service.exporter(args.table, args.fichier, args.du, args.au, args.depuis)
+            print(f"{resultat['lignes']} ligne(s) exportée(s) dans {args.fichier}")
+        elif args.commande == 'stock-a-date':
+            lignes = service.stock_a_date(args.date, args.article)
+            for _, designation, quantite, valeur in lignes:
+                print(f"{designation}: {quantite} ({valeur:.2f} FCFA)")
+            print(f"Valeur totale: {sum(valeur for *_, valeur in lignes):.2f} FCFA")
+        elif args.commande == 'cloturer':
+            if args.date:
+                faites = [args.date] if service.cloturer(args.date) else []
+            else:
+                faites = service.cloturer_mois_ecoules()
+            print(f"{len(faites)} clôture(s) enregistrée(s)")
+        elif args.commande == 'reconcilier':
+            ecarts = service.reconcilier(args.corriger)
+            for _, designation, quantite, journal in ecarts:
+                print(f"{designation}: quantité {quantite}, journal {journal}")
+            print(f"{len(ecarts)} écart(s)" + (" journalisé(s) en ajustement" if args.corriger and ecarts else ""))
+            return 1 if ecarts and not args.corriger else 0
+        elif args.commande == 'previsions':
+            resultat = service.calculer_previsions(not args.sans_seuils)
+            print(f"{resultat['articles']} article(s), {resultat['a_commander']} à commander, "
+                  f"{resultat['seuils_modifies']} seuil(s) mis à jour")
+        elif args.commande == 'alertes':
+            lignes = service.alertes(args.nouvelles)
+            for _, designation, quantite, seuil, unite, acquittee in lignes:
+                etat = "STOCK ÉPUISÉ" if quantite <= 0 else f"{quantite} {unite} (seuil: {seuil})"
+                print(f"{designation} - {etat}" + (" [acquittée]" if acquittee else ""))
+            if args.acquitter and lignes:
+                print(f"{service.acquitter_alertes([ligne[0] for ligne in lignes])} alerte(s) acquittée(s)")
+        elif args.commande == 'ventes-du-jour':
+            print(f"{service.ventes_du_jour():.2f} FCFA")
+        elif args.commande == 'migrer':
+            print(f"Schéma en version {service.db.get_schema_version()}")
+    finally:
+        service.db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
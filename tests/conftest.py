@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# Modules de l'application à la racine du dépôt; Qt sans affichage
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def app():
+    """QApplication partagée par les tests d'interface"""
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def service(tmp_path):
+    """StockService sur une base neuve"""
+    from stock import DatabaseManager, StockService
+    db = DatabaseManager(str(tmp_path / "stock_vaisselle.db"))
+    yield StockService(db)
+    db.close()
+
+
+def article(designation, quantite, prix=100.0, codes=()):
+    """Données d'une fiche article pour ajouter_article"""
+    return {'designation': designation, 'categorie': "Assiettes", 'quantite': quantite, 'unite': "pièce",
+            'prix_unitaire': prix, 'seuil_minimum': 1, 'codes': list(codes)}
@@ -0,0 +1,28 @@
+"""Valorisation des sorties dans les analyses"""
+
+import pytest
+
+from conftest import article
+
+
+def test_chiffre_affaires_au_prix_de_la_vente(service):
+    article_id = service.ajouter_article(article("Tasse", 10, prix=2.0))
+    service.enregistrer_vente([(article_id, 3)])
+    service.modifier_article(article_id, article("Tasse", 7, prix=10.0))
+
+    analyses = service.analyses
+    analyses.actualiser()
+    assert service.ventes_du_jour() == pytest.approx(6.0)
+    assert list(analyses.chiffre_affaires()) == [pytest.approx(6.0)]
+    assert analyses.consommation().loc[article_id, 'valeur'] == pytest.approx(6.0)
+
+
+def test_sortie_sans_prix_valorisee_au_prix_de_l_article(service):
+    article_id = service.ajouter_article(article("Tasse", 10, prix=4.0))
+    service.enregistrer_vente([(article_id, 2)])
+    # Sortie antérieure à l'enregistrement du prix de vente
+    service.db.execute_query("UPDATE sorties SET prix_unitaire = NULL")
+
+    analyses = service.analyses
+    analyses.actualiser()
+    assert list(analyses.chiffre_affaires()) == [pytest.approx(8.0)]
@@ -0,0 +1,31 @@
+"""Revalidation du catalogue en mémoire après des écritures"""
+
+from conftest import article
+
+
+def test_suppression_du_dernier_article(service):
+    article_id = service.ajouter_article(article("Assiette plate", 5))
+    assert [ligne[0] for ligne in service.articles()] == [article_id]
+    assert service.db.catalogue.categories() == ["Assiettes"]
+
+    service.supprimer_article(article_id)
+    assert service.articles() == []
+    assert service.db.catalogue.categories() == []
+    assert service.article(article_id) is None
+
+
+def test_suppression_et_modification_simultanees(service):
+    bol = service.ajouter_article(article("Bol", 5))
+    verre = service.ajouter_article(article("Verre", 3))
+    service.articles()
+
+    # Les deux écritures sont vues à la même revalidation
+    with service.db.transaction():
+        service.supprimer_article(bol)
+        service.modifier_article(verre, dict(article("Verre", 3), categorie="Verres"))
+    assert [(ligne[0], ligne[2]) for ligne in service.articles()] == [(verre, "Verres")]
+    assert service.db.catalogue.categories() == ["Verres"]
+
+    # Une écriture suivante reste relue de façon incrémentale
+    service.modifier_article(verre, dict(article("Verre", 3), prix_unitaire=250.0))
+    assert service.article(verre)[5] == 250.0
@@ -0,0 +1,57 @@
+"""Journal de stock, clôtures et réconciliation"""
+
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import article
+
+
+def quantites(service, jour):
+    return {article_id: quantite for article_id, _, quantite, _ in service.stock_a_date(jour)}
+
+
+def test_stock_a_date_apres_cloture(service):
+    aujourdhui = date.today()
+    assiette = service.ajouter_article(article("Assiette plate", 10))
+    bol = service.ajouter_article(article("Bol", 4))
+    assert service.cloturer(aujourdhui)
+    assert not service.cloturer(aujourdhui)
+
+    service.ajouter_entree({'article_id': assiette, 'quantite': 6, 'date': aujourdhui + timedelta(days=1)})
+    service.enregistrer_vente([(assiette, 3), (bol, 1)], jour=aujourdhui + timedelta(days=2))
+
+    assert quantites(service, aujourdhui) == {assiette: 10, bol: 4}
+    assert quantites(service, aujourdhui + timedelta(days=1)) == {assiette: 16, bol: 4}
+    # Après le dernier mouvement: la clôture plus le journal donnent le stock réel
+    apres = quantites(service, aujourdhui + timedelta(days=30))
+    assert apres == {article_id: service.article(article_id)[3] for article_id in (assiette, bol)}
+    assert apres == {assiette: 13, bol: 3}
+
+    # Une clôture ultérieure repart de la précédente
+    assert service.cloturer(aujourdhui + timedelta(days=30))
+    assert service.stock_a_date(aujourdhui + timedelta(days=30), assiette)[0][2] == 13
+
+
+def test_reconcilier(service):
+    assiette = service.ajouter_article(article("Assiette plate", 10))
+    bol = service.ajouter_article(article("Bol", 4))
+    service.enregistrer_vente([(assiette, 2)])
+    assert service.reconcilier() == []
+
+    # Quantité modifiée hors de l'application, sans ligne de journal
+    service.db.execute_query("UPDATE articles SET quantite = 7 WHERE id = ?", (bol,))
+    assert service.reconcilier() == [(bol, "Bol", 7, 4)]
+
+    assert service.reconcilier(corriger=True) == [(bol, "Bol", 7, 4)]
+    assert service.reconcilier() == []
+    assert quantites(service, "9999-12-31") == {assiette: 8, bol: 7}
+
+
+def test_journal_non_modifiable(service):
+    service.ajouter_article(article("Bol", 4))
+    with pytest.raises(sqlite3.DatabaseError):
+        service.db.execute_query("UPDATE journal_stock SET variation = 100")
+    with pytest.raises(sqlite3.DatabaseError):
+        service.db.execute_query("DELETE FROM journal_stock")
@@ -0,0 +1,69 @@
+"""Aller-retour client/serveur sur un ServeurStock local (port libre choisi par le système)"""
+
+import asyncio
+import threading
+
+import pytest
+
+from conftest import article
+from serveur import ServeurStock, ClientHTTP
+from stock import StockInsuffisantError, ConflitVersionError
+
+
+@pytest.fixture
+def client(tmp_path):
+    serveur = ServeurStock(str(tmp_path / "serveur.db"))
+    boucle = asyncio.new_event_loop()
+    adresse = {}
+    pret = threading.Event()
+
+    def demarre(adresse_ecoute):
+        adresse['port'] = adresse_ecoute[1]
+        pret.set()
+
+    tache = boucle.create_task(serveur.servir(port=0, pret=demarre))
+
+    def tourner():
+        try:
+            boucle.run_until_complete(tache)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=tourner, daemon=True)
+    thread.start()
+    assert pret.wait(10), "le serveur n'a pas démarré"
+
+    client = ClientHTTP(f"127.0.0.1:{adresse['port']}")
+    yield client
+    client.close()
+    boucle.call_soon_threadsafe(tache.cancel)
+    thread.join(10)
+
+
+def test_vente(client):
+    article_id = client.requete('POST', "/articles", corps=article("Assiette plate", 5))
+    client.requete('POST', "/ventes", corps={'panier': [[article_id, 2]], 'utilisateur': "Test"})
+    assert client.requete('GET', f"/articles/{article_id}")[3] == 3
+    assert client.requete('GET', "/ventes-du-jour") == 200.0
+
+
+def test_vente_stock_insuffisant(client):
+    article_id = client.requete('POST', "/articles", corps=article("Bol", 3))
+    with pytest.raises(StockInsuffisantError) as erreur:
+        client.requete('POST', "/ventes", corps={'panier': [[article_id, 10]]})
+    assert (erreur.value.article_id, erreur.value.demande, erreur.value.disponible) == (article_id, 10, 3)
+    # Rien n'a été enregistré
+    assert client.requete('GET', f"/articles/{article_id}")[3] == 3
+
+
+def test_conflit_de_version(client):
+    article_id = client.requete('POST', "/articles", corps=article("Verre à eau", 10))
+    fiche = client.requete('GET', f"/articles/{article_id}")
+    modification = dict(article("Verre à eau", 12), version=fiche[8])
+    client.requete('PUT', f"/articles/{article_id}", corps=modification)
+
+    # Seconde écriture sur la version lue avant la première
+    with pytest.raises(ConflitVersionError) as erreur:
+        client.requete('PUT', f"/articles/{article_id}", corps=dict(modification, quantite=20))
+    assert erreur.value.version_lue == fiche[8]
+    assert client.requete('GET', f"/articles/{article_id}")[3] == 12
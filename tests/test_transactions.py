@@ -0,0 +1,59 @@
+"""Paniers atomiques, refus du stock négatif et points de sauvegarde"""
+
+import pytest
+
+from conftest import article
+from stock import StockInsuffisantError
+
+
+def test_panier_annule_en_entier(service):
+    assiette = service.ajouter_article(article("Assiette plate", 5))
+    bol = service.ajouter_article(article("Bol", 3))
+
+    with pytest.raises(StockInsuffisantError) as erreur:
+        service.enregistrer_vente([(assiette, 2), (bol, 10)])
+    assert (erreur.value.article_id, erreur.value.demande, erreur.value.disponible) == (bol, 10, 3)
+
+    # Aucune ligne du panier n'est enregistrée, pas même celle qui était possible
+    assert service.article(assiette)[3] == 5 and service.article(bol)[3] == 3
+    assert service.db.execute_query("SELECT COUNT(*) FROM sorties")[0][0] == 0
+    assert service.ventes_du_jour() == 0
+    assert service.reconcilier() == []
+
+
+def test_sortie_sous_zero_refusee(service):
+    bol = service.ajouter_article(article("Bol", 3))
+    with pytest.raises(StockInsuffisantError):
+        service.ajouter_sortie({'article_id': bol, 'quantite': 4, 'date': "2026-01-05", 'motif': "Casse"})
+    service.ajouter_sortie({'article_id': bol, 'quantite': 3, 'date': "2026-01-05", 'motif': "Casse"})
+    assert service.article(bol)[3] == 0
+
+
+def test_point_de_sauvegarde(service):
+    assiette = service.ajouter_article(article("Assiette plate", 5))
+    bol = service.ajouter_article(article("Bol", 3))
+    notifications = []
+    service.db.abonner(lambda tables, article_ids: notifications.append(article_ids))
+
+    with service.db.transaction():
+        service.ajouter_entree({'article_id': assiette, 'quantite': 4, 'date': "2026-01-05"})
+        with pytest.raises(StockInsuffisantError):
+            with service.db.point_de_sauvegarde():
+                service.ajouter_entree({'article_id': bol, 'quantite': 2, 'date': "2026-01-05"})
+                service.ajouter_sortie({'article_id': bol, 'quantite': 50, 'date': "2026-01-05", 'motif': "Casse"})
+
+    # Seule la partie du point de sauvegarde est annulée, le reste est validé
+    assert service.article(assiette)[3] == 9 and service.article(bol)[3] == 3
+    assert service.db.execute_query("SELECT article_id FROM entrees") == [(assiette,)]
+    assert notifications == [frozenset({assiette})]
+    assert service.reconcilier() == []
+
+
+def test_transaction_annulee(service):
+    assiette = service.ajouter_article(article("Assiette plate", 5))
+    with pytest.raises(RuntimeError):
+        with service.db.transaction():
+            service.ajouter_entree({'article_id': assiette, 'quantite': 4, 'date': "2026-01-05"})
+            raise RuntimeError
+    assert service.article(assiette)[3] == 5
+    assert service.db.execute_query("SELECT COUNT(*) FROM entrees")[0][0] == 0
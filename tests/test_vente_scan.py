@@ -0,0 +1,61 @@
+"""Mode scan de VenteDialog piloté au clavier (QTest), comme une douchette"""
+
+import pytest
+from PyQt5.QtCore import Qt
+from PyQt5.QtTest import QTest
+
+from conftest import article
+from vaisselles import VenteDialog
+
+
+@pytest.fixture
+def dialogue(app, service):
+    service.ajouter_article(article("Assiette plate", 5, prix=1500.0, codes=["4006381333931"]))
+    service.ajouter_article(article("Bol", 1, prix=800.0, codes=["ABC-1"]))
+    dialogue = VenteDialog(service)
+    dialogue.show()
+    yield dialogue
+    dialogue.liberer_reservations()
+    dialogue.close()
+
+
+def scanner(dialogue, code):
+    QTest.keyClicks(dialogue.scan_edit, code)
+    QTest.keyClick(dialogue.scan_edit, Qt.Key_Return)
+
+
+def test_code_connu_ajoute_une_ligne(dialogue):
+    scanner(dialogue, "4006381333931")
+    assert [(d, q, p) for _, d, q, p in dialogue.panier] == [("Assiette plate", 1, 1500.0)]
+    assert dialogue.panier_list.count() == 1
+    assert dialogue.scan_edit.text() == ""
+
+
+def test_scan_repete_incremente_la_ligne(dialogue):
+    scanner(dialogue, "4006381333931")
+    scanner(dialogue, "4006381333931")
+    assert [(d, q) for _, d, q, _ in dialogue.panier] == [("Assiette plate", 2)]
+    assert dialogue.panier_list.count() == 1
+
+
+def test_code_inconnu_refuse(dialogue):
+    scanner(dialogue, "4006381333931")
+    scanner(dialogue, "999")
+    assert [(d, q) for _, d, q, _ in dialogue.panier] == [("Assiette plate", 1)]
+    assert "Code inconnu : 999" in dialogue.scan_label.text()
+    # Pas de fenêtre modale : la saisie continue
+    assert dialogue.isVisible() and dialogue.scan_edit.text() == ""
+
+
+def test_stock_insuffisant_signale(dialogue):
+    scanner(dialogue, "ABC-1")
+    scanner(dialogue, "ABC-1")
+    assert [(d, q) for _, d, q, _ in dialogue.panier] == [("Bol", 1)]
+    assert "red" in dialogue.scan_label.styleSheet() and dialogue.isVisible()
+
+
+def test_vente_scannee_enregistree(dialogue, service):
+    scanner(dialogue, "4006381333931")
+    scanner(dialogue, "4006381333931")
+    dialogue.enregistrer_vente()
+    assert service.article_par_code("4006381333931")[3] == 3
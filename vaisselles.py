@@ -1,133 +1,590 @@
-import sys
-import sqlite3
 import os
-from datetime import datetime, date
+import sys
+import uuid
+from bisect import bisect_right
+from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QTabWidget, QTableWidget, QTableWidgetItem,
                              QPushButton, QLineEdit, QLabel, QComboBox, QSpinBox,
                              QDoubleSpinBox, QDateEdit, QTextEdit, QMessageBox,
                              QDialog, QFormLayout, QDialogButtonBox, QHeaderView,
-                             QGroupBox, QGridLayout, QFrame, QSplitter, QListWidget,
+                             QGroupBox, QGridLayout, QFrame, QSplitter, QListWidget, QListWidgetItem,
                              QProgressBar, QStatusBar, QMenuBar, QAction, QFileDialog,
-                             QCheckBox)  # Assure-toi que QCheckBox est bien importé
-from PyQt5.QtCore import Qt, QDate, QTimer
+                             QCheckBox, QTableView, QAbstractItemView, QCompleter)  # Assure-toi que QCheckBox est bien importé
+from PyQt5.QtCore import (Qt, QDate, QTimer, QAbstractTableModel, QAbstractProxyModel,
+                          QModelIndex, QObject, QRunnable, QThreadPool, QStringListModel, pyqtSignal)
 from PyQt5.QtGui import QIcon, QFont, QPalette, QColor, QPixmap
-import json
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import pandas as pd
+from stock import (StockInsuffisantError, ConflitVersionError, CodeBarreError, plier_texte, DatabaseManager, StockService,
+                   COLONNES_TRACE, SEUIL_LENTE_MS)
 
-class DatabaseManager:
-    def __init__(self, db_path="stock_vaisselle.db"):
-        self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
-        """Initialise la base de données avec les tables nécessaires"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Table des articles
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS articles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                designation TEXT NOT NULL,
-                categorie TEXT NOT NULL,
-                quantite INTEGER DEFAULT 0,
-                unite TEXT DEFAULT 'pièce',
-                prix_unitaire REAL DEFAULT 0.0,
-                seuil_minimum INTEGER DEFAULT 10,
-                date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Table des entrées
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS entrees (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                article_id INTEGER,
-                quantite INTEGER NOT NULL,
-                date_entree DATE NOT NULL,
-                fournisseur TEXT,
-                prix_total REAL DEFAULT 0.0,
-                commentaire TEXT,
-                FOREIGN KEY (article_id) REFERENCES articles (id)
-            )
-        ''')
-        
-        # Table des sorties
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sorties (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                article_id INTEGER,
-                quantite INTEGER NOT NULL,
-                date_sortie DATE NOT NULL,
-                motif TEXT NOT NULL,
-                utilisateur TEXT,
-                commentaire TEXT,
-                FOREIGN KEY (article_id) REFERENCES articles (id)
-            )
-        ''')
-        
-        # Table des utilisateurs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS utilisateurs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nom_utilisateur TEXT UNIQUE NOT NULL,
-                mot_de_passe TEXT NOT NULL,
-                role TEXT DEFAULT 'utilisateur',
-                date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Insérer un utilisateur admin par défaut
-        cursor.execute('''
-            INSERT OR IGNORE INTO utilisateurs (nom_utilisateur, mot_de_passe, role)
-            VALUES ('admin', 'admin123', 'admin')
-        ''')
+def format_prix(valeur):
+    """Formate un montant en FCFA (vide si absent)"""
+    return f"{valeur:.2f} FCFA" if valeur else ""
+
+def format_texte(valeur):
+    """Formate une valeur quelconque (vide si absente)"""
+    return str(valeur) if valeur else ""
+
+class TableauModel(QAbstractTableModel):
+    """Modèle de tableau en lecture seule sur des colonnes de données.
+    
+    Les lignes sont stockées colonne par colonne et seules les cellules
+    visibles sont formatées, à la demande de la vue via data().
+    """
+    def __init__(self, entetes, formats=None, parent=None):
+        super().__init__(parent)
+        self.entetes = entetes
+        self.formats = formats or {}  # colonne -> fonction(valeur) -> texte
+        self.colonnes = [[] for _ in entetes]
+        self.nb_lignes = 0
+    
+    def set_rows(self, rows):
+        """Remplace toutes les lignes en une seule réinitialisation du modèle"""
+        self.beginResetModel()
+        self.nb_lignes = len(rows)
+        if rows:
+            self.colonnes = [list(colonne) for colonne in zip(*rows)]
+        else:
+            self.colonnes = [[] for _ in self.entetes]
+        self.endResetModel()
+    
+    def append_rows(self, rows):
+        """Ajoute des lignes à la fin du modèle"""
+        if not rows:
+            return
+        if not self.nb_lignes:
+            self.colonnes = [[] for _ in rows[0]]
+        self.beginInsertRows(QModelIndex(), self.nb_lignes, self.nb_lignes + len(rows) - 1)
+        for colonne, valeurs in zip(self.colonnes, zip(*rows)):
+            colonne.extend(valeurs)
+        self.nb_lignes += len(rows)
+        self.endInsertRows()
+    
+    def ligne(self, row):
+        """Retourne les valeurs brutes d'une ligne"""
+        return tuple(colonne[row] for colonne in self.colonnes)
+    
+    def valeur(self, row, col):
+        """Retourne la valeur brute d'une cellule"""
+        return self.colonnes[col][row]
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.nb_lignes
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entetes)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            valeur = self.colonnes[index.column()][index.row()]
+            format_colonne = self.formats.get(index.column())
+            return format_colonne(valeur) if format_colonne else str(valeur)
+        return None
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.entetes[section]
+        return super().headerData(section, orientation, role)
+
+class ArticlesModel(TableauModel):
+    """Modèle des articles, avec la colonne de statut calculée à l'affichage"""
+    COL_STATUT = 7
+    COULEURS_STATUT = {
+        "Épuisé": QColor(255, 0, 0),       # Rouge
+        "Stock bas": QColor(255, 165, 0),  # Orange
+        "Normal": QColor(0, 128, 0),       # Vert
+    }
+    
+    def __init__(self, parent=None):
+        super().__init__([
+            "ID", "Désignation", "Catégorie", "Quantité", "Unité",
+            "Prix unitaire", "Seuil minimum", "Statut"
+        ], {5: lambda valeur: f"{valeur:.2f} FCFA"}, parent)
+    
+    def update_rows(self, rows, article_ids):
+        """Met à jour en place les articles donnés (modifiés, ajoutés ou supprimés)
         
-        conn.commit()
-        conn.close()
+        rows contient les lignes actuelles en base de ceux de article_ids qui existent encore.
+        L'ordre par désignation est conservé.
+        """
+        recus = {row[0]: row for row in rows}
+        positions = None
+        
+        for article_id in article_ids:
+            if positions is None:
+                positions = {id_: pos for pos, id_ in enumerate(self.colonnes[0])} if self.nb_lignes else {}
+            pos = positions.get(article_id)
+            nouveau = recus.get(article_id)
+            
+            if pos is not None and nouveau is not None and self.colonnes[1][pos] == nouveau[1]:
+                # Même place dans l'ordre: mise à jour des cellules
+                for colonne, valeur in zip(self.colonnes, nouveau):
+                    colonne[pos] = valeur
+                self.dataChanged.emit(self.index(pos, 0), self.index(pos, self.columnCount() - 1))
+                continue
+            
+            if pos is not None:
+                self.beginRemoveRows(QModelIndex(), pos, pos)
+                for colonne in self.colonnes:
+                    del colonne[pos]
+                self.nb_lignes -= 1
+                self.endRemoveRows()
+            
+            if nouveau is not None:
+                if not self.nb_lignes:
+                    self.colonnes = [[] for _ in nouveau]
+                pos = bisect_right(self.colonnes[1], nouveau[1])
+                self.beginInsertRows(QModelIndex(), pos, pos)
+                for colonne, valeur in zip(self.colonnes, nouveau):
+                    colonne.insert(pos, valeur)
+                self.nb_lignes += 1
+                self.endInsertRows()
+            positions = None
+    
+    def statut(self, row):
+        """Retourne le statut du stock d'une ligne (non stocké: déduit de quantite et seuil)"""
+        quantite = self.colonnes[3][row]
+        if quantite == 0:
+            return "Épuisé"
+        elif quantite <= self.colonnes[6][row]:
+            return "Stock bas"
+        return "Normal"
+    
+    def ligne(self, row):
+        return super().ligne(row) + (self.statut(row),)
+    
+    def valeur(self, row, col):
+        if col == self.COL_STATUT:
+            return self.statut(row)
+        return super().valeur(row, col)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and index.column() == self.COL_STATUT:
+            if role == Qt.DisplayRole:
+                return self.statut(index.row())
+            elif role == Qt.BackgroundRole:
+                return self.COULEURS_STATUT[self.statut(index.row())]
+            elif role == Qt.ForegroundRole:
+                return QColor(255, 255, 255)  # Texte blanc
+            return None
+        return super().data(index, role)
+
+class IndexArticles:
+    """Index en colonnes des articles pour le filtrage
+    
+    Les désignations pliées sont concaténées en un seul texte: une recherche
+    de sous-chaîne y est faite par str.find (en C) et ne coûte qu'une itération
+    Python par article trouvé. Catégories et statuts sont groupés à l'avance.
+    Les structures dérivées sont reconstruites à la demande après une mise à jour.
+    """
+    def __init__(self, designations, categories, statuts):
+        self.designations = [self.plier(d) for d in designations]
+        self.categories = list(categories)
+        self.statuts = list(statuts)
+        self._invalider()
+    
+    @staticmethod
+    def plier(designation):
+        return plier_texte(designation).replace('\n', ' ')
     
-    def execute_query(self, query, params=None):
-        """Exécute une requête et retourne les résultats"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _invalider(self):
+        self.texte = None
+        self.debuts = None
+        self._par_categorie = None
+        self._par_statut = None
+    
+    def remplacer(self, row, designation, categorie, statut):
+        self.designations[row] = self.plier(designation)
+        self.categories[row] = categorie
+        self.statuts[row] = statut
+        self._invalider()
+    
+    def inserer(self, row, designation, categorie, statut):
+        self.designations.insert(row, self.plier(designation))
+        self.categories.insert(row, categorie)
+        self.statuts.insert(row, statut)
+        self._invalider()
+    
+    def supprimer(self, row):
+        del self.designations[row]
+        del self.categories[row]
+        del self.statuts[row]
+        self._invalider()
+    
+    @staticmethod
+    def _grouper(valeurs):
+        groupes = {}
+        for row, valeur in enumerate(valeurs):
+            groupes.setdefault(valeur, set()).add(row)
+        return groupes
+    
+    @property
+    def par_categorie(self):
+        if self._par_categorie is None:
+            self._par_categorie = self._grouper(self.categories)
+        return self._par_categorie
+    
+    @property
+    def par_statut(self):
+        if self._par_statut is None:
+            self._par_statut = self._grouper(self.statuts)
+        return self._par_statut
+    
+    def _preparer_texte(self):
+        self.texte = '\n'.join(self.designations) + '\n'
+        
+        # Position de début de chaque désignation dans le texte (+ sentinelle de fin)
+        self.debuts = []
+        position = 0
+        for designation in self.designations:
+            self.debuts.append(position)
+            position += len(designation) + 1
+        self.debuts.append(position)
+    
+    def lignes_contenant(self, motif, parmi=None):
+        """Lignes dont la désignation contient le motif (déjà plié)
         
-        if params:
-            cursor.execute(query, params)
+        Si `parmi` est fourni (résultat d'un motif plus court), seules ces lignes sont testées.
+        """
+        if parmi is not None:
+            return [row for row in parmi if motif in self.designations[row]]
+        
+        if self.texte is None:
+            self._preparer_texte()
+        
+        if self.texte.count(motif) * 8 > len(self.designations):
+            # Motif très fréquent: un simple parcours de la colonne est plus rapide
+            return [row for row, designation in enumerate(self.designations) if motif in designation]
+        
+        lignes = []
+        texte, debuts = self.texte, self.debuts
+        pos = texte.find(motif)
+        while pos != -1:
+            row = bisect_right(debuts, pos) - 1
+            lignes.append(row)
+            pos = texte.find(motif, debuts[row + 1])
+        return lignes
+
+class ArticlesFiltresProxy(QAbstractProxyModel):
+    """Vue filtrée des articles par désignation, catégorie et statut de stock
+    
+    Chaque critère garde son dernier résultat: seul le critère modifié est
+    réévalué, puis les résultats sont intersectés.
+    """
+    STATUTS_FILTRE = {"Stock normal": "Normal", "Stock bas": "Stock bas", "Stock épuisé": "Épuisé"}
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.index_articles = None
+        self.filtres = {'texte': "", 'categorie': None, 'statut': None}
+        self.resultats = {'texte': None, 'categorie': None, 'statut': None}  # None = tout passe
+        self.lignes = []          # lignes source visibles, dans l'ordre
+        self._positions = None    # ligne source -> ligne visible, construit à la demande
+    
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.modelReset.connect(self._source_reinitialisee)
+        model.dataChanged.connect(self._source_modifiee)
+        model.rowsInserted.connect(self._source_lignes_inserees)
+        model.rowsRemoved.connect(self._source_lignes_supprimees)
+        self._source_reinitialisee()
+    
+    def _source_reinitialisee(self):
+        model = self.sourceModel()
+        n = model.rowCount()
+        self.index_articles = IndexArticles(
+            model.colonnes[1] if n else [], model.colonnes[2] if n else [],
+            [model.statut(row) for row in range(n)]
+        )
+        self._reevaluer()
+    
+    def _indexer_ligne(self, row):
+        model = self.sourceModel()
+        return model.valeur(row, 1), model.valeur(row, 2), model.statut(row)
+    
+    def _source_modifiee(self, haut_gauche, bas_droite, roles=()):
+        for row in range(haut_gauche.row(), bas_droite.row() + 1):
+            self.index_articles.remplacer(row, *self._indexer_ligne(row))
+        
+        # Si les lignes visibles ne changent pas, on évite de réinitialiser la vue
+        precedentes = self.lignes
+        self._reevaluer(reinitialiser=False)
+        if list(self.lignes) != list(precedentes):
+            nouvelles, self.lignes = self.lignes, precedentes
+            self.beginResetModel()
+            self.lignes, self._positions = nouvelles, None
+            self.endResetModel()
         else:
-            cursor.execute(query)
-        
-        if query.strip().upper().startswith('SELECT'):
-            results = cursor.fetchall()
+            for row in range(haut_gauche.row(), bas_droite.row() + 1):
+                debut = self.mapFromSource(self.sourceModel().index(row, 0))
+                if debut.isValid():
+                    self.dataChanged.emit(debut, self.index(debut.row(), self.columnCount() - 1), roles)
+    
+    def _source_lignes_inserees(self, parent, premiere, derniere):
+        for row in range(premiere, derniere + 1):
+            self.index_articles.inserer(row, *self._indexer_ligne(row))
+        self._reevaluer()
+    
+    def _source_lignes_supprimees(self, parent, premiere, derniere):
+        for row in range(derniere, premiere - 1, -1):
+            self.index_articles.supprimer(row)
+        self._reevaluer()
+    
+    def _reevaluer(self, reinitialiser=True):
+        """Réévalue tous les critères (les lignes de la source ont changé)"""
+        self.resultats = dict.fromkeys(self.resultats)
+        self._evaluer('texte')
+        self._evaluer('categorie')
+        self._evaluer('statut')
+        self._appliquer(reinitialiser)
+    
+    def set_filtres(self, texte, categorie=None, statut=None):
+        """Applique les critères (None = pas de filtre) en ne réévaluant que ceux qui changent"""
+        texte = plier_texte(texte.strip())
+        modifies = False
+        for critere, valeur in (('texte', texte), ('categorie', categorie), ('statut', statut)):
+            if self.filtres[critere] != valeur:
+                precedent = self.filtres[critere]
+                self.filtres[critere] = valeur
+                self._evaluer(critere, precedent)
+                modifies = True
+        if modifies:
+            self._appliquer()
+    
+    def _evaluer(self, critere, precedent=None):
+        index = self.index_articles
+        valeur = self.filtres[critere]
+        if not valeur:
+            self.resultats[critere] = None
+        elif critere == 'texte':
+            # Motif prolongé: on ne reteste que les lignes déjà retenues
+            parmi = self.resultats['texte'] if precedent and precedent in valeur else None
+            self.resultats['texte'] = index.lignes_contenant(valeur, parmi)
+        elif critere == 'categorie':
+            self.resultats['categorie'] = index.par_categorie.get(valeur, set())
         else:
-            conn.commit()
-            results = cursor.rowcount
-        
-        conn.close()
-        return results
+            self.resultats['statut'] = index.par_statut.get(self.STATUTS_FILTRE.get(valeur), set())
+    
+    def _appliquer(self, reinitialiser=True):
+        """Intersecte les résultats des critères et met à jour la vue"""
+        actifs = [r for r in self.resultats.values() if r is not None]
+        if reinitialiser:
+            self.beginResetModel()
+        if not actifs:
+            self.lignes = range(self.sourceModel().rowCount())
+        else:
+            # On part du résultat le plus petit
+            actifs.sort(key=len)
+            lignes = actifs[0]
+            for autre in actifs[1:]:
+                autre = autre if isinstance(autre, set) else set(autre)
+                lignes = [row for row in lignes if row in autre]
+            self.lignes = sorted(lignes) if isinstance(actifs[0], set) else lignes
+        self._positions = None
+        if reinitialiser:
+            self.endResetModel()
+    
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self.lignes)):
+            return QModelIndex()
+        return self.createIndex(row, column)
+    
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lignes)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.sourceModel().columnCount()
+    
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(self.lignes[proxy_index.row()], proxy_index.column())
+    
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        if self._positions is None:
+            self._positions = {source: row for row, source in enumerate(self.lignes)}
+        row = self._positions.get(source_index.row())
+        return QModelIndex() if row is None else self.createIndex(row, source_index.column())
 
-    def get_total_ventes_du_jour(self):
-        """Calcule la somme totale des produits vendus aujourd'hui"""
-        today = date.today().isoformat()
-        query = """
-            SELECT SUM(s.quantite * a.prix_unitaire)
-            FROM sorties s
-            JOIN articles a ON s.article_id = a.id
-            WHERE s.date_sortie = ?
-        """
-        total = self.execute_query(query, (today,))[0][0]
-        return total or 0
+class NotificationsBase(QObject):
+    """Relaie vers le thread de l'interface les changements publiés par DatabaseManager"""
+    changement = pyqtSignal(object, object)  # tables, ids d'articles (None = tous)
+    
+    def emettre(self, tables, article_ids):
+        self.changement.emit(tables, article_ids)
+
+class SignauxTache(QObject):
+    """Signaux d'une tâche de fond (émis depuis le thread de la tâche)"""
+    resultat = pyqtSignal(object)
+    erreur = pyqtSignal(object)  # l'exception levée
+    progression = pyqtSignal(object, object)  # (fait, total)
+
+class TacheFond(QRunnable):
+    """Exécute une fonction dans le pool de threads et renvoie son résultat par signal"""
+    def __init__(self, fonction, *args, **kwargs):
+        super().__init__()
+        self.fonction = fonction
+        self.args = args
+        self.kwargs = kwargs
+        self.signaux = SignauxTache()
+    
+    def run(self):
+        try:
+            resultat = self.fonction(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signaux.erreur.emit(e)
+        else:
+            self.signaux.resultat.emit(resultat)
+
+class MouvementsModel(TableauModel):
+    """Modèle des entrées ou sorties chargé page par page au fil du défilement
+    
+    Les pages sont lues par clé (date, id) décroissante et, comme le nombre total
+    de lignes de la période, en tâche de fond: lancer est le run_in_background de
+    la fenêtre, qui ne livre que le résultat de la dernière demande par clé.
+    """
+    TAILLE_PAGE = 200
+    COL_ID, COL_DATE = 0, 3
+    
+    total_connu = pyqtSignal(int)
+    
+    def __init__(self, db_manager, table, entetes, formats=None, parent=None, lancer=None):
+        super().__init__(entetes, formats, parent)
+        self.db_manager = db_manager
+        self.table = table
+        self.lancer = lancer
+        self.periode = None
+        self.fin_atteinte = True
+        self.page_en_cours = False
+    
+    def charger(self, date_from, date_to):
+        """Recharge la période: première page, puis les suivantes à la demande"""
+        self.periode = (date_from, date_to)
+        self.fin_atteinte = False
+        self.page_en_cours = False
+        self.set_rows([])
+        # Remplace une page de l'ancienne période encore en cours (même clé)
+        self.fetchMore()
+        self.lancer(('total', self.table), self.db_manager.count_mouvements, self.table, date_from, date_to,
+                    on_result=self.total_connu.emit)
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.fin_atteinte and not self.page_en_cours
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        apres = None
+        if self.nb_lignes:
+            derniere = self.nb_lignes - 1
+            apres = (self.colonnes[self.COL_DATE][derniere], self.colonnes[self.COL_ID][derniere])
+        
+        self.page_en_cours = True
+        self.lancer(('page', self.table), self.db_manager.fetch_mouvements_page,
+                    self.table, *self.periode, apres=apres, limite=self.TAILLE_PAGE,
+                    on_result=self._page_recue)
+    
+    def _page_recue(self, rows):
+        self.page_en_cours = False
+        if len(rows) < self.TAILLE_PAGE:
+            self.fin_atteinte = True
+        self.append_rows(rows)
+
+def creer_vue_tableau(model):
+    """Crée une vue de tableau (sélection par ligne) sur un modèle"""
+    vue = QTableView()
+    vue.setModel(model)
+    vue.setSelectionBehavior(QAbstractItemView.SelectRows)
+    vue.setSelectionMode(QAbstractItemView.SingleSelection)
+    vue.verticalHeader().setVisible(False)
+    return vue
+
+class SelecteurArticle(QLineEdit):
+    """Saisie d'un article avec suggestions au fil de la frappe
+    
+    articles: lignes (id, designation, ...) proposables; libelle(ligne) donne le
+    texte d'une suggestion. La recherche passe par un IndexRecherche partagé.
+    """
+    article_choisi = pyqtSignal(object)
+    
+    def __init__(self, index, articles, libelle, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.articles = {article[0]: article for article in articles}
+        self.libelle = libelle
+        self.courant = None
+        self.suggestions = []
+        self.setPlaceholderText("Tapez quelques lettres de l'article...")
+        
+        self.suggestions_model = QStringListModel(self)
+        self.completer = QCompleter(self.suggestions_model, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setMaxVisibleItems(12)
+        self.completer.setWidget(self)
+        self.completer.activated[QModelIndex].connect(lambda index: self.choisir(self.suggestions[index.row()]))
+        self.textEdited.connect(self.suggerer)
+    
+    def suggerer(self, texte):
+        """Affiche les meilleurs articles pour le texte tapé"""
+        self.courant = None
+        self.suggestions = self.index.rechercher(texte, parmi=self.articles)
+        self.suggestions_model.setStringList([self.libelle(self.articles[i]) for i in self.suggestions])
+        if self.suggestions:
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+    
+    def choisir(self, article_id):
+        self.courant = article_id
+        self.setText(self.libelle(self.articles[article_id]))
+        self.completer.popup().hide()
+        self.index.utiliser(article_id)
+        self.article_choisi.emit(self.articles[article_id])
+    
+    def article(self):
+        """Ligne de l'article choisi, ou None"""
+        return self.articles.get(self.courant)
+    
+    def article_id(self):
+        return self.courant
+    
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key_Return, Qt.Key_Enter) and self.courant is None:
+            # Entrée sans choix: la première suggestion, sans valider le dialogue
+            if self.suggestions:
+                self.choisir(self.suggestions[0])
+            event.accept()
+            return
+        if event.key() == Qt.Key_Down and not self.completer.popup().isVisible():
+            self.suggerer(self.text())
+            return
+        super().keyPressEvent(event)
+
+class SaisieCode(QLineEdit):
+    """Champ de saisie de codes-barres: une douchette tape le code puis Entrée
+    
+    Entrée émet code_saisi au lieu de valider le dialogue.
+    """
+    code_saisi = pyqtSignal(str)
+    
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key_Return, Qt.Key_Enter):
+            self.code_saisi.emit(self.text())
+            event.accept()
+            return
+        super().keyPressEvent(event)
 
 class ArticleDialog(QDialog):
-    def __init__(self, db_manager, article_data=None):
+    def __init__(self, db_manager, article_data=None, codes=()):
         super().__init__()
         self.db_manager = db_manager
         self.article_data = article_data
+        self.codes = codes
         self.init_ui()
         
         if article_data:
@@ -135,7 +592,7 @@ class ArticleDialog(QDialog):
     
     def init_ui(self):
         self.setWindowTitle("Ajouter un article" if not self.article_data else "Modifier l'article")
-        self.setFixedSize(400, 300)
+        self.setFixedSize(400, 330)
         
         layout = QVBoxLayout()
         
@@ -145,6 +602,12 @@ class ArticleDialog(QDialog):
         self.designation_edit = QLineEdit()
         form_layout.addRow("Désignation:", self.designation_edit)
         
+        # Codes séparés par des virgules; chaque scan en ajoute un
+        self.codes_edit = SaisieCode(", ".join(self.codes))
+        self.codes_edit.setPlaceholderText("Scannez ou tapez, séparés par des virgules")
+        self.codes_edit.code_saisi.connect(self.code_scanne)
+        form_layout.addRow("Codes-barres:", self.codes_edit)
+        
         self.categorie_combo = QComboBox()
         self.categorie_combo.setEditable(True)
         categories = ["Assiettes", "Verres", "Couverts", "Plats", "Bols", "Tasses", "Autre"]
@@ -170,6 +633,9 @@ class ArticleDialog(QDialog):
         self.seuil_spin = QSpinBox()
         self.seuil_spin.setRange(0, 999999)
         self.seuil_spin.setValue(10)
+        self.seuil_spin.setToolTip(
+            "Remplacé au démarrage par le point de commande prévu, dès que l'article a des sorties"
+        )
         form_layout.addRow("Seuil minimum:", self.seuil_spin)
         
         layout.addLayout(form_layout)
@@ -182,6 +648,11 @@ class ArticleDialog(QDialog):
         
         self.setLayout(layout)
     
+    def code_scanne(self, texte):
+        """Prépare la saisie du code suivant"""
+        if texte.strip(", "):
+            self.codes_edit.setText(texte.rstrip(", ") + ", ")
+    
     def load_article_data(self):
         """Charge les données de l'article pour modification"""
         self.designation_edit.setText(self.article_data[1])
@@ -193,21 +664,27 @@ class ArticleDialog(QDialog):
     
     def get_data(self):
         """Retourne les données du formulaire"""
-        return {
+        data = {
             'designation': self.designation_edit.text().strip(),
             'categorie': self.categorie_combo.currentText().strip(),
             'quantite': self.quantite_spin.value(),
             'unite': self.unite_combo.currentText().strip(),
             'prix_unitaire': self.prix_spin.value(),
-            'seuil_minimum': self.seuil_spin.value()
+            'seuil_minimum': self.seuil_spin.value(),
+            'codes': [code.strip() for code in self.codes_edit.text().split(",") if code.strip()]
         }
+        if self.article_data:
+            # Version lue à l'ouverture: l'enregistrement échoue si un autre poste a modifié l'article
+            data['version'] = self.article_data[8]
+        return data
 
 class MouvementDialog(QDialog):
-    def __init__(self, db_manager, movement_type, articles):
+    def __init__(self, db_manager, movement_type, articles, index):
         super().__init__()
         self.db_manager = db_manager
         self.movement_type = movement_type  # 'entree' ou 'sortie'
         self.articles = articles
+        self.index = index  # IndexRecherche pour le choix de l'article
         self.init_ui()
     
     def init_ui(self):
@@ -221,10 +698,10 @@ class MouvementDialog(QDialog):
         form_layout = QFormLayout()
         
         # Article
-        self.article_combo = QComboBox()
-        for article in self.articles:
-            self.article_combo.addItem(f"{article[1]} ({article[3]} {article[4]})", article[0])
-        form_layout.addRow("Article:", self.article_combo)
+        self.selecteur = SelecteurArticle(
+            self.index, self.articles, lambda article: f"{article[1]} ({article[3]} {article[4]})"
+        )
+        form_layout.addRow("Article:", self.selecteur)
         
         # Quantité
         self.quantite_spin = QSpinBox()
@@ -270,16 +747,24 @@ class MouvementDialog(QDialog):
         
         # Boutons
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        buttons.accepted.connect(self.accept)
+        buttons.accepted.connect(self.valider)
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
         
         self.setLayout(layout)
+        self.selecteur.setFocus()
+    
+    def valider(self):
+        if self.selecteur.article_id() is None:
+            QMessageBox.warning(self, "Erreur", "Choisissez un article dans la liste.")
+            self.selecteur.setFocus()
+            return
+        self.accept()
     
     def get_data(self):
         """Retourne les données du formulaire"""
         data = {
-            'article_id': self.article_combo.currentData(),
+            'article_id': self.selecteur.article_id(),
             'quantite': self.quantite_spin.value(),
             'date': self.date_edit.date().toPyDate(),
             'commentaire': self.commentaire_edit.toPlainText().strip()
@@ -298,25 +783,207 @@ class MouvementDialog(QDialog):
         
         return data
 
-class VenteDialog(QDialog):
-    def __init__(self, db_manager):
+class PeriodeDialog(QDialog):
+    """Choix de la période d'un rapport des mouvements"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Période du rapport")
+        
+        layout = QVBoxLayout()
+        form_layout = QFormLayout()
+        
+        self.tout_check = QCheckBox("Tout l'historique")
+        self.tout_check.toggled.connect(self.toggle_dates)
+        form_layout.addRow(self.tout_check)
+        
+        # Par défaut: le mois précédent, pour les rapports mensuels
+        debut_mois = QDate.currentDate().addDays(1 - QDate.currentDate().day())
+        self.date_debut_edit = QDateEdit()
+        self.date_debut_edit.setDate(debut_mois.addMonths(-1))
+        self.date_debut_edit.setCalendarPopup(True)
+        form_layout.addRow("Du:", self.date_debut_edit)
+        
+        self.date_fin_edit = QDateEdit()
+        self.date_fin_edit.setDate(debut_mois.addDays(-1))
+        self.date_fin_edit.setCalendarPopup(True)
+        form_layout.addRow("Au:", self.date_fin_edit)
+        
+        layout.addLayout(form_layout)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        
+        self.setLayout(layout)
+    
+    def toggle_dates(self, tout):
+        self.date_debut_edit.setEnabled(not tout)
+        self.date_fin_edit.setEnabled(not tout)
+    
+    def get_periode(self):
+        """Retourne (date_debut, date_fin), ou (None, None) pour tout l'historique"""
+        if self.tout_check.isChecked():
+            return None, None
+        return self.date_debut_edit.date().toPyDate(), self.date_fin_edit.date().toPyDate()
+
+class RechercheDialog(QDialog):
+    """Résultats de la recherche globale (articles, entrées, sorties)"""
+    def __init__(self, db_manager, texte=""):
         super().__init__()
         self.db_manager = db_manager
+        self.setWindowTitle("Recherche globale")
+        self.resize(800, 450)
+        self.init_ui()
+        
+        if texte:
+            self.search_edit.setText(texte)
+            self.rechercher()
+    
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        
+        search_layout = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Article, fournisseur, motif, commentaire...")
+        self.search_edit.returnPressed.connect(self.rechercher)
+        search_layout.addWidget(self.search_edit)
+        
+        search_btn = QPushButton("Rechercher")
+        search_btn.clicked.connect(self.rechercher)
+        search_layout.addWidget(search_btn)
+        layout.addLayout(search_layout)
+        
+        self.resultats_model = TableauModel(
+            ["Type", "ID", "Article", "Date", "Détail"], dict.fromkeys(range(5), format_texte), self
+        )
+        self.resultats_table = creer_vue_tableau(self.resultats_model)
+        self.resultats_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        layout.addWidget(self.resultats_table)
+        
+        self.resultats_label = QLabel("")
+        layout.addWidget(self.resultats_label)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+    
+    def rechercher(self):
+        resultats = self.db_manager.search(self.search_edit.text(), limite=200)
+        self.resultats_model.set_rows(resultats)
+        self.resultats_label.setText(f"{len(resultats)} résultat(s)")
+
+class TraceSQLDialog(QDialog):
+    """Statistiques des requêtes SQL par forme, pour trouver celle qui ralentit le poste"""
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.setWindowTitle("Trace des requêtes SQL")
+        self.resize(1000, 500)
+        self.init_ui()
+        self.actualiser()
+    
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        
+        options_layout = QHBoxLayout()
+        self.active_check = QCheckBox("Tracer les requêtes")
+        self.active_check.setChecked(self.db_manager.trace_active)
+        self.active_check.toggled.connect(self.basculer)
+        options_layout.addWidget(self.active_check)
+        
+        self.seuil_spin = QSpinBox()
+        self.seuil_spin.setRange(1, 600000)
+        self.seuil_spin.setSuffix(" ms")
+        trace = self.db_manager.trace
+        self.seuil_spin.setValue(round(trace.seuil * 1000) if trace else SEUIL_LENTE_MS)
+        self.seuil_spin.valueChanged.connect(self.changer_seuil)
+        options_layout.addWidget(QLabel("Requête lente au-delà de:"))
+        options_layout.addWidget(self.seuil_spin)
+        options_layout.addStretch()
+        
+        actualiser_btn = QPushButton("Actualiser")
+        actualiser_btn.clicked.connect(self.actualiser)
+        options_layout.addWidget(actualiser_btn)
+        
+        reinitialiser_btn = QPushButton("Remettre à zéro")
+        reinitialiser_btn.clicked.connect(self.reinitialiser)
+        options_layout.addWidget(reinitialiser_btn)
+        layout.addLayout(options_layout)
+        
+        self.stats_model = TableauModel(COLONNES_TRACE, {0: format_texte}, self)
+        self.stats_table = creer_vue_tableau(self.stats_model)
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.stats_table.setWordWrap(False)
+        layout.addWidget(self.stats_table)
+        
+        self.journal_label = QLabel("")
+        layout.addWidget(self.journal_label)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+    
+    def basculer(self, active):
+        if active:
+            self.db_manager.activer_trace(self.seuil_spin.value())
+        else:
+            self.db_manager.desactiver_trace()
+        self.actualiser()
+    
+    def changer_seuil(self, seuil_ms):
+        if self.db_manager.trace:
+            self.db_manager.trace.seuil = seuil_ms / 1000
+    
+    def reinitialiser(self):
+        if self.db_manager.trace:
+            self.db_manager.trace.reinitialiser()
+        self.actualiser()
+    
+    def actualiser(self):
+        trace = self.db_manager.trace
+        self.stats_model.set_rows(trace.statistiques() if trace else [])
+        if trace:
+            self.journal_label.setText(
+                f"Requêtes lentes et leur plan d'exécution: {os.path.abspath(trace.journal)}"
+            )
+        else:
+            self.journal_label.setText("Trace inactive (activable aussi au lancement par VAISSELLES_TRACE_SQL=<ms>)")
+
+class VenteDialog(QDialog):
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
         self.setWindowTitle("Nouvelle Vente")
         self.setFixedSize(500, 400)
         self.panier = []  # Liste des (article_id, designation, quantite, prix_unitaire)
+        self.lignes_panier = {}  # article_id -> position de sa ligne dans le panier
+        self.reservation = uuid.uuid4().hex  # Identifiant du panier pour les réservations
+        self.finished.connect(self.liberer_reservations)
         self.init_ui()
 
     def init_ui(self):
         layout = QVBoxLayout(self)
-        self.articles = self.db_manager.execute_query(
-            "SELECT id, designation, prix_unitaire, quantite FROM articles WHERE quantite > 0 ORDER BY designation"
-        )
+        self.articles = self.service.articles_disponibles()
 
-        self.article_combo = QComboBox()
-        for art in self.articles:
-            self.article_combo.addItem(f"{art[1]} ({art[3]} dispo)", art)
-        layout.addWidget(self.article_combo)
+        # Douchette: chaque code scanné ajoute la quantité choisie de l'article au panier
+        scan_layout = QHBoxLayout()
+        self.scan_check = QCheckBox("Mode scan")
+        self.scan_check.setChecked(True)
+        self.scan_check.toggled.connect(self.basculer_scan)
+        scan_layout.addWidget(self.scan_check)
+        self.scan_edit = SaisieCode()
+        self.scan_edit.setPlaceholderText("Code-barres")
+        self.scan_edit.code_saisi.connect(self.scanner)
+        scan_layout.addWidget(self.scan_edit)
+        layout.addLayout(scan_layout)
+        self.scan_label = QLabel("")
+        layout.addWidget(self.scan_label)
+
+        self.selecteur = SelecteurArticle(
+            self.service.index_articles(), self.articles, lambda art: f"{art[1]} ({art[3]} dispo)"
+        )
+        layout.addWidget(self.selecteur)
 
         self.qte_spin = QSpinBox()
         self.qte_spin.setRange(1, 1000)
@@ -336,42 +1003,114 @@ class VenteDialog(QDialog):
         buttons.accepted.connect(self.enregistrer_vente)
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
+        self.basculer_scan(self.scan_check.isChecked())
+
+    def basculer_scan(self, actif):
+        self.scan_edit.setVisible(actif)
+        self.scan_label.setVisible(actif)
+        (self.scan_edit if actif else self.selecteur).setFocus()
+
+    def ajouter_ligne(self, article_id, designation, prix, qte):
+        """Ajoute qte de l'article au panier (sa ligne est complétée s'il y est déjà)
+        
+        Lève StockInsuffisantError si la quantité ne peut pas être réservée.
+        """
+        position = self.lignes_panier.get(article_id)
+        quantite = qte + (self.panier[position][2] if position is not None else 0)
+        # Met la quantité de côté tant que le panier est ouvert
+        self.service.reserver(self.reservation, article_id, quantite)
+        texte = f"{designation} x{quantite} @ {prix:.2f} FCFA = {quantite*prix:.2f} FCFA"
+        if position is None:
+            position = self.lignes_panier[article_id] = len(self.panier)
+            self.panier.append((article_id, designation, quantite, prix))
+            self.panier_list.addItem(texte)
+        else:
+            self.panier[position] = (article_id, designation, quantite, prix)
+            self.panier_list.item(position).setText(texte)
+        self.panier_list.setCurrentRow(position)
+        self.update_total()
 
     def ajouter_au_panier(self):
-        art = self.article_combo.currentData()
-        qte = self.qte_spin.value()
-        if qte > art[3]:
-            QMessageBox.warning(self, "Erreur", "Stock insuffisant.")
+        art = self.selecteur.article()
+        if art is None:
+            QMessageBox.warning(self, "Erreur", "Choisissez un article dans la liste.")
             return
-        self.panier.append((art[0], art[1], qte, art[2]))
-        self.panier_list.addItem(f"{art[1]} x{qte} @ {art[2]:.2f} FCFA = {qte*art[2]:.2f} FCFA")
-        self.update_total()
+        try:
+            self.ajouter_ligne(art[0], art[1], art[2], self.qte_spin.value())
+        except StockInsuffisantError as e:
+            QMessageBox.warning(self, "Erreur", str(e))
+            return
+        self.selecteur.clear()
+        self.selecteur.courant = None
+        self.basculer_scan(self.scan_check.isChecked())
+
+    def scanner(self, code):
+        """Ajoute l'article scanné; un échec est signalé par un bip, sans fenêtre à fermer"""
+        self.scan_edit.clear()
+        code = code.strip()
+        if not code:
+            return
+        art = self.service.article_par_code(code)
+        if art is None:
+            self.signaler_scan(f"Code inconnu : {code}", erreur=True)
+            return
+        try:
+            self.ajouter_ligne(art[0], art[1], art[5], self.qte_spin.value())
+        except StockInsuffisantError as e:
+            self.signaler_scan(str(e), erreur=True)
+            return
+        self.qte_spin.setValue(1)
+        self.signaler_scan(f"{art[1]} : {self.panier[self.lignes_panier[art[0]]][2]} au panier")
+
+    def signaler_scan(self, message, erreur=False):
+        if erreur:
+            QApplication.beep()
+        self.scan_label.setStyleSheet("color: red;" if erreur else "")
+        self.scan_label.setText(message)
 
     def update_total(self):
         total = sum(qte*prix for _,_,qte,prix in self.panier)
         self.total_label.setText(f"Total : {total:.2f} FCFA")
 
     def enregistrer_vente(self):
-        for article_id, _, quantite, _ in self.panier:
-            self.db_manager.execute_query(
-                "INSERT INTO sorties (article_id, quantite, date_sortie, motif, utilisateur, commentaire) VALUES (?, ?, ?, ?, ?, ?)",
-                (article_id, quantite, date.today().isoformat(), "Vente", "Caissier", "")
-            )
-            self.db_manager.execute_query(
-                "UPDATE articles SET quantite = quantite - ? WHERE id = ?",
-                (quantite, article_id)
+        try:
+            # Tout le panier en une seule transaction
+            self.service.enregistrer_vente(
+                [(article_id, quantite) for article_id, _, quantite, _ in self.panier],
+                reservation=self.reservation
             )
+        except StockInsuffisantError as e:
+            QMessageBox.warning(self, "Erreur", f"Vente annulée. {e}")
+            return
         self.accept()
 
+    def liberer_reservations(self):
+        if self.panier:
+            try:
+                self.service.liberer_reservations(self.reservation)
+            except Exception:
+                pass  # Les réservations expireront d'elles-mêmes
+
     def get_recapitulatif(self):
         recap = "\n".join([f"{d} x{q} = {q*p:.2f} FCFA" for _,d,q,p in self.panier])
         total = sum(q*p for _,_,q,p in self.panier)
         return recap, total
 
 class StockManagementApp(QMainWindow):
-    def __init__(self):
+    # Au-delà, un changement d'articles recharge tout le tableau au lieu de le patcher
+    MAJ_CIBLEE_MAX = 500
+    
+    def __init__(self, serveur=None):
         super().__init__()
-        self.db_manager = DatabaseManager()
+        self.serveur = serveur
+        if serveur:
+            # Mode poste: lectures et écritures passent par le serveur de stock
+            from serveur import BaseDistante, ServiceDistant
+            self.db_manager = BaseDistante(serveur)
+            self.service = ServiceDistant(self.db_manager)
+        else:
+            self.db_manager = DatabaseManager()
+            self.service = StockService(self.db_manager)
         self.current_user = "Utilisateur"
         self.user_role = "utilisateur"
         
@@ -380,20 +1119,97 @@ class StockManagementApp(QMainWindow):
         #     sys.exit()
         # ==> On saute l'authentification, on définit un utilisateur par défaut
 
+        # Tâches de fond: la dernière demande par clé, et le nombre de tâches en cours
+        self.taches = {}
+        self.generations = {}
+        self.taches_en_cours = 0
+        
         self.init_ui()
+        
+        # Rafraîchissement ciblé après chaque écriture
+        self.notifications = NotificationsBase(self)
+        self.notifications.changement.connect(self.on_db_change)
+        self.db_manager.abonner(self.notifications.emettre)
+        
         self.load_data()
         
-        # Timer pour vérifier les stocks bas
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.check_low_stock)
-        self.timer.start(60000)  # Vérification toutes les minutes
+        # En mode poste, le serveur s'en charge à son démarrage
+        if not serveur:
+            # Clôtures de fin de mois manquantes (stock à date sans relire tout l'historique)
+            self.run_in_background('clotures', self.service.cloturer_mois_ecoules)
+            
+            # Prévisions de consommation: seuils minimum dynamiques et suggestions d'achat
+            self.run_in_background('previsions', self.service.calculer_previsions,
+                                   on_result=self.previsions_done, on_error=self.previsions_failed)
+        
+        # Alertes de stock en attente: ensuite signalées au fil des écritures, sans scrutation
+        self.check_low_stock()
+    
+    def run_in_background(self, cle, fonction, *args, on_result=None, on_error=None, on_progress=None,
+                          **kwargs):
+        """Exécute fonction(*args, **kwargs) dans le pool de threads
+        
+        Seule la dernière demande faite pour une même clé est livrée: une demande
+        encore en file d'attente est retirée, le résultat d'une demande déjà
+        lancée est ignoré. on_result/on_error sont appelés dans le thread de l'interface.
+        Avec on_progress, la fonction reçoit un argument progression(fait, total)
+        dont les appels sont relayés à on_progress dans le thread de l'interface.
+        """
+        pool = QThreadPool.globalInstance()
+        precedente = self.taches.get(cle)
+        try:
+            retiree = precedente is not None and pool.tryTake(precedente)
+        except RuntimeError:
+            retiree = False  # déjà exécutée et libérée par le pool, résultat pas encore livré
+        if retiree:
+            self._fin_tache()
+        
+        generation = self.generations.get(cle, 0) + 1
+        self.generations[cle] = generation
+        
+        tache = TacheFond(fonction, *args, **kwargs)
+        if on_progress:
+            tache.kwargs['progression'] = tache.signaux.progression.emit
+            tache.signaux.progression.connect(on_progress)
+        tache.signaux.resultat.connect(
+            lambda resultat: self._tache_terminee(cle, generation, on_result, resultat)
+        )
+        tache.signaux.erreur.connect(
+            lambda erreur: self._tache_terminee(cle, generation, on_error or self._erreur_tache, erreur)
+        )
+        self.taches[cle] = tache
+        self.taches_en_cours += 1
+        self.busy_bar.setVisible(True)
+        pool.start(tache)
+    
+    def _tache_terminee(self, cle, generation, callback, valeur):
+        self._fin_tache()
+        if self.generations.get(cle) != generation:
+            return  # Demande périmée
+        self.taches.pop(cle, None)
+        if callback:
+            callback(valeur)
+    
+    def _fin_tache(self):
+        self.taches_en_cours -= 1
+        self.busy_bar.setVisible(self.taches_en_cours > 0)
+    
+    def _erreur_tache(self, erreur):
+        self.status_bar.showMessage(f"Erreur de chargement: {erreur}")
+    
+    def closeEvent(self, event):
+        """Libère les connexions à la base à la fermeture de la fenêtre"""
+        QThreadPool.globalInstance().waitForDone()
+        self.db_manager.close()
+        super().closeEvent(event)
     
     # Supprime la méthode authenticate (plus nécessaire)
     # def authenticate(self):
     #     ...
 
     def init_ui(self):
-        self.setWindowTitle(f"Gestion de Stocks de Vaisselle - {self.current_user} ({self.user_role})")
+        self.setWindowTitle(f"Gestion de Stocks de Vaisselle - {self.current_user} ({self.user_role})"
+                            + (f" - {self.serveur}" if self.serveur else ""))
         self.setGeometry(100, 100, 1200, 800)
         
         # Widget central
@@ -425,12 +1241,35 @@ class StockManagementApp(QMainWindow):
         self.dashboard_tab = self.create_dashboard_tab()
         self.tab_widget.addTab(self.dashboard_tab, "Tableau de bord")
         
+        # Onglet Analyses (calculé à l'affichage de l'onglet)
+        self.analyses_tab = self.create_analyses_tab()
+        self.tab_widget.addTab(self.analyses_tab, "Analyses")
+        self.tab_widget.currentChanged.connect(self.load_analyses)
+        
         main_layout.addWidget(self.tab_widget)
         
         # Barre de statut
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("Prêt")
+        
+        # Indicateur d'activité des tâches de fond
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.setMaximumWidth(120)
+        self.busy_bar.setMaximumHeight(14)
+        self.busy_bar.setVisible(False)
+        self.status_bar.addPermanentWidget(self.busy_bar)
+        
+        # Diagnostic des lenteurs: trace des requêtes de la base locale
+        if not self.serveur:
+            trace_btn = QPushButton("SQL")
+            trace_btn.setFlat(True)
+            trace_btn.setToolTip("Trace des requêtes SQL (Ctrl+Maj+T)")
+            trace_btn.setShortcut("Ctrl+Shift+T")
+            trace_btn.clicked.connect(self.show_trace_sql)
+            self.status_bar.addPermanentWidget(trace_btn)
+            self.trace_dialog = None
     
     def create_toolbar(self):
         """Crée la barre d'outils"""
@@ -460,6 +1299,16 @@ class StockManagementApp(QMainWindow):
         report_action.triggered.connect(self.generate_report)
         toolbar.addAction(report_action)
         
+        # Import en masse
+        import_action = QAction("Importer...", self)
+        import_action.triggered.connect(self.import_data)
+        toolbar.addAction(import_action)
+        
+        # Export pour les tableurs et outils d'analyse
+        export_action = QAction("Exporter...", self)
+        export_action.triggered.connect(self.export_data)
+        toolbar.addAction(export_action)
+        
         toolbar.addSeparator()
         
         # Actualiser
@@ -470,6 +1319,15 @@ class StockManagementApp(QMainWindow):
         vente_action = QAction("Nouvelle Vente", self)
         vente_action.triggered.connect(self.nouvelle_vente)
         toolbar.addAction(vente_action)
+        
+        toolbar.addSeparator()
+        
+        # Recherche globale
+        self.global_search_edit = QLineEdit()
+        self.global_search_edit.setPlaceholderText("Recherche globale...")
+        self.global_search_edit.setMaximumWidth(250)
+        self.global_search_edit.returnPressed.connect(self.recherche_globale)
+        toolbar.addWidget(self.global_search_edit)
     
     def create_articles_tab(self):
         """Crée l'onglet de gestion des articles"""
@@ -481,7 +1339,12 @@ class StockManagementApp(QMainWindow):
         
         self.search_edit = QLineEdit()
         self.search_edit.setPlaceholderText("Rechercher un article...")
-        self.search_edit.textChanged.connect(self.filter_articles)
+        # Filtrage différé: on attend une courte pause dans la frappe
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(120)
+        self.search_timer.timeout.connect(self.filter_articles)
+        self.search_edit.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(QLabel("Recherche:"))
         search_layout.addWidget(self.search_edit)
         
@@ -501,12 +1364,10 @@ class StockManagementApp(QMainWindow):
         layout.addLayout(search_layout)
         
         # Tableau des articles
-        self.articles_table = QTableWidget()
-        self.articles_table.setColumnCount(8)
-        self.articles_table.setHorizontalHeaderLabels([
-            "ID", "Désignation", "Catégorie", "Quantité", "Unité", 
-            "Prix unitaire", "Seuil minimum", "Statut"
-        ])
+        self.articles_model = ArticlesModel(self)
+        self.articles_proxy = ArticlesFiltresProxy(self)
+        self.articles_proxy.setSourceModel(self.articles_model)
+        self.articles_table = creer_vue_tableau(self.articles_proxy)
         
         # Redimensionnement automatique des colonnes
         header = self.articles_table.horizontalHeader()
@@ -560,14 +1421,21 @@ class StockManagementApp(QMainWindow):
         date_layout.addWidget(filter_entries_btn)
         
         date_layout.addStretch()
+        
+        self.entrees_count_label = QLabel("")
+        date_layout.addWidget(self.entrees_count_label)
         layout.addLayout(date_layout)
         
         # Tableau des entrées
-        self.entrees_table = QTableWidget()
-        self.entrees_table.setColumnCount(7)
-        self.entrees_table.setHorizontalHeaderLabels([
-            "ID", "Article", "Quantité", "Date", "Fournisseur", "Prix total", "Commentaire"
-        ])
+        self.entrees_model = MouvementsModel(
+            self.db_manager, 'entrees',
+            ["ID", "Article", "Quantité", "Date", "Fournisseur", "Prix total", "Commentaire"],
+            {**dict.fromkeys(range(7), format_texte), 5: format_prix}, self, self.run_in_background
+        )
+        self.entrees_model.total_connu.connect(
+            lambda total: self.entrees_count_label.setText(f"{total} entrée(s)")
+        )
+        self.entrees_table = creer_vue_tableau(self.entrees_model)
         
         header = self.entrees_table.horizontalHeader()
         header.setSectionResizeMode(1, QHeaderView.Stretch)
@@ -611,14 +1479,21 @@ class StockManagementApp(QMainWindow):
         date_layout.addWidget(filter_sorties_btn)
         
         date_layout.addStretch()
+        
+        self.sorties_count_label = QLabel("")
+        date_layout.addWidget(self.sorties_count_label)
         layout.addLayout(date_layout)
         
         # Tableau des sorties
-        self.sorties_table = QTableWidget()
-        self.sorties_table.setColumnCount(7)
-        self.sorties_table.setHorizontalHeaderLabels([
-            "ID", "Article", "Quantité", "Date", "Motif", "Utilisateur", "Commentaire"
-        ])
+        self.sorties_model = MouvementsModel(
+            self.db_manager, 'sorties',
+            ["ID", "Article", "Quantité", "Date", "Motif", "Utilisateur", "Commentaire"],
+            dict.fromkeys(range(7), format_texte), self, self.run_in_background
+        )
+        self.sorties_model.total_connu.connect(
+            lambda total: self.sorties_count_label.setText(f"{total} sortie(s)")
+        )
+        self.sorties_table = creer_vue_tableau(self.sorties_model)
         
         header = self.sorties_table.horizontalHeader()
         header.setSectionResizeMode(1, QHeaderView.Stretch)
@@ -683,8 +1558,19 @@ class StockManagementApp(QMainWindow):
         
         self.alerts_list = QListWidget()
         self.alerts_list.setMaximumHeight(150)
+        self.alerts_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         alerts_layout.addWidget(self.alerts_list)
         
+        ack_layout = QHBoxLayout()
+        ack_layout.addStretch()
+        ack_selection_btn = QPushButton("Acquitter la sélection")
+        ack_selection_btn.clicked.connect(self.acknowledge_selected_alerts)
+        ack_layout.addWidget(ack_selection_btn)
+        ack_all_btn = QPushButton("Tout acquitter")
+        ack_all_btn.clicked.connect(lambda: self.acknowledge_alerts(None))
+        ack_layout.addWidget(ack_all_btn)
+        alerts_layout.addLayout(ack_layout)
+        
         layout.addWidget(alerts_group)
         
         # Mouvements récents
@@ -706,8 +1592,69 @@ class StockManagementApp(QMainWindow):
         
         return widget
     
+    def create_analyses_tab(self):
+        """Crée l'onglet des analyses de ventes et de consommation"""
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel("Période:"))
+        self.frequence_combo = QComboBox()
+        self.frequence_combo.addItems(["Jour", "Semaine", "Mois"])
+        self.frequence_combo.currentTextChanged.connect(self.load_analyses)
+        options_layout.addWidget(self.frequence_combo)
+        
+        options_layout.addWidget(QLabel("Moyenne mobile sur:"))
+        self.fenetre_spin = QSpinBox()
+        self.fenetre_spin.setRange(1, 365)
+        self.fenetre_spin.setValue(7)
+        self.fenetre_spin.setSuffix(" périodes")
+        self.fenetre_spin.valueChanged.connect(self.load_analyses)
+        options_layout.addWidget(self.fenetre_spin)
+        options_layout.addStretch()
+        
+        self.analyses_label = QLabel("")
+        options_layout.addWidget(self.analyses_label)
+        layout.addLayout(options_layout)
+        
+        pourcentage = lambda valeur: "" if valeur is None else f"{valeur:.1%}"
+        self.analyses_models = {
+            'chiffre_affaires': TableauModel(
+                ["Période", "Chiffre d'affaires", "Moyenne mobile"],
+                {1: format_prix, 2: format_prix}, self
+            ),
+            'categories': TableauModel(
+                ["Catégorie", "Quantité sortie", "Valeur", "Taux de perte"],
+                {2: format_prix, 3: pourcentage}, self
+            ),
+            'articles': TableauModel(
+                ["Article", "Catégorie", "Quantité sortie", "Valeur"], {3: format_prix}, self
+            ),
+            'motifs': TableauModel(
+                ["Motif", "Quantité", "Valeur", "Part"], {2: format_prix, 3: pourcentage}, self
+            ),
+        }
+        titres = {
+            'chiffre_affaires': "Chiffre d'affaires des ventes",
+            'categories': "Consommation par catégorie",
+            'articles': "Articles les plus consommés",
+            'motifs': "Sorties par motif (casse, pertes...)",
+        }
+        
+        grille = QGridLayout()
+        for position, (cle, model) in enumerate(self.analyses_models.items()):
+            groupe = QGroupBox(titres[cle])
+            groupe_layout = QVBoxLayout(groupe)
+            vue = creer_vue_tableau(model)
+            vue.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+            groupe_layout.addWidget(vue)
+            grille.addWidget(groupe, position // 2, position % 2)
+        layout.addLayout(grille)
+        
+        return widget
+    
     def load_data(self):
-        """Charge toutes les données"""
+        """Charge toutes les données (lectures en tâche de fond)"""
         self.load_articles()
         self.load_entrees()
         self.load_sorties()
@@ -716,209 +1663,202 @@ class StockManagementApp(QMainWindow):
     
     def load_categories(self):
         """Charge les catégories pour les filtres"""
-        query = "SELECT DISTINCT categorie FROM articles ORDER BY categorie"
-        categories = self.db_manager.execute_query(query)
+        self.run_in_background('categories', self.db_manager.fetch_categories,
+                               on_result=self.show_categories)
+    
+    def show_categories(self, categories):
+        """Affiche les catégories dans le filtre, en conservant la sélection"""
+        courante = self.category_filter.currentText()
         
+        self.category_filter.blockSignals(True)
         self.category_filter.clear()
         self.category_filter.addItem("Toutes les catégories")
         
         for category in categories:
-            self.category_filter.addItem(category[0])
-    
-    def load_articles(self):
-        """Charge les articles dans le tableau"""
-        query = """
-            SELECT id, designation, categorie, quantite, unite, prix_unitaire, seuil_minimum
-            FROM articles
-            ORDER BY designation
-        """
-        articles = self.db_manager.execute_query(query)
+            self.category_filter.addItem(category)
         
-        self.articles_table.setRowCount(len(articles))
+        self.category_filter.setCurrentIndex(max(self.category_filter.findText(courante), 0))
+        self.category_filter.blockSignals(False)
+        self.filter_articles()
+    
+    def on_db_change(self, tables, article_ids):
+        """Met à jour uniquement ce qu'une écriture en base a touché"""
+        if tables & {'articles', 'stock'}:
+            self.load_articles(article_ids, 'articles' in tables)
+        
+        if 'entrees' in tables:
+            self.load_entrees()
+        if 'sorties' in tables:
+            self.load_sorties()
+        if 'alertes' in tables:
+            # Un article vient de passer sous son seuil (ou d'être réapprovisionné)
+            self.check_low_stock()
+        
+        # Agrégats O(1), alertes et derniers mouvements par index
+        self.load_dashboard()
+        self.load_analyses()
+    
+    def update_articles(self, rows, article_ids, fiche_modifiee):
+        """Applique au tableau les articles modifiés, sans tout recharger"""
+        self.articles_model.update_rows(rows, article_ids)
         
-        for row, article in enumerate(articles):
-            for col, value in enumerate(article):
-                if col == 5:  # Prix unitaire
-                    item = QTableWidgetItem(f"{value:.2f} FCFA")
-                else:
-                    item = QTableWidgetItem(str(value))
-                self.articles_table.setItem(row, col, item)
-            
-            # Statut du stock
-            quantite = article[3]
-            seuil = article[6]
-            
-            if quantite == 0:
-                status = "Épuisé"
-                color = QColor(255, 0, 0)  # Rouge
-            elif quantite <= seuil:
-                status = "Stock bas"
-                color = QColor(255, 165, 0)  # Orange
-            else:
-                status = "Normal"
-                color = QColor(0, 128, 0)  # Vert
-            
-            status_item = QTableWidgetItem(status)
-            status_item.setBackground(color)
-            status_item.setForeground(QColor(255, 255, 255))  # Texte blanc
-            self.articles_table.setItem(row, 7, status_item)
+        if fiche_modifiee:
+            # Les catégories ne peuvent changer qu'avec la fiche d'un article
+            self.actualiser_categories()
+    
+    def actualiser_categories(self):
+        """Met le filtre des catégories d'accord avec les articles affichés"""
+        categories = sorted(set(self.articles_model.colonnes[2]))
+        actuelles = [self.category_filter.itemText(i) for i in range(1, self.category_filter.count())]
+        if categories != actuelles:
+            self.show_categories(categories)
+    
+    def load_articles(self, article_ids=None, fiche_modifiee=True):
+        """Charge les articles dans le tableau: tous, ou seulement article_ids (mise à jour ciblée)
+        
+        Une seule lecture d'articles est livrée à la fois (clé 'articles'): une nouvelle
+        demande remplace celle en cours en reprenant ses articles, si bien que la plus
+        récente l'emporte sans qu'un changement ne soit perdu.
+        """
+        if 'articles' in self.taches:
+            en_cours, modifiee = self.articles_demandes
+            article_ids = None if en_cours is None or article_ids is None else en_cours | set(article_ids)
+            fiche_modifiee = fiche_modifiee or modifiee
+        if article_ids is not None and len(article_ids) > self.MAJ_CIBLEE_MAX:
+            # Écriture en masse (import...): un rechargement complet coûte moins cher
+            article_ids = None
+        self.articles_demandes = (None if article_ids is None else set(article_ids), fiche_modifiee)
+        
+        # Le statut du stock est calculé par le modèle à l'affichage
+        if article_ids is None:
+            self.run_in_background('articles', self.db_manager.fetch_articles,
+                                   on_result=lambda rows: self.articles_charges(rows, fiche_modifiee))
+        else:
+            article_ids = set(article_ids)
+            self.run_in_background(
+                'articles', self.db_manager.fetch_articles, article_ids,
+                on_result=lambda rows: self.update_articles(rows, article_ids, fiche_modifiee)
+            )
+    
+    def articles_charges(self, rows, fiche_modifiee):
+        self.articles_model.set_rows(rows)
+        if fiche_modifiee:
+            self.actualiser_categories()
 
     def filter_articles(self):
         """Filtre les articles selon les critères"""
-        search_text = self.search_edit.text().lower()
         category_filter = self.category_filter.currentText()
         stock_filter = self.stock_filter.currentText()
         
-        for row in range(self.articles_table.rowCount()):
-            show_row = True
-            
-            # Filtre par texte de recherche
-            if search_text:
-                designation = self.articles_table.item(row, 1).text().lower()
-                if search_text not in designation:
-                    show_row = False
-            
-            # Filtre par catégorie
-            if category_filter != "Toutes les catégories":
-                category = self.articles_table.item(row, 2).text()
-                if category != category_filter:
-                    show_row = False
-            
-            # Filtre par stock
-            if stock_filter != "Tous les stocks":
-                status = self.articles_table.item(row, 7).text()
-                if stock_filter == "Stock normal" and status != "Normal":
-                    show_row = False
-                elif stock_filter == "Stock bas" and status != "Stock bas":
-                    show_row = False
-                elif stock_filter == "Stock épuisé" and status != "Épuisé":
-                    show_row = False
-            
-            self.articles_table.setRowHidden(row, not show_row)
+        self.articles_proxy.set_filtres(
+            self.search_edit.text(),
+            None if category_filter in ("", "Toutes les catégories") else category_filter,
+            None if stock_filter == "Tous les stocks" else stock_filter
+        )
+    
+    def current_article_row(self):
+        """Retourne la ligne (dans le modèle source) de l'article sélectionné, ou -1"""
+        index = self.articles_table.currentIndex()
+        if not index.isValid():
+            return -1
+        return self.articles_proxy.mapToSource(index).row()
 
     def load_entrees(self):
         """Charge les entrées dans le tableau"""
         date_from = self.date_from_entry.date().toPyDate()
         date_to = self.date_to_entry.date().toPyDate()
         
-        query = """
-            SELECT e.id, a.designation, e.quantite, e.date_entree, 
-                   e.fournisseur, e.prix_total, e.commentaire
-            FROM entrees e
-            JOIN articles a ON e.article_id = a.id
-            WHERE e.date_entree BETWEEN ? AND ?
-            ORDER BY e.date_entree DESC
-        """
-        entrees = self.db_manager.execute_query(query, (date_from, date_to))
-        
-        self.entrees_table.setRowCount(len(entrees))
-        
-        for row, entree in enumerate(entrees):
-            for col, value in enumerate(entree):
-                if col == 5 and value:
-                    item = QTableWidgetItem(f"{value:.2f} FCFA")
-                else:
-                    item = QTableWidgetItem(str(value) if value else "")
-                self.entrees_table.setItem(row, col, item)
+        self.entrees_count_label.setText("Comptage...")
+        self.entrees_model.charger(date_from, date_to)
 
     def load_sorties(self):
         """Charge les sorties dans le tableau"""
         date_from = self.date_from_sortie.date().toPyDate()
         date_to = self.date_to_sortie.date().toPyDate()
         
-        query = """
-            SELECT s.id, a.designation, s.quantite, s.date_sortie, 
-                   s.motif, s.utilisateur, s.commentaire
-            FROM sorties s
-            JOIN articles a ON s.article_id = a.id
-            WHERE s.date_sortie BETWEEN ? AND ?
-            ORDER BY s.date_sortie DESC
-        """
-        sorties = self.db_manager.execute_query(query, (date_from, date_to))
-        
-        self.sorties_table.setRowCount(len(sorties))
-        
-        for row, sortie in enumerate(sorties):
-            for col, value in enumerate(sortie):
-                item = QTableWidgetItem(str(value) if value else "")
-                self.sorties_table.setItem(row, col, item)
+        self.sorties_count_label.setText("Comptage...")
+        self.sorties_model.charger(date_from, date_to)
     
     def get_total_ventes_du_jour(self):
         """Calcule la somme totale des produits vendus aujourd'hui"""
-        today = date.today().isoformat()
-        query = """
-            SELECT SUM(s.quantite * a.prix_unitaire)
-            FROM sorties s
-            JOIN articles a ON s.article_id = a.id
-            WHERE s.date_sortie = ?
-        """
-        total = self.db_manager.execute_query(query, (today,))[0][0]
-        return total or 0
+        return self.service.ventes_du_jour()
     
     def load_dashboard(self):
         """Charge les données du tableau de bord"""
-        # Statistiques générales
-        total_articles = self.db_manager.execute_query("SELECT COUNT(*) FROM articles")[0][0]
+        self.run_in_background('dashboard', self.db_manager.fetch_dashboard,
+                               on_result=self.show_dashboard)
+    
+    def show_dashboard(self, donnees):
+        """Affiche les données du tableau de bord"""
+        # Statistiques générales, stocks bas et valeur totale: une seule ligne agrégée
+        total_articles, low_stock, total_value = donnees['agregats']
         self.total_articles_label.setText(str(total_articles))
-        
-        # Articles en stock bas
-        low_stock_query = "SELECT COUNT(*) FROM articles WHERE quantite <= seuil_minimum AND quantite > 0"
-        low_stock = self.db_manager.execute_query(low_stock_query)[0][0]
         self.low_stock_label.setText(str(low_stock))
-        
-        # Valeur totale du stock
-        value_query = "SELECT SUM(quantite * prix_unitaire) FROM articles"
-        total_value = self.db_manager.execute_query(value_query)[0][0] or 0
         self.total_value_label.setText(f"{total_value:.2f} FCFA")
         
         # Total des ventes du jour
-        total_ventes = self.get_total_ventes_du_jour()
-        self.total_ventes_label.setText(f"{total_ventes:.2f} FCFA")
+        self.total_ventes_label.setText(f"{donnees['ventes_du_jour']:.2f} FCFA")
         
         # Alertes stocks bas
-        self.load_alerts()
+        self.show_alerts(donnees['alertes'])
         
         # Mouvements récents
-        self.load_recent_movements()
-    
-    def load_alerts(self):
-        """Charge les alertes de stocks bas"""
-        query = """
-            SELECT designation, quantite, seuil_minimum, unite
-            FROM articles 
-            WHERE quantite <= seuil_minimum 
-            ORDER BY quantite ASC
-        """
-        alerts = self.db_manager.execute_query(query)
-        
+        self.show_recent_movements(donnees['mouvements_recents'])
+    
+    def previsions_done(self, resultat):
+        """Signale les achats suggérés par les prévisions du démarrage"""
+        if resultat['a_commander']:
+            self.status_bar.showMessage(
+                f"{resultat['a_commander']} article(s) à commander "
+                "(rapport « Suggestions d'achat »)", 10000
+            )
+    
+    def previsions_failed(self, erreur):
+        self.status_bar.showMessage(f"Prévisions indisponibles: {erreur}")
+    
+    def load_analyses(self):
+        """Recalcule les analyses si l'onglet est affiché (seuls les nouveaux mouvements sont relus)"""
+        if self.tab_widget.currentWidget() is not self.analyses_tab:
+            return
+        self.analyses_label.setText("Calcul...")
+        self.run_in_background(
+            'analyses', lambda frequence, fenetre: self.service.analyses.resume(frequence, fenetre),
+            self.frequence_combo.currentText(), self.fenetre_spin.value(),
+            on_result=self.show_analyses, on_error=self.analyses_failed
+        )
+    
+    def show_analyses(self, tableaux):
+        """Affiche les tableaux d'analyses"""
+        for cle, rows in tableaux.items():
+            self.analyses_models[cle].set_rows(rows)
+        self.analyses_label.setText("")
+    
+    def analyses_failed(self, erreur):
+        """Affiche l'erreur de calcul (pandas absent...)"""
+        self.analyses_label.setText(f"Analyses indisponibles: {erreur}")
+    
+    def show_alerts(self, alerts):
+        """Affiche les alertes de stocks bas"""
         self.alerts_list.clear()
         
         for alert in alerts:
-            designation, quantite, seuil, unite = alert
-            if quantite == 0:
+            alerte_id, designation, quantite, seuil, unite, acquittee = alert
+            if quantite <= 0:
                 message = f"⚠️ {designation} - STOCK ÉPUISÉ"
             else:
                 message = f"⚠️ {designation} - {quantite} {unite} (seuil: {seuil})"
-            self.alerts_list.addItem(message)
+            item = QListWidgetItem(message)
+            item.setData(Qt.UserRole, alerte_id)
+            if acquittee:
+                # Déjà vue: affichée tant que le stock n'est pas revenu au-dessus du seuil
+                item.setForeground(QColor(128, 128, 128))
+            self.alerts_list.addItem(item)
         
         if not alerts:
             self.alerts_list.addItem("✅ Aucune alerte - Tous les stocks sont corrects")
     
-    def load_recent_movements(self):
-        """Charge les mouvements récents"""
-        query = """
-            SELECT date_entree as date, 'Entrée' as type, a.designation, e.quantite
-            FROM entrees e
-            JOIN articles a ON e.article_id = a.id
-            UNION ALL
-            SELECT date_sortie as date, 'Sortie' as type, a.designation, s.quantite
-            FROM sorties s
-            JOIN articles a ON s.article_id = a.id
-            ORDER BY date DESC
-            LIMIT 10
-        """
-        movements = self.db_manager.execute_query(query)
-        
+    def show_recent_movements(self, movements):
+        """Affiche les mouvements récents"""
         self.recent_table.setRowCount(len(movements))
         
         for row, movement in enumerate(movements):
@@ -938,14 +1878,29 @@ class StockManagementApp(QMainWindow):
             self.recent_table.setItem(row, 3, QTableWidgetItem(quantity_text))
     
     def check_low_stock(self):
-        """Vérifie les stocks bas périodiquement"""
-        query = "SELECT COUNT(*) FROM articles WHERE quantite <= seuil_minimum AND quantite > 0"
-        low_stock_count = self.db_manager.execute_query(query)[0][0]
-        
-        if low_stock_count > 0:
-            self.status_bar.showMessage(f"⚠️ {low_stock_count} article(s) en stock bas")
+        """Signale les alertes non acquittées (au démarrage, puis à chaque changement de la file)"""
+        self.run_in_background('check_low_stock', self.service.alertes, True,
+                               on_result=self.show_low_stock_count)
+    
+    def show_low_stock_count(self, alertes):
+        """Affiche le nombre d'alertes de stock à acquitter dans la barre de statut"""
+        if alertes:
+            self.status_bar.showMessage(f"⚠️ {len(alertes)} alerte(s) de stock à acquitter "
+                                        f"(dernière: {alertes[0][1]})")
         else:
-            self.status_bar.showMessage("✅ Tous les stocks sont corrects")
+            self.status_bar.showMessage("✅ Aucune alerte de stock à acquitter")
+    
+    def acknowledge_selected_alerts(self):
+        """Acquitte les alertes sélectionnées dans le tableau de bord"""
+        alerte_ids = [item.data(Qt.UserRole) for item in self.alerts_list.selectedItems()
+                      if item.data(Qt.UserRole) is not None]
+        if alerte_ids:
+            self.acknowledge_alerts(alerte_ids)
+    
+    def acknowledge_alerts(self, alerte_ids):
+        """Acquitte des alertes (toutes si alerte_ids est None); l'affichage suit par notification"""
+        self.run_in_background(('acquitter', None if alerte_ids is None else tuple(alerte_ids)),
+                               self.service.acquitter_alertes, alerte_ids)
     
     def add_article(self):
         """Ajoute un nouvel article"""
@@ -958,34 +1913,27 @@ class StockManagementApp(QMainWindow):
                 QMessageBox.warning(self, "Erreur", "La désignation est obligatoire.")
                 return
             
-            query = """
-                INSERT INTO articles (designation, categorie, quantite, unite, prix_unitaire, seuil_minimum)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """
-            params = (data['designation'], data['categorie'], data['quantite'],
-                     data['unite'], data['prix_unitaire'], data['seuil_minimum'])
-            
             try:
-                self.db_manager.execute_query(query, params)
+                self.service.ajouter_article(data)
                 QMessageBox.information(self, "Succès", "Article ajouté avec succès.")
-                self.load_data()
+            except (CodeBarreError, ValueError) as e:
+                QMessageBox.warning(self, "Erreur", str(e))
             except Exception as e:
                 QMessageBox.critical(self, "Erreur", f"Erreur lors de l'ajout: {str(e)}")
     
     def edit_article(self):
         """Modifie l'article sélectionné"""
-        current_row = self.articles_table.currentRow()
+        current_row = self.current_article_row()
         
         if current_row < 0:
             QMessageBox.warning(self, "Erreur", "Veuillez sélectionner un article à modifier.")
             return
         
         # Récupérer les données de l'article
-        article_id = int(self.articles_table.item(current_row, 0).text())
-        query = "SELECT * FROM articles WHERE id = ?"
-        article_data = self.db_manager.execute_query(query, (article_id,))[0]
+        article_id = self.articles_model.valeur(current_row, 0)
+        article_data = self.service.article(article_id)
         
-        dialog = ArticleDialog(self.db_manager, article_data)
+        dialog = ArticleDialog(self.db_manager, article_data, self.service.codes_article(article_id))
         
         if dialog.exec_() == QDialog.Accepted:
             data = dialog.get_data()
@@ -994,31 +1942,26 @@ class StockManagementApp(QMainWindow):
                 QMessageBox.warning(self, "Erreur", "La désignation est obligatoire.")
                 return
             
-            query = """
-                UPDATE articles 
-                SET designation=?, categorie=?, quantite=?, unite=?, prix_unitaire=?, seuil_minimum=?
-                WHERE id=?
-            """
-            params = (data['designation'], data['categorie'], data['quantite'],
-                     data['unite'], data['prix_unitaire'], data['seuil_minimum'], article_id)
-            
             try:
-                self.db_manager.execute_query(query, params)
+                self.service.modifier_article(article_id, data)
                 QMessageBox.information(self, "Succès", "Article modifié avec succès.")
-                self.load_data()
+            except ConflitVersionError as e:
+                QMessageBox.warning(self, "Conflit", str(e))
+            except (CodeBarreError, ValueError) as e:
+                QMessageBox.warning(self, "Erreur", str(e))
             except Exception as e:
                 QMessageBox.critical(self, "Erreur", f"Erreur lors de la modification: {str(e)}")
     
     def delete_article(self):
         """Supprime l'article sélectionné"""
-        current_row = self.articles_table.currentRow()
+        current_row = self.current_article_row()
         
         if current_row < 0:
             QMessageBox.warning(self, "Erreur", "Veuillez sélectionner un article à supprimer.")
             return
         
-        article_id = int(self.articles_table.item(current_row, 0).text())
-        designation = self.articles_table.item(current_row, 1).text()
+        article_id = self.articles_model.valeur(current_row, 0)
+        designation = self.articles_model.valeur(current_row, 1)
         
         # Confirmation
         reply = QMessageBox.question(
@@ -1030,96 +1973,57 @@ class StockManagementApp(QMainWindow):
         
         if reply == QMessageBox.Yes:
             try:
-                # Supprimer les mouvements associés
-                self.db_manager.execute_query("DELETE FROM entrees WHERE article_id = ?", (article_id,))
-                self.db_manager.execute_query("DELETE FROM sorties WHERE article_id = ?", (article_id,))
-                
-                # Supprimer l'article
-                self.db_manager.execute_query("DELETE FROM articles WHERE id = ?", (article_id,))
-                
+                self.service.supprimer_article(article_id)
                 QMessageBox.information(self, "Succès", "Article supprimé avec succès.")
-                self.load_data()
             except Exception as e:
                 QMessageBox.critical(self, "Erreur", f"Erreur lors de la suppression: {str(e)}")
     
     def add_entree(self):
         """Ajoute une nouvelle entrée"""
         # Récupérer la liste des articles
-        articles = self.db_manager.execute_query("SELECT * FROM articles ORDER BY designation")
+        articles = self.service.articles()
         
         if not articles:
             QMessageBox.warning(self, "Erreur", "Aucun article disponible. Créez d'abord des articles.")
             return
         
-        dialog = MouvementDialog(self.db_manager, 'entree', articles)
+        dialog = MouvementDialog(self.db_manager, 'entree', articles, self.service.index_articles())
         
         if dialog.exec_() == QDialog.Accepted:
             data = dialog.get_data()
             
-            query = """
-                INSERT INTO entrees (article_id, quantite, date_entree, fournisseur, prix_total, commentaire)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """
-            params = (data['article_id'], data['quantite'], data['date'],
-                     data['fournisseur'], data['prix_total'], data['commentaire'])
-            
             try:
-                # Insérer l'entrée
-                self.db_manager.execute_query(query, params)
-                
-                # Mettre à jour le stock
-                update_query = "UPDATE articles SET quantite = quantite + ? WHERE id = ?"
-                self.db_manager.execute_query(update_query, (data['quantite'], data['article_id']))
+                # Insérer l'entrée et mettre à jour le stock en une seule transaction
+                self.service.ajouter_entree(data)
                 
                 QMessageBox.information(self, "Succès", "Entrée ajoutée avec succès.")
-                self.load_data()
             except Exception as e:
                 QMessageBox.critical(self, "Erreur", f"Erreur lors de l'ajout: {str(e)}")
     
     def add_sortie(self):
         """Ajoute une nouvelle sortie"""
         # Récupérer la liste des articles avec stock > 0
-        articles = self.db_manager.execute_query(
-            "SELECT * FROM articles WHERE quantite > 0 ORDER BY designation"
-        )
+        articles = [article for article in self.service.articles() if article[3] > 0]
         
         if not articles:
             QMessageBox.warning(self, "Erreur", "Aucun article en stock disponible.")
             return
         
-        dialog = MouvementDialog(self.db_manager, 'sortie', articles)
+        dialog = MouvementDialog(self.db_manager, 'sortie', articles, self.service.index_articles())
         
         if dialog.exec_() == QDialog.Accepted:
             data = dialog.get_data()
             
-            # Vérifier le stock disponible
-            stock_query = "SELECT quantite FROM articles WHERE id = ?"
-            stock_actuel = self.db_manager.execute_query(stock_query, (data['article_id'],))[0][0]
-            
-            if data['quantite'] > stock_actuel:
-                QMessageBox.warning(
-                    self, "Erreur", 
-                    f"Stock insuffisant. Stock disponible: {stock_actuel}"
-                )
-                return
-            
-            query = """
-                INSERT INTO sorties (article_id, quantite, date_sortie, motif, utilisateur, commentaire)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """
-            params = (data['article_id'], data['quantite'], data['date'],
-                     data['motif'], data['utilisateur'], data['commentaire'])
-            
             try:
-                # Insérer la sortie
-                self.db_manager.execute_query(query, params)
-                
-                # Mettre à jour le stock
-                update_query = "UPDATE articles SET quantite = quantite - ? WHERE id = ?"
-                self.db_manager.execute_query(update_query, (data['quantite'], data['article_id']))
+                # Insérer la sortie et décrémenter le stock (refusé si insuffisant)
+                self.service.ajouter_sortie(data)
                 
                 QMessageBox.information(self, "Succès", "Sortie ajoutée avec succès.")
-                self.load_data()
+            except StockInsuffisantError as e:
+                QMessageBox.warning(
+                    self, "Erreur", 
+                    f"Stock insuffisant. Stock disponible: {e.disponible}"
+                )
             except Exception as e:
                 QMessageBox.critical(self, "Erreur", f"Erreur lors de l'ajout: {str(e)}")
     
@@ -1129,7 +2033,7 @@ class StockManagementApp(QMainWindow):
             # Demander le type de rapport
             from PyQt5.QtWidgets import QInputDialog
             
-            items = ["Inventaire complet", "Mouvements (Entrées/Sorties)", "Stocks bas"]
+            items = list(self.service.rapports)
             item, ok = QInputDialog.getItem(
                 self, "Générer un rapport", "Type de rapport:", items, 0, False
             )
@@ -1146,242 +2050,186 @@ class StockManagementApp(QMainWindow):
             if not filename:
                 return
             
-            # Générer le rapport selon le type
-            if item == "Inventaire complet":
-                self.generate_inventory_report(filename)
-            elif item == "Mouvements (Entrées/Sorties)":
-                self.generate_movements_report(filename)
-            elif item == "Stocks bas":
-                self.generate_low_stock_report(filename)
+            # Période du rapport des mouvements (tout l'historique possible)
+            options = {}
+            if item == "Mouvements (Entrées/Sorties)":
+                periode = PeriodeDialog(self)
+                if periode.exec_() != QDialog.Accepted:
+                    return
+                options['date_debut'], options['date_fin'] = periode.get_periode()
             
-            QMessageBox.information(self, "Succès", f"Rapport généré: {filename}")
+            # Générer le rapport selon le type, sans bloquer la fenêtre
+            self.status_bar.showMessage(f"Génération du rapport '{item}'...")
+            self.run_in_background(
+                'rapport', self.service.rapports[item], filename,
+                on_result=lambda _: self.report_done(filename),
+                on_error=self.report_failed,
+                on_progress=lambda fait, total: self.report_progress(item, fait, total),
+                **options
+            )
             
-        except ImportError:
+        except Exception as e:
+            self.report_failed(e)
+    
+    def report_progress(self, item, fait, total):
+        """Affiche l'avancement de la génération d'un rapport"""
+        self.status_bar.showMessage(f"Génération du rapport '{item}': {fait}/{total} lignes")
+    
+    def report_done(self, filename):
+        """Signale la fin de la génération d'un rapport"""
+        self.status_bar.showMessage("Prêt")
+        QMessageBox.information(self, "Succès", f"Rapport généré: {filename}")
+    
+    def report_failed(self, erreur):
+        """Signale l'échec de la génération d'un rapport"""
+        self.status_bar.showMessage("Prêt")
+        if isinstance(erreur, ImportError):
             QMessageBox.warning(
                 self, "Erreur", 
                 "La génération de rapports PDF nécessite la bibliothèque 'reportlab'.\n"
                 "Installez-la avec: pip install reportlab"
             )
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Erreur lors de la génération: {str(e)}")
-    
-    def generate_inventory_report(self, filename):
-        """Génère un rapport d'inventaire PDF"""
-        doc = SimpleDocTemplate(filename, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Titre
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            alignment=1,  # Centré
-            spaceAfter=30
-        )
-        story.append(Paragraph("Rapport d'Inventaire - Gestion de Stocks", title_style))
-        story.append(Paragraph(f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Données
-        query = """
-            SELECT designation, categorie, quantite, unite, prix_unitaire, 
-                   (quantite * prix_unitaire) as valeur_totale
-            FROM articles 
-            ORDER BY categorie, designation
-        """
-        articles = self.db_manager.execute_query(query)
-        
-        # Tableau
-        data = [['Désignation', 'Catégorie', 'Quantité', 'Unité', 'Prix unit.', 'Valeur totale']]
-        total_value = 0
-        
-        for article in articles:
-            designation, categorie, quantite, unite, prix_unit, valeur = article
-            total_value += valeur or 0
-            data.append([
-                designation, categorie, str(quantite), unite,
-                f"{prix_unit:.2f} FCFA", f"{valeur:.2f} FCFA"
-            ])
-        
-        # Ligne de total
-        data.append(['', '', '', '', 'TOTAL:', f"{total_value:.2f} FCFA"])
-        
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(table)
-        doc.build(story)
-    
-    def generate_movements_report(self, filename):
-        """Génère un rapport des mouvements PDF"""
-        doc = SimpleDocTemplate(filename, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Titre
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            alignment=1,
-            spaceAfter=30
-        )
-        story.append(Paragraph("Rapport des Mouvements - Gestion de Stocks", title_style))
-        story.append(Paragraph(f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Entrées
-        story.append(Paragraph("ENTRÉES", styles['Heading2']))
-        
-        query_entrees = """
-            SELECT e.date_entree, a.designation, e.quantite, e.fournisseur, e.prix_total
-            FROM entrees e
-            JOIN articles a ON e.article_id = a.id
-            ORDER BY e.date_entree DESC
-            LIMIT 50
-        """
-        entrees = self.db_manager.execute_query(query_entrees)
-        
-        if entrees:
-            data_entrees = [['Date', 'Article', 'Quantité', 'Fournisseur', 'Prix']]
-            for entree in entrees:
-                date, designation, quantite, fournisseur, prix = entree
-                data_entrees.append([
-                    str(date), designation, str(quantite),
-                    fournisseur or '-', f"{prix:.2f} FCFA" if prix else '-'
-                ])
-            
-            table_entrees = Table(data_entrees)
-            table_entrees.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.green),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(table_entrees)
         else:
-            story.append(Paragraph("Aucune entrée enregistrée.", styles['Normal']))
+            QMessageBox.critical(self, "Erreur", f"Erreur lors de la génération: {str(erreur)}")
+    
+    def import_data(self):
+        """Importe des articles, entrées ou sorties depuis un fichier CSV ou Excel"""
+        from PyQt5.QtWidgets import QInputDialog
         
-        story.append(Spacer(1, 20))
+        types = {"Articles": 'articles', "Entrées": 'entrees', "Sorties": 'sorties'}
+        item, ok = QInputDialog.getItem(
+            self, "Importer", "Données à importer:", list(types), 0, False
+        )
+        if not ok:
+            return
         
-        # Sorties
-        story.append(Paragraph("SORTIES", styles['Heading2']))
+        filename, _ = QFileDialog.getOpenFileName(
+            self, "Fichier à importer", "", "Fichiers CSV ou Excel (*.csv *.xlsx)"
+        )
+        if not filename:
+            return
         
-        query_sorties = """
-            SELECT s.date_sortie, a.designation, s.quantite, s.motif, s.utilisateur
-            FROM sorties s
-            JOIN articles a ON s.article_id = a.id
-            ORDER BY s.date_sortie DESC
-            LIMIT 50
-        """
-        sorties = self.db_manager.execute_query(query_sorties)
-        
-        if sorties:
-            data_sorties = [['Date', 'Article', 'Quantité', 'Motif', 'Utilisateur']]
-            for sortie in sorties:
-                date, designation, quantite, motif, utilisateur = sortie
-                data_sorties.append([
-                    str(date), designation, str(quantite),
-                    motif or '-', utilisateur or '-'
-                ])
-            
-            table_sorties = Table(data_sorties)
-            table_sorties.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.red),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.mistyrose),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(table_sorties)
+        self.status_bar.showMessage(f"Import de {filename}...")
+        self.run_in_background(
+            'import', self.service.importer, filename, types[item],
+            on_result=self.import_done,
+            on_error=self.import_failed,
+            on_progress=lambda importees, rejetees: self.status_bar.showMessage(
+                f"Import: {importees} ligne(s) importée(s), {rejetees} refusée(s)..."
+            )
+        )
+    
+    def import_done(self, resultat):
+        """Affiche le bilan d'un import"""
+        self.status_bar.showMessage("Prêt")
+        message = f"{resultat['importees']} ligne(s) importée(s), {resultat['rejetees']} refusée(s)."
+        if resultat['fichier_rejets']:
+            message += f"\n\nLes lignes refusées et leur motif sont dans:\n{resultat['fichier_rejets']}"
+        QMessageBox.information(self, "Import terminé", message)
+    
+    def import_failed(self, erreur):
+        """Signale l'échec d'un import"""
+        self.status_bar.showMessage("Prêt")
+        if isinstance(erreur, ImportError):
+            QMessageBox.warning(
+                self, "Erreur", 
+                "L'import de fichiers Excel nécessite la bibliothèque 'openpyxl'.\n"
+                "Installez-la avec: pip install openpyxl"
+            )
         else:
-            story.append(Paragraph("Aucune sortie enregistrée.", styles['Normal']))
+            QMessageBox.critical(self, "Erreur", f"Erreur lors de l'import: {str(erreur)}")
+    
+    def export_data(self):
+        """Exporte les articles ou l'historique des mouvements en CSV, Excel ou Parquet"""
+        from PyQt5.QtWidgets import QInputDialog
         
-        doc.build(story)
-
-    def generate_low_stock_report(self, filename):
-        """Génère un rapport des stocks bas PDF"""
-        doc = SimpleDocTemplate(filename, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Titre
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            alignment=1,
-            spaceAfter=30
+        tables = {"Articles": 'articles', "Entrées": 'entrees', "Sorties": 'sorties'}
+        item, ok = QInputDialog.getItem(
+            self, "Exporter", "Données à exporter:", list(tables), 0, False
         )
-        story.append(Paragraph("Rapport des Stocks Bas - Gestion de Stocks", title_style))
-        story.append(Paragraph(f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Données
-        query = """
-            SELECT designation, categorie, quantite, unite, seuil_minimum
-            FROM articles 
-            WHERE quantite <= seuil_minimum
-            ORDER BY quantite ASC, designation
-        """
-        articles = self.db_manager.execute_query(query)
-        
-        if articles:
-            data = [['Désignation', 'Catégorie', 'Stock actuel', 'Unité', 'Seuil minimum', 'Statut']]
-            for article in articles:
-                designation, categorie, quantite, unite, seuil = article
-                status = "ÉPUISÉ" if quantite == 0 else "STOCK BAS"
-                data.append([
-                    designation, categorie, str(quantite), unite, str(seuil), status
-                ])
-            
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.red),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.mistyrose),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(table)
-        else:
-            story.append(Paragraph("✅ Aucun stock bas détecté !", styles['Normal']))
+        if not ok:
+            return
         
-        doc.build(story)
-
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Exporter vers", f"{tables[item]}_{datetime.now().strftime('%Y%m%d')}.csv",
+            "CSV (*.csv);;Excel (*.xlsx);;Parquet (*.parquet)"
+        )
+        if not filename:
+            return
+        
+        options = {}
+        if tables[item] != 'articles':
+            periode = PeriodeDialog(self)
+            if periode.exec_() != QDialog.Accepted:
+                return
+            options['date_debut'], options['date_fin'] = periode.get_periode()
+        
+        self.status_bar.showMessage(f"Export vers {filename}...")
+        self.run_in_background(
+            'export', self.service.exporter, tables[item], filename,
+            on_result=lambda resultat: self.export_done(filename, resultat),
+            on_error=self.export_failed,
+            on_progress=lambda fait, total: self.status_bar.showMessage(
+                f"Export: {fait}/{total} lignes..."
+            ),
+            **options
+        )
+    
+    def export_done(self, filename, resultat):
+        """Signale la fin d'un export"""
+        self.status_bar.showMessage("Prêt")
+        QMessageBox.information(
+            self, "Export terminé", f"{resultat['lignes']} ligne(s) exportée(s) dans:\n{filename}"
+        )
+    
+    def export_failed(self, erreur):
+        """Signale l'échec d'un export"""
+        self.status_bar.showMessage("Prêt")
+        if isinstance(erreur, ImportError):
+            QMessageBox.warning(
+                self, "Erreur", 
+                "Ce format nécessite une bibliothèque supplémentaire.\n"
+                "Installez-la avec: pip install openpyxl (Excel) ou pip install pyarrow (Parquet)"
+            )
+        else:
+            QMessageBox.critical(self, "Erreur", f"Erreur lors de l'export: {str(erreur)}")
+    
+    def recherche_globale(self):
+        """Ouvre les résultats de la recherche plein texte"""
+        dialog = RechercheDialog(self.db_manager, self.global_search_edit.text())
+        dialog.exec_()
+    
+    def show_trace_sql(self):
+        """Ouvre (sans bloquer la fenêtre) le panneau de trace des requêtes"""
+        if self.trace_dialog is None:
+            self.trace_dialog = TraceSQLDialog(self.db_manager, self)
+        self.trace_dialog.actualiser()
+        self.trace_dialog.show()
+        self.trace_dialog.raise_()
+    
     def nouvelle_vente(self):
-        dialog = VenteDialog(self.db_manager)
+        dialog = VenteDialog(self.service)
         if dialog.exec_() == QDialog.Accepted:
             recap, total = dialog.get_recapitulatif()
             QMessageBox.information(self, "Vente enregistrée",
                 f"{recap}\n\nTotal à payer : {total:.2f} ")
-            self.load_data()
 
 def main():
-    app = QApplication(sys.argv)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Gestion de stocks de vaisselle")
+    parser.add_argument('--serve', action='store_true',
+                        help="lance le serveur partagé par les postes au lieu de l'interface")
+    parser.add_argument('--serveur', metavar='URL',
+                        help="mode poste: utilise le serveur donné (ex. http://192.168.1.10:8765)")
+    args, autres = parser.parse_known_args()
+    
+    if args.serve:
+        # Options du serveur (--db, --host, --port): voir serveur.py
+        from serveur import main as serveur_main
+        sys.exit(serveur_main(autres))
+    
+    app = QApplication(sys.argv[:1] + autres)
     
     # Style de l'application
     app.setStyle('Fusion')
@@ -1404,7 +2252,7 @@ def main():
     app.setPalette(palette)
     
     try:
-        window = StockManagementApp()
+        window = StockManagementApp(args.serveur)
         window.show()
         sys.exit(app.exec_())
     except Exception as e:
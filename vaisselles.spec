@@ -36,3 +36,40 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+
+# Outil en ligne de commande (rapports de nuit, alertes): sans Qt
+b = Analysis(
+    ['stock.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['PyQt5'],
+    noarchive=False,
+    optimize=0,
+)
+pyz_cli = PYZ(b.pure)
+
+exe_cli = EXE(
+    pyz_cli,
+    b.scripts,
+    b.binaries,
+    b.datas,
+    [],
+    name='stock',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)